@@ -50,7 +50,7 @@ def changelog(ctx: Context, bump: str = "") -> None:
     ctx.run(tools.yore.check(bump=bump or _get_changelog_version()), title="Checking legacy code")
 
 
-@duty(pre=["check-quality", "check-types", "check-docs", "check-api"])
+@duty(pre=["check-quality", "check-types", "check-docs", "check-api"], pre_parallel=True)
 def check(ctx: Context) -> None:
     """Check it all!"""
 
@@ -169,7 +169,7 @@ def release(ctx: Context, version: str = "") -> None:
 @duty(silent=True, aliases=["cov"])
 def coverage(ctx: Context) -> None:
     """Report coverage as text and HTML."""
-    ctx.run(tools.coverage.combine(), nofail=True)
+    ctx.run(tools.coverage.combine(jobs=os.cpu_count() or 1), nofail=True)
     ctx.run(tools.coverage.report(rcfile="config/coverage.ini"), capture=False)
     ctx.run(tools.coverage.html(rcfile="config/coverage.ini"))
 
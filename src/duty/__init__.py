@@ -5,34 +5,80 @@ A simple task runner.
 
 from __future__ import annotations
 
-from failprint import lazy
-
-from duty._internal.cli import (
-    empty,
-    get_duty_parser,
-    get_parser,
-    main,
-    parse_args,
-    parse_commands,
-    parse_options,
-    print_help,
-    specified_options,
-    split_args,
-)
-from duty._internal.collection import Collection, Duty, DutyListType, default_duties_file
-from duty._internal.context import CmdType, Context
-from duty._internal.decorator import create_duty, duty
-from duty._internal.exceptions import DutyFailure
-from duty._internal.tools._base import LazyStderr, LazyStdout, Tool
-from duty._internal.validation import ParamsCaster, cast_arg, to_bool, validate
+from importlib import import_module
+from typing import TYPE_CHECKING, Any
+
+# Objects are imported lazily (PEP 562), so that importing duty stays cheap:
+# running a duty only imports what it uses (failprint, the CLI, tools, etc.).
+if TYPE_CHECKING:
+    from failprint import lazy
+
+    from duty._internal.background import BackgroundProcess
+    from duty._internal.cache import FileIndex
+    from duty._internal.cli import (
+        empty,
+        get_duty_parser,
+        get_parser,
+        main,
+        parse_args,
+        parse_commands,
+        parse_options,
+        print_help,
+        specified_options,
+        split_args,
+    )
+    from duty._internal.collection import Collection, CommandType, Duty, DutyListType, default_duties_file
+    from duty._internal.context import CmdType, Context
+    from duty._internal.decorator import create_duty, duty
+    from duty._internal.exceptions import DutyCycleError, DutyFailure
+    from duty._internal.tools._base import LazyStderr, LazyStdout, Tool
+    from duty._internal.validation import ParamsCaster, cast_arg, to_bool, validate
+
+_modules = {
+    "BackgroundProcess": "duty._internal.background",
+    "CmdType": "duty._internal.context",
+    "Collection": "duty._internal.collection",
+    "CommandType": "duty._internal.collection",
+    "Context": "duty._internal.context",
+    "Duty": "duty._internal.collection",
+    "DutyCycleError": "duty._internal.exceptions",
+    "DutyFailure": "duty._internal.exceptions",
+    "DutyListType": "duty._internal.collection",
+    "FileIndex": "duty._internal.cache",
+    "LazyStderr": "duty._internal.tools._base",
+    "LazyStdout": "duty._internal.tools._base",
+    "ParamsCaster": "duty._internal.validation",
+    "Tool": "duty._internal.tools._base",
+    "cast_arg": "duty._internal.validation",
+    "create_duty": "duty._internal.decorator",
+    "default_duties_file": "duty._internal.collection",
+    "duty": "duty._internal.decorator",
+    "empty": "duty._internal.cli",
+    "get_duty_parser": "duty._internal.cli",
+    "get_parser": "duty._internal.cli",
+    "lazy": "failprint",
+    "main": "duty._internal.cli",
+    "parse_args": "duty._internal.cli",
+    "parse_commands": "duty._internal.cli",
+    "parse_options": "duty._internal.cli",
+    "print_help": "duty._internal.cli",
+    "specified_options": "duty._internal.cli",
+    "split_args": "duty._internal.cli",
+    "to_bool": "duty._internal.validation",
+    "validate": "duty._internal.validation",
+}
 
 __all__: list[str] = [
+    "BackgroundProcess",
     "CmdType",
     "Collection",
+    "CommandType",
     "Context",
     "Duty",
+    "DutyCycleError",
     "DutyFailure",
     "DutyListType",
+    "FileIndex",
     "LazyStderr",
     "LazyStdout",
     "ParamsCaster",
@@ -55,3 +101,16 @@ __all__: list[str] = [
     "to_bool",
     "validate",
 ]
+
+
+def __getattr__(name: str) -> Any:
+    if name not in _modules:
+        raise AttributeError(f"module '{__name__}' has no attribute '{name}'")
+    value = getattr(import_module(_modules[name]), name)
+    # Cache the object, so that this function is only called once per name.
+    globals()[name] = value
+    return value
+
+
+def __dir__() -> list[str]:
+    return sorted({*globals(), *__all__})
@@ -0,0 +1,176 @@
+from __future__ import annotations
+
+import atexit
+import os
+import re
+import socket
+import subprocess
+import sys
+import threading
+import time
+from typing import Any
+
+from duty._internal.processes import _GRACE_PERIOD, _signal_group
+
+if sys.version_info >= (3, 11):
+    from typing import Self
+else:
+    from typing_extensions import Self
+
+# Interval between two attempts to connect to a port.
+_POLL_INTERVAL = 0.05
+
+
+class BackgroundProcess:
+    """A command running in the background.
+
+    Instances are returned by [`ctx.run(..., background=True)`][duty.Context.run].
+    The output of the command (standard output and error) is read continuously,
+    and the process is stopped, with its own subprocesses, when the duty that started it finishes or fails.
+
+    Examples:
+        ```python
+        @duty
+        def smoke(ctx):
+            server = ctx.run(
+                tools.mkdocs.serve(), background=True, ready_output=r"Serving on"
+            )
+            ctx.run("curl -fsS http://localhost:8000", title="Checking docs")
+            print(server.output)
+        ```
+    """
+
+    def __init__(self, cmd: str | list[str], *, workdir: str | None = None) -> None:
+        """Start the command.
+
+        Parameters:
+            cmd: The command, run in a shell when it is a string.
+            workdir: The working directory of the command.
+        """
+        options: dict[str, Any] = {}
+        # The command runs in its own process group, to be able to stop it with its own subprocesses.
+        if hasattr(os, "killpg"):
+            options["start_new_session"] = True
+        self._process = subprocess.Popen(  # noqa: S603
+            cmd,
+            shell=isinstance(cmd, str),
+            cwd=workdir,
+            stdin=subprocess.DEVNULL,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.STDOUT,
+            **options,
+        )
+        self._lines: list[str] = []
+        self._eof = False
+        self._condition = threading.Condition()
+        self._reader = threading.Thread(target=self._read, daemon=True)
+        self._reader.start()
+        # Contexts used outside of duties cannot stop their background commands: stop them on exit.
+        atexit.register(self.stop)
+
+    def _read(self) -> None:
+        assert self._process.stdout is not None  # noqa: S101
+        for line in iter(self._process.stdout.readline, b""):
+            with self._condition:
+                self._lines.append(line.decode("utf8", errors="replace"))
+                self._condition.notify_all()
+        with self._condition:
+            self._eof = True
+            self._condition.notify_all()
+
+    @property
+    def pid(self) -> int:
+        """The process ID of the command."""
+        return self._process.pid
+
+    @property
+    def output(self) -> str:
+        """The output of the command so far."""
+        with self._condition:
+            return "".join(self._lines)
+
+    @property
+    def returncode(self) -> int | None:
+        """The exit code of the command, or `None` while it is running."""
+        return self._process.poll()
+
+    @property
+    def running(self) -> bool:
+        """Whether the command is still running."""
+        return self._process.poll() is None
+
+    def wait_for_output(self, pattern: str | re.Pattern, timeout: float = 30.0) -> re.Match | None:
+        """Wait for a line of output matching a regular expression.
+
+        Lines already printed by the command are searched too.
+
+        Parameters:
+            pattern: The regular expression.
+            timeout: The maximum time to wait, in seconds.
+
+        Returns:
+            The match, or `None` when the command exited or the timeout expired before a line matched.
+        """
+        regex = re.compile(pattern)
+        deadline = time.monotonic() + timeout
+        searched = 0
+        with self._condition:
+            while True:
+                for line in self._lines[searched:]:
+                    if match := regex.search(line):
+                        return match
+                searched = len(self._lines)
+                remaining = deadline - time.monotonic()
+                if self._eof or remaining <= 0:
+                    return None
+                self._condition.wait(remaining)
+
+    def wait_for_port(self, port: int, host: str = "127.0.0.1", timeout: float = 30.0) -> bool:
+        """Wait for a port to accept connections.
+
+        Parameters:
+            port: The port.
+            host: The host.
+            timeout: The maximum time to wait, in seconds.
+
+        Returns:
+            Whether the port accepted a connection before the command exited or the timeout expired.
+        """
+        deadline = time.monotonic() + timeout
+        while self.running and time.monotonic() < deadline:
+            try:
+                with socket.create_connection((host, port), timeout=_POLL_INTERVAL):
+                    return True
+            except OSError:
+                time.sleep(_POLL_INTERVAL)
+        return False
+
+    def stop(self, timeout: float = _GRACE_PERIOD) -> int:
+        """Stop the command, and the processes it started.
+
+        The processes are asked to terminate, and killed if they are still running after the timeout.
+
+        Parameters:
+            timeout: The time given to processes to terminate, in seconds.
+
+        Returns:
+            The exit code of the command.
+        """
+        if self.running:
+            _signal_group(self.pid)
+            try:
+                self._process.wait(timeout)
+            except subprocess.TimeoutExpired:
+                _signal_group(self.pid, kill=True)
+                self._process.kill()
+                self._process.wait()
+        atexit.unregister(self.stop)
+        # Subprocesses that left the process group could still hold the output open.
+        self._reader.join(timeout)
+        return self._process.returncode
+
+    def __enter__(self) -> Self:
+        return self
+
+    def __exit__(self, *exc_info: object) -> None:
+        self.stop()
@@ -0,0 +1,345 @@
+from __future__ import annotations
+
+import glob
+import hashlib
+import json
+import os
+import platform
+import sys
+import time
+from contextlib import closing, suppress
+from functools import cache
+from pathlib import Path
+from stat import S_ISREG
+from typing import TYPE_CHECKING, Any
+
+if TYPE_CHECKING:
+    import sqlite3
+    from collections.abc import Iterable, Sequence
+
+# Files modified this recently are not recorded in the index,
+# since they could be modified again without their modification time changing.
+_RACY_DELAY_NS = 2_000_000_000
+
+
+def _cache_dir(duties_file: str | None = None) -> Path:
+    # Data persisted between runs lives next to the duties file, unless configured otherwise.
+    if cache_dir := os.getenv("DUTY_CACHE_DIR"):
+        return Path(cache_dir)
+    if duties_file is None:
+        return Path(".duty")
+    return Path(duties_file).parent / ".duty"
+
+
+def _write_atomically(path: Path, contents: str | bytes) -> None:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    temp_path = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+    if isinstance(contents, bytes):
+        temp_path.write_bytes(contents)
+    else:
+        temp_path.write_text(contents, encoding="utf8")
+    temp_path.replace(path)
+
+
+def _digest(*parts: Any) -> str:
+    return hashlib.sha256(repr(parts).encode("utf8")).hexdigest()
+
+
+def _hash_file(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as file:
+        while chunk := file.read(1024 * 1024):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _expand_globs(patterns: Sequence[str]) -> list[str]:
+    # Directories are filtered out when files are hashed, to avoid stating files twice.
+    return sorted({path for pattern in patterns for path in glob.glob(pattern, recursive=True)})
+
+
+class FileIndex:
+    """A persistent index of files contents hashes.
+
+    The index maps the size, modification time and inode of files to the hash
+    of their contents, so that files are only read and hashed again when they changed.
+    It is stored in an SQLite database, shared by all duties and tools,
+    and can safely be used by concurrent processes.
+
+    Examples:
+        ```python
+        from duty import FileIndex, duty
+
+
+        @duty
+        def check_docs(ctx):
+            hashes = FileIndex().hash_globs(["docs/**/*.md"])
+        ```
+    """
+
+    def __init__(self, path: str | Path | None = None) -> None:
+        """Initialize the index.
+
+        Parameters:
+            path: The path to the database file. By default, `files.db` in the `.duty` folder.
+        """
+        self.path = Path(path) if path else _cache_dir() / "files.db"
+        """The path to the database file."""
+        self._entries: dict[str, tuple[int, int, int, str]] | None = None
+
+    def _connect(self) -> sqlite3.Connection:
+        import sqlite3  # noqa: PLC0415
+
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        conn = sqlite3.connect(self.path, timeout=5)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS files "
+            "(path TEXT PRIMARY KEY, size INTEGER, mtime INTEGER, inode INTEGER, hash BLOB) WITHOUT ROWID",
+        )
+        return conn
+
+    def _load(self) -> dict[str, tuple[int, int, int, str]]:
+        import sqlite3  # noqa: PLC0415
+
+        if self._entries is None:
+            try:
+                with closing(self._connect()) as conn:
+                    rows = conn.execute("SELECT path, size, mtime, inode, hash FROM files").fetchall()
+            except (OSError, sqlite3.Error):
+                rows = []
+            self._entries = {path: (size, mtime, inode, digest.hex()) for path, size, mtime, inode, digest in rows}
+        return self._entries
+
+    def _save(self, rows: list[tuple[str, int, int, int, bytes]]) -> None:
+        import sqlite3  # noqa: PLC0415
+
+        # The index is only a cache: failing to update it is not an error.
+        with suppress(OSError, sqlite3.Error), closing(self._connect()) as conn, conn:
+            conn.executemany("INSERT OR REPLACE INTO files VALUES (?, ?, ?, ?, ?)", rows)
+
+    def hash_files(self, paths: Iterable[str]) -> dict[str, str]:
+        """Return the SHA-256 hashes of the contents of the given files.
+
+        Only files that are not indexed yet, or that changed since they were indexed,
+        are actually read and hashed. Missing files and directories are ignored.
+
+        Parameters:
+            paths: The paths of the files to hash.
+
+        Returns:
+            A dictionary mapping the given paths to the hexadecimal hashes of their contents.
+        """
+        entries = self._load()
+        hashes = {}
+        rows = []
+        racy_threshold = time.time_ns() - _RACY_DELAY_NS
+        for path in paths:
+            abs_path = os.path.abspath(path)
+            try:
+                stat = os.stat(abs_path)
+            except OSError:
+                continue
+            if not S_ISREG(stat.st_mode):
+                continue
+            key = (stat.st_size, stat.st_mtime_ns, stat.st_ino)
+            entry = entries.get(abs_path)
+            if entry is not None and entry[:3] == key:
+                hashes[path] = entry[3]
+                continue
+            try:
+                digest = _hash_file(abs_path)
+            except OSError:
+                continue
+            hashes[path] = digest
+            entries[abs_path] = (*key, digest)
+            if stat.st_mtime_ns < racy_threshold:
+                rows.append((abs_path, *key, bytes.fromhex(digest)))
+        if rows:
+            self._save(rows)
+        return hashes
+
+    def hash_globs(self, patterns: Sequence[str]) -> dict[str, str]:
+        """Return the SHA-256 hashes of the contents of the files matching the given glob patterns.
+
+        Parameters:
+            patterns: Glob patterns. `**` matches any number of directories.
+
+        Returns:
+            A dictionary mapping file paths (sorted) to the hexadecimal hashes of their contents.
+        """
+        return self.hash_files(_expand_globs(patterns))
+
+
+@cache
+def _environment() -> tuple:
+    from importlib.metadata import distributions  # noqa: PLC0415
+
+    # Results are only shared between identical interpreters and installed packages (tools).
+    packages = sorted({(str(dist.metadata["Name"]).lower(), dist.version) for dist in distributions()})
+    return sys.implementation.name, sys.version, sys.platform, platform.machine(), packages
+
+
+class _LocalResults:
+    """Results cache stored in a directory, possibly shared (network drive, CI cache, etc.)."""
+
+    def __init__(self, path: str | Path) -> None:
+        self.path = Path(path)
+
+    def get(self, kind: str, key: str) -> bytes | None:
+        try:
+            return (self.path / kind / key).read_bytes()
+        except OSError:
+            return None
+
+    def put(self, kind: str, key: str, data: bytes) -> None:
+        path = self.path / kind / key
+        if kind == "ac" or not path.exists():
+            with suppress(OSError):
+                _write_atomically(path, data)
+
+
+class _HTTPResults:
+    """Results cache stored on an HTTP server, using the same layout as Bazel's HTTP remote cache.
+
+    Results are read with `GET /ac/<key>` and written with `PUT /ac/<key>`,
+    and output files are stored by content hash under `/cas/<hash>`.
+    """
+
+    timeout = 10
+
+    def __init__(self, url: str) -> None:
+        self.url = url.rstrip("/")
+
+    def get(self, kind: str, key: str) -> bytes | None:
+        from urllib.request import urlopen  # noqa: PLC0415
+
+        try:
+            with urlopen(f"{self.url}/{kind}/{key}", timeout=self.timeout) as response:  # noqa: S310
+                return response.read()
+        except (OSError, ValueError):
+            return None
+
+    def put(self, kind: str, key: str, data: bytes) -> None:
+        from urllib.request import Request, urlopen  # noqa: PLC0415
+
+        request = Request(  # noqa: S310
+            f"{self.url}/{kind}/{key}",
+            data=data,
+            method="PUT",
+            headers={"Content-Type": "application/octet-stream"},
+        )
+        # The cache is an optimization: failing to fill it is not an error.
+        with suppress(OSError, ValueError), urlopen(request, timeout=self.timeout):  # noqa: S310
+            pass
+
+
+def _inside_project(path: str) -> bool:
+    # Outputs are recorded relative to the project root (the working directory).
+    relative = Path(path)
+    if relative.is_absolute() or relative.drive or ".." in relative.parts:
+        return False
+    root = Path.cwd().resolve()
+    return (root / relative).resolve().is_relative_to(root)
+
+
+def _result_cache() -> _LocalResults | _HTTPResults | None:
+    location = os.getenv("DUTY_RESULT_CACHE")
+    if not location:
+        return None
+    if location.startswith(("http://", "https://")):
+        return _HTTPResults(location)
+    return _LocalResults(location)
+
+
+class _UpToDate:
+    """Record of the last successful run of a duty or command, to skip it when nothing changed."""
+
+    def __init__(
+        self,
+        cache_dir: Path,
+        key: tuple,
+        inputs: Sequence[str],
+        outputs: Sequence[str] | None = None,
+        *extra: Any,
+        location: str = "",
+    ) -> None:
+        # The location (working directory) only distinguishes local records:
+        # the fingerprint itself only depends on relative paths, to be shareable.
+        self.path = cache_dir / "up-to-date" / f"{_digest(location, *key)}.json"
+        self.index = FileIndex(cache_dir / "files.db")
+        self.fingerprint = _digest(key, self.index.hash_globs(inputs), extra)
+        self.outputs = outputs or []
+        self.printed = ""
+        self.returned = ""
+        self.results = _result_cache()
+
+    @property
+    def result_key(self) -> str:
+        return _digest(self.fingerprint, _environment())
+
+    def check(self) -> bool:
+        try:
+            record = json.loads(self.path.read_text(encoding="utf8"))
+        except (OSError, ValueError):
+            return self._restore()
+        if record.get("fingerprint") != self.fingerprint:
+            return self._restore()
+        if record.get("outputs") != self.index.hash_globs(self.outputs):
+            return self._restore()
+        self.printed = record.get("printed", "")
+        self.returned = record.get("returned", "")
+        return True
+
+    def _restore(self) -> bool:
+        # Fetch the result of an identical run from the shared cache, and restore its output files.
+        if self.results is None or (data := self.results.get("ac", self.result_key)) is None:
+            return False
+        try:
+            result = json.loads(data)
+            if result.get("code") != 0:
+                return False
+            files = {}
+            for path, (digest, mode) in result["outputs"].items():
+                # Entries come from a shared location: never write outside the project.
+                if not _inside_project(path):
+                    return False
+                contents = self.results.get("cas", digest)
+                if contents is None or hashlib.sha256(contents).hexdigest() != digest:
+                    return False
+                files[path] = (contents, int(mode) & 0o777)
+        except (ValueError, TypeError, KeyError):
+            return False
+        for path, (contents, mode) in files.items():
+            _write_atomically(Path(path), contents)
+            os.chmod(path, mode)
+        self.printed = result.get("printed", "")
+        self.returned = result.get("returned", "")
+        self._save_record(self.printed, self.returned)
+        return True
+
+    def _save_record(self, printed: str, returned: str) -> dict[str, str]:
+        outputs = self.index.hash_globs(self.outputs)
+        record = {
+            "fingerprint": self.fingerprint,
+            "outputs": outputs,
+            "printed": printed,
+            "returned": returned,
+        }
+        with suppress(OSError):
+            _write_atomically(self.path, json.dumps(record))
+        return outputs
+
+    def save(self, printed: str, returned: str = "") -> None:
+        outputs = self._save_record(printed, returned)
+        if self.results is None:
+            return
+        # Output files are stored by content, and must be uploaded before the result referencing them.
+        modes = {}
+        for path, digest in outputs.items():
+            with suppress(OSError):
+                self.results.put("cas", digest, Path(path).read_bytes())
+                modes[path] = (digest, Path(path).stat().st_mode & 0o777)
+        if len(modes) == len(outputs):
+            result = {"code": 0, "outputs": modes, "printed": printed, "returned": returned}
+            self.results.put("ac", self.result_key, json.dumps(result).encode("utf8"))
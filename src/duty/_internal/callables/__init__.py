@@ -3,26 +3,29 @@
 from __future__ import annotations
 
 import warnings
+from importlib import import_module
+from typing import Any
 
-from duty._internal.callables import (
-    autoflake,  # noqa: F401
-    black,  # noqa: F401
-    blacken_docs,  # noqa: F401
-    build,  # noqa: F401
-    coverage,  # noqa: F401
-    flake8,  # noqa: F401
-    git_changelog,  # noqa: F401
-    griffe,  # noqa: F401
-    interrogate,  # noqa: F401
-    isort,  # noqa: F401
-    mkdocs,  # noqa: F401
-    mypy,  # noqa: F401
-    pytest,  # noqa: F401
-    ruff,  # noqa: F401
-    safety,  # noqa: F401
-    ssort,  # noqa: F401
-    twine,  # noqa: F401
-)
+# Callables modules are imported lazily (PEP 562): each one is only imported when used.
+_callables = {
+    "autoflake",
+    "black",
+    "blacken_docs",
+    "build",
+    "coverage",
+    "flake8",
+    "git_changelog",
+    "griffe",
+    "interrogate",
+    "isort",
+    "mkdocs",
+    "mypy",
+    "pytest",
+    "ruff",
+    "safety",
+    "ssort",
+    "twine",
+}
 
 warnings.warn(
     "Callables are deprecated in favor of our new `duty.tools`. "
@@ -32,3 +35,9 @@ warnings.warn(
     DeprecationWarning,
     stacklevel=1,
 )
+
+
+def __getattr__(name: str) -> Any:
+    if name not in _callables:
+        raise AttributeError(f"module '{__name__}' has no attribute '{name}'")
+    return import_module(f"{__name__}.{name}")
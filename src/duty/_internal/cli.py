@@ -13,17 +13,25 @@ from __future__ import annotations
 
 import argparse
 import inspect
+import os
 import sys
 import textwrap
 from pathlib import Path
-from typing import Any
+from typing import TYPE_CHECKING, Any
 
-from failprint import ArgParser, add_flags
+from duty._internal.cache import _cache_dir
+from duty._internal.exceptions import DutyCycleError, DutyFailure
+from duty._internal.server import _client, _run_server, _server_address
 
-from duty._internal import debug
-from duty._internal.collection import Collection, Duty
-from duty._internal.exceptions import DutyFailure
-from duty._internal.validation import validate
+# Heavier modules (failprint, collection, etc.) are imported when needed,
+# to print the version or debug information as fast as possible.
+if TYPE_CHECKING:
+    from failprint import ArgParser
+
+    from duty._internal.collection import Collection, Duty
+
+# Collections already loaded by a server, by real path of their duties file.
+_preloaded: dict[str, Collection] = {}
 
 empty = inspect.Signature.empty
 """Empty value for a parameter's default value."""
@@ -34,16 +42,37 @@ class _DebugInfo(argparse.Action):
         super().__init__(nargs=nargs, **kwargs)
 
     def __call__(self, *args: Any, **kwargs: Any) -> None:  # noqa: ARG002
+        from duty._internal import debug  # noqa: PLC0415
+
         debug._print_debug_info()
         sys.exit(0)
 
 
+def _resource(value: str) -> tuple[str, int]:
+    name, _, capacity = value.partition("=")
+    try:
+        return name, int(capacity)
+    except ValueError as error:
+        raise argparse.ArgumentTypeError(f"invalid resource capacity: '{value}' (expected NAME=N)") from error
+
+
+def _matrix_axis(value: str) -> tuple[str, list[str]]:
+    name, _, values = value.partition("=")
+    if not name or not values:
+        raise argparse.ArgumentTypeError(f"invalid matrix: '{value}' (expected PARAM=V1,V2,...)")
+    return name, values.split(",")
+
+
 def get_parser() -> ArgParser:
     """Return the CLI argument parser.
 
     Returns:
         An argparse parser.
     """
+    from failprint import ArgParser, add_flags  # noqa: PLC0415
+
+    from duty._internal import debug  # noqa: PLC0415
+
     usage = "duty [GLOBAL_OPTS...] [DUTY [DUTY_OPTS...] [DUTY_PARAMS...]...]"
     description = "A simple task runner."
     parser = ArgParser(add_help=False, usage=usage, description=description)
@@ -69,10 +98,88 @@ def get_parser() -> ArgParser:
         metavar="DUTY",
         help="Show this help message and exit. Pass duties names to print their help.",
     )
+    parser.add_argument(
+        "-j",
+        "--jobs",
+        type=int,
+        metavar="N",
+        help="Run up to N duties concurrently (0 for the number of CPUs). "
+        "Default: 1, or the job slots of make when run from 'make -j'.",
+    )
+    parser.add_argument(
+        "--resource",
+        dest="resources",
+        action="append",
+        type=_resource,
+        default=[],
+        metavar="NAME=N",
+        help="Capacity of a resource that duties can declare (repeatable). "
+        "The capacity of 'cpu' is the number of jobs, other resources have a capacity of 1 by default.",
+    )
+    parser.add_argument(
+        "--matrix",
+        action="append",
+        type=_matrix_axis,
+        default=[],
+        metavar="PARAM=V1,V2",
+        help="Run the selected duties once per value of the given parameter (repeatable, for combinations). "
+        "Cells run concurrently (see -j), and a table of results is printed at the end.",
+    )
+    parser.add_argument(
+        "--worker",
+        metavar="ADDRESS",
+        help="Serve the duties to clients (see --workers) on the given address: "
+        "HOST:PORT for a TCP socket (requires a secret in DUTY_WORKER_TOKEN), or unix:PATH for a Unix socket.",
+    )
+    parser.add_argument(
+        "--server",
+        action="store_true",
+        help="Serve commands to other duty processes (clients) on a Unix socket: "
+        "commands start immediately, in processes forked from this one, with duties and tools already imported. "
+        "Socket: the DUTY_SERVER environment variable, or '.duty/server.sock'.",
+    )
+    parser.add_argument(
+        "--no-server",
+        action="store_true",
+        help="Run in this process, even if a server is running.",
+    )
+    parser.add_argument(
+        "--shutdown-daemons",
+        action="store_true",
+        help="Stop the daemons started by tools (for example by 'tools.mypy(daemon=True)'), and exit.",
+    )
+    parser.add_argument(
+        "--workers",
+        type=lambda value: value.split(","),
+        default=[],
+        metavar="ADDRESS,...",
+        help="Dispatch duties to the given workers (one duty at a time per worker, repeat an address for more).",
+    )
+    failures = parser.add_mutually_exclusive_group()
+    failures.add_argument(
+        "--fail-fast",
+        action="store_true",
+        help="When running duties concurrently, terminate all running duties and their commands as soon as one fails.",
+    )
+    failures.add_argument(
+        "-k",
+        "--keep-going",
+        action="store_true",
+        help="Keep running other duties when one fails, and print a summary of all failures at the end.",
+    )
+    parser.add_argument(
+        "--result-cache",
+        metavar="LOCATION",
+        help="Directory or HTTP(S) URL of a cache shared between runs and machines, "
+        "to reuse the results of duties and commands declaring their inputs. "
+        "Default: the DUTY_RESULT_CACHE environment variable.",
+    )
     parser.add_argument(
         "--completion",
         dest="completion",
-        action="store_true",
+        nargs="?",
+        const="bash",
+        choices=("bash", "zsh", "fish"),
         help=argparse.SUPPRESS,
     )
     parser.add_argument(
@@ -140,6 +247,8 @@ def get_duty_parser(duty: Duty) -> ArgParser:
     Returns:
         A duty-specific parser.
     """
+    from failprint import ArgParser, add_flags  # noqa: PLC0415
+
     parser = ArgParser(
         prog=f"duty {duty.name}",
         add_help=False,
@@ -192,6 +301,8 @@ def parse_args(duty: Duty, args: list[str]) -> tuple:
     Returns:
         The positional and keyword arguments.
     """
+    from duty._internal.validation import validate  # noqa: PLC0415
+
     posargs = []
     kwargs = {}
 
@@ -266,22 +377,72 @@ def main(args: list[str] | None = None) -> int:
     Returns:
         An exit code.
     """
+    # Fast paths, skipping the parser and the import of failprint.
+    argv = sys.argv[1:] if args is None else args
+    if argv in (["-V"], ["--version"], ["--debug-info"]):
+        from duty._internal import debug  # noqa: PLC0415
+
+        if argv == ["--debug-info"]:
+            debug._print_debug_info()
+        else:
+            print(f"duty {debug._get_version()}")
+        sys.exit(0)
+
+    # Thin client: run the command on the server, if one is running.
+    if not {"--server", "--no-server", "--worker"} & set(argv) and (code := _client(argv)) is not None:
+        return code
+
+    from duty._internal.collection import Collection, _expand_matrix  # noqa: PLC0415
+    from duty._internal.jobserver import _inherited_jobs  # noqa: PLC0415
+    from duty._internal.metadata import _save_completions  # noqa: PLC0415
+    from duty._internal.worker import _serve  # noqa: PLC0415
+
     parser = get_parser()
     opts = parser.parse_args(args=args)
     remainder = opts.remainder
 
-    collection = Collection(opts.duties_file)
-    collection.load()
+    if opts.result_cache:
+        # Set through the environment so that children processes use it too.
+        os.environ["DUTY_RESULT_CACHE"] = opts.result_cache
 
     if opts.completion:
-        print(Path(__file__).parent.joinpath("completions.bash").read_text())
+        print(Path(__file__).parent.parent.joinpath(f"completions.{opts.completion}").read_text())
         return 0
 
+    if opts.shutdown_daemons:
+        from duty._internal.tools._mypy import _shutdown_daemons  # noqa: PLC0415
+
+        # Tools start daemons from the working directory, whatever the duties file.
+        return _shutdown_daemons(_cache_dir())
+
+    collection = _preloaded.get(os.path.realpath(opts.duties_file))
+    if collection is None:
+        collection = Collection(opts.duties_file)
+        try:
+            if not (opts.worker or opts.server) and (
+                opts.complete or opts.help is not None or opts.list or not remainder
+            ):
+                # Listing duties does not require running the duties file.
+                collection.load_metadata()
+            else:
+                collection.load()
+        except DutyCycleError as error:
+            print(f"> {error}", file=sys.stderr)
+            return 1
+
+    if opts.worker:
+        return _serve(collection, opts.worker)
+
+    if opts.server:
+        return _run_server(collection, _server_address())
+
     if opts.complete:
-        words = collection.completion_candidates(remainder)
-        words += sorted(
+        options = sorted(
             opt for opt, action in parser._option_string_actions.items() if action.help != argparse.SUPPRESS
         )
+        # Let completion scripts find candidates without running duty next time.
+        _save_completions(opts.duties_file, collection, options)
+        words = collection.completion_candidates(remainder) + options
         print(*words, sep="\n")
         return 0
 
@@ -305,18 +466,53 @@ def main(args: list[str] | None = None) -> int:
 
     global_opts = specified_options(
         opts,
-        exclude={"duties_file", "list", "help", "remainder", "complete", "completion"},
+        exclude={
+            "duties_file",
+            "list",
+            "help",
+            "remainder",
+            "complete",
+            "completion",
+            "jobs",
+            "result_cache",
+            "fail_fast",
+            "keep_going",
+            "resources",
+            "matrix",
+            "worker",
+            "workers",
+            "server",
+            "no_server",
+            "shutdown_daemons",
+        },
     )
+    matrix = dict(opts.matrix)
     try:
         commands = parse_commands(arg_lists, global_opts, collection)
+        # Validate matrix values early.
+        _expand_matrix(commands, matrix)
     except TypeError as error:
         print(f"> {error}", file=sys.stderr)
         return 1
 
-    for duty, posargs, kwargs in commands:
-        try:
-            duty.run(*posargs, **kwargs)
-        except DutyFailure as failure:
-            return failure.code
+    jobs = opts.jobs
+    if jobs is None:
+        jobs = _inherited_jobs()
+        if jobs == 1 and (matrix or any(duty.matrix for duty, _, _ in commands)):
+            # Matrix cells run concurrently by default.
+            jobs = 0
+
+    try:
+        collection.run(
+            commands,
+            jobs=jobs,
+            fail_fast=opts.fail_fast,
+            keep_going=opts.keep_going,
+            resources=dict(opts.resources),
+            matrix=matrix,
+            workers=opts.workers,
+        )
+    except DutyFailure as failure:
+        return failure.code
 
     return 0
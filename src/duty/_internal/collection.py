@@ -1,18 +1,102 @@
 from __future__ import annotations
 
 import inspect
+import os
 import sys
+from contextlib import contextmanager
+from contextvars import ContextVar
 from copy import deepcopy
 from importlib import util as importlib_util
-from typing import Any, Callable, ClassVar, Union
+from itertools import product
+from typing import TYPE_CHECKING, Any, Callable, ClassVar, Union
 
+from duty._internal.cache import _cache_dir, _UpToDate
 from duty._internal.context import Context
+from duty._internal.exceptions import DutyCycleError, DutyFailure
+from duty._internal.jobserver import _jobserver
+from duty._internal.metadata import _cached_metadata, _loaded_modules, _placeholder, _save_metadata, _scan_duties
+from duty._internal.scheduler import (
+    _START_METHOD,
+    _build_jobs,
+    _history_file,
+    _print_failures,
+    _respawn_spec,
+    _run_jobs,
+)
+from duty._internal.tee import _tee
+from duty._internal.validation import validate
+
+if TYPE_CHECKING:
+    from collections.abc import Iterator, Sequence
 
 DutyListType = list[Union[str, Callable, "Duty"]]
 """Type of a list of duties, which can be a list of strings, callables, or Duty instances."""
+CommandType = Union[str, tuple["Duty", Union[list, tuple], dict[str, Any]]]
+"""Type of a command run by a collection: a duty name, or a duty with its positional and keyword arguments."""
 default_duties_file = "duties.py"
 """Default path to the duties file, relative to the current working directory."""
 
+# Keys of the duties already run during the current invocation.
+_executed: ContextVar[set[tuple] | None] = ContextVar("_executed", default=None)
+
+
+@contextmanager
+def _invocation() -> Iterator[set[tuple]]:
+    executed = _executed.get()
+    if executed is not None:
+        yield executed
+        return
+    executed = set()
+    token = _executed.set(executed)
+    try:
+        yield executed
+    finally:
+        _executed.reset(token)
+
+
+def _call(function: Callable, *args: Any, **kwargs: Any) -> Any:
+    result = function(*args, **kwargs)
+    if not inspect.iscoroutine(result):
+        return result
+    import asyncio  # noqa: PLC0415
+    from concurrent.futures import ThreadPoolExecutor  # noqa: PLC0415
+
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        return asyncio.run(result)
+    # Already within an event loop (an async duty running another duty):
+    # drive the coroutine with another event loop, in another thread.
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        return executor.submit(asyncio.run, result).result()
+
+
+def _duty_key(item: Duty | Callable, args: Sequence = (), kwargs: dict[str, Any] | None = None) -> tuple:
+    if isinstance(item, Duty):
+        return (item.name, repr(tuple(args)), repr(sorted((kwargs or {}).items())))
+    return ("callable", id(item))
+
+
+def _expand_matrix(
+    commands: Sequence[tuple[Duty, Sequence, dict[str, Any]]],
+    matrix: dict[str, list[Any]] | None = None,
+) -> tuple[list[tuple[Duty, Sequence, dict[str, Any]]], dict[tuple, dict[str, Any]]]:
+    # Replace commands of duties with a matrix by one command per combination of values (cell),
+    # and return the cells by job key.
+    expanded = []
+    cells = {}
+    for duty, args, kwargs in commands:
+        axes = {**duty.matrix, **(matrix or {})}
+        if not axes:
+            expanded.append((duty, args, kwargs))
+            continue
+        for values in product(*axes.values()):
+            cell = dict(zip(axes, values))
+            cell_args, cell_kwargs = validate(duty.function, *args, **{**kwargs, **cell})
+            expanded.append((duty, cell_args, cell_kwargs))
+            cells[_duty_key(duty, cell_args, cell_kwargs)] = cell
+    return expanded, cells
+
 
 class Duty:
     """The main duty class."""
@@ -30,6 +114,14 @@ class Duty:
         pre: DutyListType | None = None,
         post: DutyListType | None = None,
         opts: dict[str, Any] | None = None,
+        *,
+        pre_parallel: bool | int = False,
+        post_parallel: bool | int = False,
+        inputs: list[str] | None = None,
+        outputs: list[str] | None = None,
+        resources: dict[str, int | str] | None = None,
+        locks: list[str] | None = None,
+        matrix: dict[str, list[Any]] | None = None,
     ) -> None:
         """Initialize the duty.
 
@@ -42,6 +134,18 @@ class Duty:
             pre: A list of duties to run before this one.
             post: A list of duties to run after this one.
             opts: Options used to create the context instance.
+            pre_parallel: Whether pre-duties can run concurrently.
+                An integer limits the number of concurrent pre-duties.
+            post_parallel: Whether post-duties can run concurrently.
+                An integer limits the number of concurrent post-duties.
+            inputs: Glob patterns of the files the duty depends on.
+                When declared, the duty is skipped if its inputs, arguments, options
+                and outputs did not change since its last successful run.
+            outputs: Glob patterns of the files the duty produces.
+            resources: Amounts of resources the duty needs when running concurrently with other duties,
+                for example `{"cpu": "all"}`. Each duty uses one `cpu` slot by default.
+            locks: Names of locks the duty holds while running: duties sharing a lock never run concurrently.
+            matrix: Values of parameters of the duty: the duty is run once for each combination of values.
         """
         self.name = name
         """The duty name."""
@@ -55,6 +159,20 @@ class Duty:
         """A list of duties to run before this one."""
         self.post = post or []
         """A list of duties to run after this one."""
+        self.pre_parallel = pre_parallel
+        """Whether pre-duties can run concurrently (an integer limits their concurrency)."""
+        self.post_parallel = post_parallel
+        """Whether post-duties can run concurrently (an integer limits their concurrency)."""
+        self.inputs = inputs or []
+        """Glob patterns of the files the duty depends on."""
+        self.outputs = outputs or []
+        """Glob patterns of the files the duty produces."""
+        self.resources = resources or {}
+        """Amounts of resources the duty needs (integers, or `"all"`)."""
+        self.locks = locks or []
+        """Names of locks the duty holds while running."""
+        self.matrix = matrix or {}
+        """Values of parameters of the duty, to run it once for each combination of values."""
         self.options = opts or self.default_options
         """Options used to create the context instance."""
         self.options_override: dict = {}
@@ -85,40 +203,107 @@ class Duty:
         """
         self(self.context, *args, **kwargs)
 
-    def run_duties(self, context: Context, duties_list: DutyListType) -> None:
+    def _resolve_duty(self, duty_item: str | Callable | Duty) -> Duty | Callable | None:
+        if isinstance(duty_item, str):
+            # Item is a reference to a duty.
+            if self.collection is None:
+                raise RuntimeError(f"Can't find duty by name without a collection ({duty_item})")
+            return self.collection.get(duty_item)
+        if callable(duty_item):
+            # Item is a proper duty, or a callable.
+            return duty_item
+        return None
+
+    def _run_function(self, context: Context, *args: Any, **kwargs: Any) -> None:
+        # Commands started in the background by the duty are stopped when it finishes or fails.
+        with context._stopping_background():
+            self._call_function(context, *args, **kwargs)
+
+    def _call_function(self, context: Context, *args: Any, **kwargs: Any) -> None:
+        if not self.inputs:
+            _call(self.function, context, *args, **kwargs)
+            return
+
+        try:
+            source = inspect.getsource(self.function)
+        except (OSError, TypeError):
+            source = ""
+        up_to_date = _UpToDate(
+            _cache_dir(self.collection.path if self.collection else None),
+            ("duty", self.name, repr(args), repr(sorted(kwargs.items()))),
+            self.inputs,
+            self.outputs,
+            source,
+            repr(sorted(self.options.items())),
+            repr(sorted(self.options_override.items())),
+        )
+        if up_to_date.check():
+            print(up_to_date.printed, end="", flush=True)  # noqa: T201
+            return
+
+        # Record output to replay it when the duty is up-to-date.
+        with _tee() as recorded:
+            _call(self.function, context, *args, **kwargs)
+        up_to_date.save(str(recorded))
+
+    def run_duties(self, context: Context, duties_list: DutyListType, *, parallel: bool | int = False) -> None:
         """Run a list of duties.
 
+        Within a single invocation (one `duty` command, or one call to a duty),
+        each duty is run at most once: duties that already ran are skipped.
+
         Parameters:
             context: The context to use.
             duties_list: The list of duties to run.
+            parallel: Whether to run the duties concurrently, in child processes.
+                An integer limits the number of concurrent duties,
+                otherwise it is the number of CPUs.
+                Ignored on platforms that cannot fork processes.
 
         Raises:
             RuntimeError: When a duty name is given to pre or post duties.
                 Indeed, without a parent collection, it is impossible
                 to find another duty by its name.
+            DutyFailure: When duties run concurrently and one of them fails.
         """
+        executed = _executed.get()
+        if parallel and len(duties_list) > 1 and _START_METHOD == "fork":
+            resolved_items = [resolved for item in duties_list if (resolved := self._resolve_duty(item)) is not None]
+            jobs = _build_jobs([(item, (), {}) for item in resolved_items], context=context, skip=executed)
+            max_jobs = (os.cpu_count() or 1) if parallel is True else int(parallel)
+            history = _history_file(self.collection.path) if self.collection else None
+            with _jobserver(max_jobs) as jobserver:
+                code = _run_jobs(jobs, max_jobs=max_jobs, history=history, jobserver=jobserver, estimate=False)
+            if executed is not None:
+                executed.update(job.key for job in jobs)
+            if code:
+                raise DutyFailure(code)
+            return
+
         for duty_item in duties_list:
-            if callable(duty_item):
-                # Item is a proper duty, or a callable: run it.
-                duty_item(context)
-            elif isinstance(duty_item, str):
-                # Item is a reference to a duty.
-                if self.collection is None:
-                    raise RuntimeError(f"Can't find duty by name without a collection ({duty_item})")
-                # Get the duty and run it.
-                self.collection.get(duty_item)(context)
+            if (resolved := self._resolve_duty(duty_item)) is None:
+                continue
+            if executed is not None:
+                key = _duty_key(resolved)
+                if key in executed:
+                    continue
+                executed.add(key)
+            _call(resolved, context)
 
     def __call__(self, context: Context, *args: Any, **kwargs: Any) -> None:
         """Run the duty function.
 
+        Coroutine functions (`async def`) are run in an event loop.
+
         Parameters:
             context: The context to use.
             args: Positional arguments passed to the function.
             kwargs: Keyword arguments passed to the function.
         """
-        self.run_duties(context, self.pre)
-        self.function(context, *args, **kwargs)
-        self.run_duties(context, self.post)
+        with _invocation():
+            self.run_duties(context, self.pre, parallel=self.pre_parallel)
+            self._run_function(context, *args, **kwargs)
+            self.run_duties(context, self.post, parallel=self.post_parallel)
 
 
 class Collection:
@@ -234,13 +419,180 @@ class Collection:
         Parameters:
             path: The path to the Python file to load.
                 Uses the collection's path by default.
+
+        Raises:
+            DutyCycleError: When pre- and post-duties form a cycle.
         """
         path = path or self.path
         spec = importlib_util.spec_from_file_location("duty.duties", path)
         if spec:
             duties = importlib_util.module_from_spec(spec)
+            modules = set(sys.modules)
             sys.modules["duty.duties"] = duties
             spec.loader.exec_module(duties)  # type: ignore[union-attr]
             declared_duties = inspect.getmembers(duties, lambda member: isinstance(member, Duty))
             for _, duty in declared_duties:
                 self.add(duty)
+            self.check_cycles()
+            _save_metadata(path, self, _loaded_modules(modules))
+
+    def load_metadata(self, path: str | None = None) -> None:
+        """Load duties metadata from a Python file, without executing it when possible.
+
+        Metadata (names, aliases, descriptions and parameters) are enough
+        to list duties, print their help, or complete their parameters.
+        They are cached each time the file is loaded, until the file
+        or the modules it imports change. When the cache is cold,
+        duties are found by scanning the file, and the file is only loaded
+        when its duties cannot be found this way.
+
+        Duties loaded this way cannot run.
+
+        Parameters:
+            path: The path to the Python file to load.
+                Uses the collection's path by default.
+        """
+        path = path or self.path
+        metadata = _cached_metadata(path)
+        if metadata is None:
+            metadata = _scan_duties(path)
+        if metadata is None:
+            self.load(path)
+            return
+        for info in metadata:
+            function = _placeholder(info["name"], info["parameters"])
+            self.add(Duty(info["name"], info["description"], function, aliases=set(info["aliases"])))
+
+    def check_cycles(self) -> None:
+        """Check that pre- and post-duties do not form cycles.
+
+        Duties referenced by unknown names are ignored.
+
+        Raises:
+            DutyCycleError: When a cycle is found.
+        """
+        checked: set[str] = set()
+
+        def visit(duty: Duty, path: list[str]) -> None:
+            if duty.name in path:
+                raise DutyCycleError([*path[path.index(duty.name) :], duty.name])
+            if duty.name in checked:
+                return
+            path.append(duty.name)
+            for duty_item in (*duty.pre, *duty.post):
+                try:
+                    resolved = duty._resolve_duty(duty_item)
+                except (KeyError, RuntimeError):
+                    continue
+                if isinstance(resolved, Duty):
+                    visit(resolved, path)
+            path.pop()
+            checked.add(duty.name)
+
+        for duty in self.duties.values():
+            visit(duty, [])
+
+    def run(
+        self,
+        commands: Sequence[CommandType],
+        *,
+        jobs: int = 1,
+        fail_fast: bool = False,
+        keep_going: bool = False,
+        resources: dict[str, int] | None = None,
+        matrix: dict[str, list[Any]] | None = None,
+        workers: Sequence[str] = (),
+    ) -> None:
+        """Run duties.
+
+        Pre- and post-duties are deduplicated: within a single run,
+        each duty is executed at most once for a given set of arguments,
+        whether it is selected directly or required by other duties.
+
+        With more than one job, duties run concurrently in child processes,
+        following the order constraints of pre- and post-duties.
+        Durations are recorded in a `.duty` folder next to the duties file,
+        and used in subsequent runs to start the duties on the longest
+        chain of remaining work first.
+        The output of each duty is captured and printed as a whole,
+        in the order the duties would have run sequentially.
+        Once a duty fails, no other duty is started, and running duties are waited for.
+        When run from `make -j`, job slots are shared with make through its jobserver.
+        Otherwise, a jobserver is served to the commands run by duties,
+        so that tools supporting it (make, ninja, cargo, etc.) do not start more jobs than allowed.
+        Duties only start when the resources they need are available,
+        and when no running duty holds one of their locks.
+
+        Parameters:
+            commands: Duties names, or tuples of duty, positional arguments and keyword arguments
+                (as returned by [`parse_commands`][duty.parse_commands]).
+            jobs: Maximum number of duties to run concurrently.
+                Zero means the number of CPUs.
+            fail_fast: Once a duty fails, terminate the running duties and the commands they run
+                (SIGTERM, then SIGKILL after a grace period).
+            keep_going: Once a duty fails, keep running the other duties
+                (except the ones depending on it), and print a summary of all failures at the end.
+            resources: Capacities of the resources duties can declare (see [`Duty`][duty.Duty]).
+                The capacity of `cpu` is the number of jobs, other resources have a capacity of 1 by default.
+            matrix: Values of parameters, added to the matrix of each duty.
+                Duties with a matrix are run once per combination of values (cell), in child processes,
+                even with a single job. Their output is prefixed with the cell values,
+                a table of results is printed at the end, and other cells keep running
+                when one fails, unless `fail_fast` is enabled.
+            workers: Addresses of workers (started with `duty --worker ADDRESS`) to dispatch duties to.
+                Each worker runs one duty at a time, and duties run locally when all workers are busy.
+                The number of jobs is at least the number of workers.
+
+        Raises:
+            ValueError: When both `fail_fast` and `keep_going` are enabled.
+            TypeError: When matrix values do not match the parameters of a duty.
+            DutyFailure: When a duty fails. The code is the one of the first failed duty, in the given order.
+        """
+        if fail_fast and keep_going:
+            raise ValueError("fail_fast and keep_going are mutually exclusive")
+        parsed, cells = _expand_matrix(
+            [(self.get(command), (), {}) if isinstance(command, str) else command for command in commands],
+            matrix,
+        )
+        jobs = jobs or os.cpu_count() or 1
+        if workers:
+            jobs = max(jobs, len(workers))
+        if cells:
+            keep_going = not fail_fast
+
+        if jobs == 1 and not cells and not workers:
+            failures: list[tuple[str, int | None]] = []
+            with _invocation() as executed:
+                for duty, posargs, kwargs in parsed:
+                    key = _duty_key(duty, posargs, kwargs)
+                    if key in executed:
+                        continue
+                    executed.add(key)
+                    try:
+                        duty.run(*posargs, **kwargs)
+                    except DutyFailure as failure:
+                        if not keep_going:
+                            raise
+                        failures.append((duty.name, failure.code))
+            if failures:
+                _print_failures(failures)
+                raise DutyFailure(failures[0][1] or 1)
+            return
+
+        jobs_graph = _build_jobs(parsed)
+        for job in jobs_graph:
+            job.cell = cells.get(job.key, {})
+        with _jobserver(jobs) as jobserver:
+            code = _run_jobs(
+                jobs_graph,
+                max_jobs=jobs,
+                respawn=_respawn_spec(self, parsed),
+                history=_history_file(self.path),
+                fail_fast=fail_fast,
+                keep_going=keep_going,
+                resources=resources,
+                jobserver=jobserver,
+                workers=workers,
+            )
+        if code:
+            raise DutyFailure(code)
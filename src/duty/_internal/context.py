@@ -1,16 +1,27 @@
 from __future__ import annotations
 
+import asyncio
+import inspect
+import io
 import os
-from contextlib import contextmanager, suppress
-from typing import TYPE_CHECKING, Any, Callable, Union
+import sys
+from contextlib import contextmanager, nullcontext, suppress
+from typing import TYPE_CHECKING, Any, Callable, Literal, Union, overload
 
+from failprint import Capture, printable_command
 from failprint import run as failprint_run
 
+from duty._internal.cache import _cache_dir, _UpToDate
 from duty._internal.exceptions import DutyFailure
+from duty._internal.processes import _GRACE_PERIOD, _signal_group
+from duty._internal.tee import _tee
 from duty._internal.tools._base import Tool
 
 if TYPE_CHECKING:
     from collections.abc import Iterator
+    from pathlib import Path
+
+    from duty._internal.background import BackgroundProcess
 
 CmdType = Union[str, list[str], Callable]
 """Type of a command that can be run in a subprocess or as a Python callable."""
@@ -33,6 +44,7 @@ class Context:
         self._options = options
         self._option_stack: list[dict[str, Any]] = []
         self._options_override = options_override or {}
+        self._background: list[BackgroundProcess] = []
 
     @contextmanager
     def cd(self, directory: str) -> Iterator:
@@ -54,33 +66,66 @@ class Context:
         finally:
             os.chdir(old_wd)
 
-    def run(self, cmd: CmdType, **options: Any) -> str:
+    def _final_options(self, cmd: CmdType, options: dict[str, Any]) -> dict[str, Any]:
+        final_options = dict(self._options)
+        final_options.update(options)
+
+        if "command" not in final_options and isinstance(cmd, Tool):
+            with suppress(ValueError):
+                final_options["command"] = cmd.cli_command
+
+        allow_overrides = final_options.pop("allow_overrides", True)
+
+        if allow_overrides:
+            final_options.update(self._options_override)
+
+        return final_options
+
+    @overload
+    def run(self, cmd: CmdType, *, background: Literal[True], **options: Any) -> BackgroundProcess: ...
+
+    @overload
+    def run(self, cmd: CmdType, **options: Any) -> str: ...
+
+    def run(self, cmd: CmdType, **options: Any) -> str | BackgroundProcess:
         """Run a command in a subprocess or a Python callable.
 
         Parameters:
             cmd: A command or a Python callable.
             options: Options passed to `failprint` functions.
+                Additionally, `workdir` changes the working directory while running the command,
+                and `inputs` and `outputs` (lists of glob patterns) skip the command
+                and replay its output when its inputs, options and outputs
+                did not change since its last successful run.
+                With `pool=True`, tools (instances of [`Tool`][duty.Tool]) run in a process
+                forked from a warm process that already imported them, instead of this process.
+                With `background=True`, the command (a string, a list of strings or a tool providing a CLI)
+                is started in the background, and a [`BackgroundProcess`][duty.BackgroundProcess] is returned
+                once the command is ready: when it printed a line matching the `ready_output` regular expression,
+                or when the `ready_port` port accepts connections, within `ready_timeout` seconds (default: 30).
+                Background commands are stopped when the duty finishes or fails.
 
         Raises:
-            DutyFailure: When the exit code / function result is greather than 0.
+            DutyFailure: When the exit code / function result is greather than 0,
+                or when a background command exits or times out before being ready.
 
         Returns:
-            The output of the command.
+            The output of the command, or the background process.
         """
-        final_options = dict(self._options)
-        final_options.update(options)
-
-        if "command" not in final_options and isinstance(cmd, Tool):
-            with suppress(ValueError):
-                final_options["command"] = cmd.cli_command
-
-        allow_overrides = final_options.pop("allow_overrides", True)
+        final_options = self._final_options(cmd, options)
+        if final_options.pop("background", False):
+            return self._run_in_background(cmd, final_options)
         workdir = final_options.pop("workdir", None)
+        inputs = final_options.pop("inputs", None)
+        outputs = final_options.pop("outputs", None)
+        if final_options.pop("pool", False):
+            cmd = _pooled(cmd, final_options)
 
-        if allow_overrides:
-            final_options.update(self._options_override)
+        cache_dir = _cache_dir().absolute()
 
         with self.cd(workdir):
+            if inputs:
+                return self._run_unless_up_to_date(cmd, final_options, cache_dir, inputs, outputs)
             try:
                 result = failprint_run(cmd, **final_options)
             except KeyboardInterrupt as ki:
@@ -91,6 +136,174 @@ class Context:
 
         return result.output
 
+    def _up_to_date(
+        self,
+        cmd: CmdType,
+        final_options: dict[str, Any],
+        cache_dir: Path,
+        inputs: list[str],
+        outputs: list[str] | None,
+    ) -> _UpToDate:
+        command = final_options.get("command") or printable_command(
+            cmd,
+            final_options.get("args"),
+            final_options.get("kwargs"),
+        )
+        return _UpToDate(
+            cache_dir,
+            ("run", command, final_options.get("title")),
+            inputs,
+            outputs,
+            repr(sorted(final_options.items())),
+            location=os.getcwd(),
+        )
+
+    def _run_unless_up_to_date(
+        self,
+        cmd: CmdType,
+        final_options: dict[str, Any],
+        cache_dir: Path,
+        inputs: list[str],
+        outputs: list[str] | None,
+    ) -> str:
+        up_to_date = self._up_to_date(cmd, final_options, cache_dir, inputs, outputs)
+        if up_to_date.check():
+            print(up_to_date.printed, end="", flush=True)  # noqa: T201
+            return up_to_date.returned
+
+        # Record what failprint prints to replay it when the command is up-to-date.
+        with _tee() as recorded:
+            try:
+                result = failprint_run(cmd, **final_options)
+            except KeyboardInterrupt as ki:
+                raise DutyFailure(130) from ki
+
+        if result.code:
+            raise DutyFailure(result.code)
+
+        up_to_date.save(str(recorded), result.output)
+        return result.output
+
+    def _run_in_background(self, cmd: CmdType, final_options: dict[str, Any]) -> BackgroundProcess:
+        from duty._internal.background import BackgroundProcess  # noqa: PLC0415
+
+        workdir = final_options.pop("workdir", None)
+        ready_output = final_options.pop("ready_output", None)
+        ready_port = final_options.pop("ready_port", None)
+        ready_timeout = final_options.pop("ready_timeout", 30.0)
+        for option in ("inputs", "outputs", "pool", "stdin", "pty", "args", "kwargs"):
+            final_options.pop(option, None)
+        if isinstance(cmd, Tool):
+            cmd = [cmd.cli_name, *cmd.cli_args] if cmd.cli_name else cmd
+        if callable(cmd):
+            raise TypeError(f"Only commands can run in the background, not Python callables ({cmd!r})")
+        final_options.setdefault("command", printable_command(cmd))
+
+        process = BackgroundProcess(cmd, workdir=workdir)
+        self._background.append(process)
+        if ready_output is not None:
+            ready = process.wait_for_output(ready_output, ready_timeout) is not None
+        elif ready_port is not None:
+            ready = process.wait_for_port(ready_port, timeout=ready_timeout)
+        else:
+            ready = True
+        code = 0 if ready else max(process.stop(), 0) or 1
+        # Let failprint report that the command started, or failed to.
+        result = failprint_run(_replay(code, process.output if code else "", Capture.BOTH), **final_options)
+        if result.code:
+            raise DutyFailure(result.code)
+        return process
+
+    @contextmanager
+    def _stopping_background(self) -> Iterator[None]:
+        # Stop background commands started within this block.
+        started = len(self._background)
+        try:
+            yield
+        finally:
+            while len(self._background) > started:
+                self._background.pop().stop()
+
+    @overload
+    async def arun(self, cmd: CmdType, *, background: Literal[True], **options: Any) -> BackgroundProcess: ...
+
+    @overload
+    async def arun(self, cmd: CmdType, **options: Any) -> str: ...
+
+    async def arun(self, cmd: CmdType, **options: Any) -> str | BackgroundProcess:
+        """Run a command in an asynchronous subprocess, or a Python callable.
+
+        Subprocesses do not block the event loop, so multiple commands
+        can run concurrently, for example with `asyncio.gather`.
+        Output is captured, printed and returned just like with [`run`][duty.Context.run],
+        and the `inputs`, `outputs` and `background` options work the same.
+        The `pty` option is not supported, and the `workdir` option
+        only applies to the subprocess (and to inputs and outputs), not to the current process.
+
+        Coroutine functions are awaited (their output is never captured),
+        and other Python callables are simply passed to [`run`][duty.Context.run],
+        blocking the event loop while they run, except tools running in the pool
+        (`pool=True`, see [`run`][duty.Context.run]), which run concurrently.
+
+        Parameters:
+            cmd: A command or a Python callable.
+            options: Options passed to `failprint` functions.
+
+        Raises:
+            DutyFailure: When the exit code / function result is greather than 0.
+
+        Returns:
+            The output of the command, or the background process.
+        """
+        final_options = self._final_options(cmd, options)
+        if final_options.pop("background", False):
+            # Waiting for the command to be ready does not block the event loop.
+            return await asyncio.to_thread(self._run_in_background, cmd, final_options)
+        pool = final_options.pop("pool", False) and _poolable(cmd)
+        if callable(cmd) and not inspect.iscoroutinefunction(cmd) and not pool:
+            return self.run(cmd, **options)
+
+        workdir = final_options.pop("workdir", None)
+        inputs = final_options.pop("inputs", None)
+        outputs = final_options.pop("outputs", None)
+        stdin = final_options.pop("stdin", None)
+        final_options.pop("pty", None)
+        args = final_options.pop("args", None) or ()
+        kwargs = final_options.pop("kwargs", None) or {}
+        capture = Capture.cast(final_options.get("capture"))
+        final_options.setdefault("command", printable_command(cmd, args, kwargs))
+
+        up_to_date = None
+        if inputs:
+            with self.cd(workdir):
+                up_to_date = self._up_to_date(cmd, final_options, _cache_dir().absolute(), inputs, outputs)
+                if up_to_date.check():
+                    print(up_to_date.printed, end="", flush=True)  # noqa: T201
+                    return up_to_date.returned
+
+        try:
+            if pool:
+                with self.cd(workdir):
+                    code, output = await asyncio.to_thread(_run_in_pool, cmd, args, kwargs, capture)
+            elif callable(cmd):
+                code, output = await cmd(*args, **kwargs), ""
+            else:
+                code, output = await _run_async_subprocess(cmd, capture=capture, stdin=stdin, cwd=workdir)
+            # Let failprint format the already obtained output,
+            # and record what it prints to replay it when the command is up-to-date.
+            with _tee() if up_to_date else nullcontext() as recorded:
+                result = failprint_run(_replay(code, output, capture), **final_options)
+        except KeyboardInterrupt as ki:
+            raise DutyFailure(130) from ki
+
+        if result.code:
+            raise DutyFailure(result.code)
+
+        if up_to_date:
+            with self.cd(workdir):
+                up_to_date.save(str(recorded), result.output)
+        return result.output
+
     @contextmanager
     def options(self, **opts: Any) -> Iterator:
         """Change options as a context manager.
@@ -109,3 +322,85 @@ class Context:
             yield
         finally:
             self._options = self._option_stack.pop()
+
+
+async def _run_async_subprocess(
+    cmd: str | list[str],
+    *,
+    capture: Capture,
+    stdin: str | None = None,
+    cwd: str | None = None,
+) -> tuple[int, str]:
+    if capture is Capture.NONE:
+        stdout = stderr = None
+    else:
+        stdout = asyncio.subprocess.PIPE
+        stderr = asyncio.subprocess.STDOUT if capture is Capture.BOTH else asyncio.subprocess.PIPE
+    stdin_opt = asyncio.subprocess.PIPE if stdin is not None else None
+
+    # Each command runs in its own process group, to be able to terminate it with its own subprocesses.
+    options: dict[str, Any] = {"stdin": stdin_opt, "stdout": stdout, "stderr": stderr, "cwd": cwd}
+    if hasattr(os, "killpg"):
+        options["start_new_session"] = True
+    if isinstance(cmd, str):
+        process = await asyncio.create_subprocess_shell(cmd, **options)
+    else:
+        process = await asyncio.create_subprocess_exec(*cmd, **options)
+
+    try:
+        out, err = await process.communicate(stdin.encode("utf8") if stdin is not None else None)
+    except BaseException:
+        # Cancelled, or interrupted: don't leave the processes behind.
+        _signal_group(process.pid)
+        with suppress(asyncio.TimeoutError):
+            await asyncio.wait_for(process.wait(), _GRACE_PERIOD)
+        _signal_group(process.pid, kill=True)
+        await process.wait()
+        raise
+
+    output = err if capture is Capture.STDERR else out
+    return process.returncode or 0, (output or b"").decode("utf8", errors="replace")
+
+
+def _poolable(cmd: CmdType) -> bool:
+    from duty._internal.pool import _poolable  # noqa: PLC0415
+
+    return _poolable(cmd)
+
+
+def _pooled(cmd: CmdType, final_options: dict[str, Any]) -> CmdType:
+    # Run tools in the pool, through a callable writing their output to the current streams,
+    # which failprint may be capturing. Other commands run as usual.
+    if not _poolable(cmd):
+        return cmd
+    from duty._internal.pool import _call  # noqa: PLC0415
+
+    args = final_options.pop("args", None) or ()
+    kwargs = final_options.pop("kwargs", None) or {}
+    capture = Capture.cast(final_options.get("capture"))
+    final_options.setdefault("command", printable_command(cmd, args, kwargs))
+
+    def run_in_pool() -> int:
+        stderr = sys.stdout if capture is Capture.BOTH else sys.stderr
+        return _call(cmd, tuple(args), kwargs, sys.stdout, stderr)  # type: ignore[arg-type]
+
+    return run_in_pool
+
+
+def _run_in_pool(tool: CmdType, args: tuple, kwargs: dict[str, Any], capture: Capture) -> tuple[int, str]:
+    from duty._internal.pool import _call  # noqa: PLC0415
+
+    output = io.StringIO()
+    stdout = output if capture in {Capture.BOTH, Capture.STDOUT} else sys.stdout
+    stderr = output if capture in {Capture.BOTH, Capture.STDERR} else sys.stderr
+    return _call(tool, tuple(args), kwargs, stdout, stderr), output.getvalue()  # type: ignore[arg-type]
+
+
+def _replay(result: Any, output: str, capture: Capture) -> Callable[[], Any]:
+    def replay() -> Any:
+        stream = sys.stderr if capture is Capture.STDERR else sys.stdout
+        stream.write(output)
+        stream.flush()
+        return result
+
+    return replay
@@ -27,6 +27,13 @@ def create_duty(
     aliases: Iterable[str] | None = None,
     pre: DutyListType | None = None,
     post: DutyListType | None = None,
+    pre_parallel: bool | int = False,
+    post_parallel: bool | int = False,
+    inputs: list[str] | None = None,
+    outputs: list[str] | None = None,
+    resources: dict[str, int | str] | None = None,
+    locks: list[str] | None = None,
+    matrix: dict[str, list[Any]] | None = None,
     skip_if: bool = False,
     skip_reason: str | None = None,
     **opts: Any,
@@ -39,6 +46,15 @@ def create_duty(
         aliases: A set of aliases for this duty.
         pre: Pre-duties.
         post: Post-duties.
+        pre_parallel: Whether pre-duties can run concurrently.
+            An integer limits the number of concurrent pre-duties.
+        post_parallel: Whether post-duties can run concurrently.
+            An integer limits the number of concurrent post-duties.
+        inputs: Glob patterns of the files the duty depends on, to skip it when it is up-to-date.
+        outputs: Glob patterns of the files the duty produces.
+        resources: Amounts of resources the duty needs when running concurrently (integers, or `"all"`).
+        locks: Names of locks the duty holds while running, to never run concurrently with duties sharing them.
+        matrix: Values of parameters of the duty, to run it once for each combination of values.
         skip_if: Skip running the duty if the given condition is met.
         skip_reason: Custom message when skipping.
         opts: Options passed to the context.
@@ -55,7 +71,22 @@ def create_duty(
     description = inspect.getdoc(func) or ""
     if skip_if:
         func = _skip(func, skip_reason or f"{dash_name}: skipped")
-    duty = Duty(name, description, func, aliases=aliases, pre=pre, post=post, opts=opts)
+    duty = Duty(
+        name,
+        description,
+        func,
+        aliases=aliases,
+        pre=pre,
+        post=post,
+        opts=opts,
+        pre_parallel=pre_parallel,
+        post_parallel=post_parallel,
+        inputs=inputs,
+        outputs=outputs,
+        resources=resources,
+        locks=locks,
+        matrix=matrix,
+    )
     duty.__name__ = name  # type: ignore[attr-defined]
     duty.__doc__ = description
     duty.__wrapped__ = func  # type: ignore[attr-defined]
@@ -7,6 +7,20 @@ class DutyFailure(Exception):  # noqa: N818
         Parameters:
             code: The exit code of a command.
         """
-        super().__init__(self)
+        super().__init__(code)
         self.code = code
         """The exit code of the command that failed."""
+
+
+class DutyCycleError(ValueError):
+    """An exception raised when pre- and post-duties form a cycle."""
+
+    def __init__(self, cycle: list[str]) -> None:
+        """Initialize the object.
+
+        Parameters:
+            cycle: The names of the duties forming the cycle, the first one being repeated at the end.
+        """
+        super().__init__(f"Cycle detected in pre/post duties: {' -> '.join(cycle)}")
+        self.cycle = cycle
+        """The names of the duties forming the cycle."""
@@ -0,0 +1,147 @@
+from __future__ import annotations
+
+import os
+import re
+import select
+import tempfile
+from contextlib import contextmanager, suppress
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from collections.abc import Iterator
+
+# Jobserver options, as exported by GNU make in MAKEFLAGS:
+# `--jobserver-auth=fifo:PATH` (make >= 4.4), or `--jobserver-auth=R,W` / `--jobserver-fds=R,W` (older versions).
+_AUTH_PATTERN = re.compile(r"--jobserver-(?:auth|fds)=(\S+)")
+_JOBS_PATTERN = re.compile(r"(?:^|\s)-j(\d*)(?=\s|$)")
+
+
+class _JobServer:
+    """A client of a GNU make jobserver.
+
+    Each process implicitly owns one job slot.
+    Before running an additional job concurrently, a process must acquire
+    a token (a byte) from the jobserver, and write it back once the job is done.
+    """
+
+    def __init__(self, read_fd: int, write_fd: int, *, fifo: str | None = None) -> None:
+        self.read_fd = read_fd
+        self.write_fd = write_fd
+        self.fifo = fifo
+
+    @classmethod
+    def from_environment(cls) -> _JobServer | None:
+        """Connect to the jobserver advertised in the `MAKEFLAGS` environment variable, if any."""
+        auths = _AUTH_PATTERN.findall(os.getenv("MAKEFLAGS", ""))
+        if not auths or not hasattr(os, "mkfifo"):
+            return None
+        auth = auths[-1]
+        if auth.startswith("fifo:"):
+            try:
+                fd = os.open(auth[5:], os.O_RDWR | os.O_NONBLOCK)
+            except OSError:
+                return None
+            return cls(fd, fd, fifo=auth[5:])
+        try:
+            read_fd, write_fd = (int(fd) for fd in auth.split(","))
+            # File descriptors are only inherited when make considers the command recursive (`+` prefix).
+            os.fstat(read_fd)
+            os.fstat(write_fd)
+        except (ValueError, OSError):
+            return None
+        return cls(read_fd, write_fd)
+
+    def fileno(self) -> int:
+        """Return the file descriptor to wait on for tokens to become available."""
+        return self.read_fd
+
+    def acquire(self) -> bytes | None:
+        """Acquire a token without blocking.
+
+        Returns:
+            The token, or none if no token is available.
+        """
+        if self.fifo is not None:
+            with suppress(BlockingIOError, InterruptedError):
+                return os.read(self.read_fd, 1) or None
+            return None
+        # Pipes are shared with other processes: only make them non-blocking while reading,
+        # in case another client takes the token between the check and the read.
+        if not select.select([self.read_fd], [], [], 0)[0]:
+            return None
+        os.set_blocking(self.read_fd, False)
+        try:
+            return os.read(self.read_fd, 1) or None
+        except (BlockingIOError, InterruptedError):
+            return None
+        finally:
+            os.set_blocking(self.read_fd, True)
+
+    def release(self, token: bytes) -> None:
+        """Give a token back to the jobserver.
+
+        Parameters:
+            token: The token previously acquired.
+        """
+        os.write(self.write_fd, token)
+
+    def close(self) -> None:
+        """Close the connection to the jobserver (tokens must have been released)."""
+        # Inherited pipes belong to the parent make process, only opened FIFOs are closed.
+        if self.fifo is not None:
+            with suppress(OSError):
+                os.close(self.read_fd)
+
+
+def _inherited_jobs() -> int:
+    # Default number of jobs: unlimited (bounded by tokens) when running under a make jobserver.
+    makeflags = os.getenv("MAKEFLAGS", "")
+    if not _AUTH_PATTERN.search(makeflags):
+        return 1
+    match = _JOBS_PATTERN.search(makeflags)
+    return int(match.group(1)) if match and match.group(1) else 0
+
+
+@contextmanager
+def _jobserver(jobs: int) -> Iterator[_JobServer | None]:
+    """Connect to the jobserver of a parent process, or serve one.
+
+    When no parent (make, or duty) serves a jobserver, and more than one job is allowed,
+    a jobserver with `jobs - 1` tokens is created in a FIFO (the protocol of GNU make 4.4),
+    and advertised to children processes through the `MAKEFLAGS` environment variable,
+    so that the tools they run (make, ninja, cargo, etc.) share the same job slots.
+
+    Parameters:
+        jobs: The maximum number of jobs.
+
+    Yields:
+        A jobserver client, or none.
+    """
+    client = _JobServer.from_environment()
+    if client is not None:
+        try:
+            yield client
+        finally:
+            client.close()
+        return
+
+    if jobs <= 1 or not hasattr(os, "mkfifo"):
+        yield None
+        return
+
+    makeflags = os.environ.get("MAKEFLAGS")
+    with tempfile.TemporaryDirectory(prefix="duty-jobserver-") as tmpdir:
+        fifo = os.path.join(tmpdir, "fifo")
+        os.mkfifo(fifo, 0o600)
+        fd = os.open(fifo, os.O_RDWR | os.O_NONBLOCK)
+        server = _JobServer(fd, fd, fifo=fifo)
+        os.write(server.write_fd, b"+" * (jobs - 1))
+        os.environ["MAKEFLAGS"] = f"-j{jobs} --jobserver-auth=fifo:{fifo}"
+        try:
+            yield server
+        finally:
+            if makeflags is None:
+                os.environ.pop("MAKEFLAGS", None)
+            else:
+                os.environ["MAKEFLAGS"] = makeflags
+            server.close()
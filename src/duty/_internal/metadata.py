@@ -0,0 +1,277 @@
+from __future__ import annotations
+
+import ast
+import hashlib
+import inspect
+import json
+import os
+import sys
+from contextlib import suppress
+from pathlib import Path
+from typing import TYPE_CHECKING, Any, Callable
+
+from duty._internal.cache import _cache_dir, _digest, _write_atomically
+
+if TYPE_CHECKING:
+    from collections.abc import Iterable
+
+    from duty._internal.collection import Collection, Duty
+
+# Metadata of a duty: its name, description, aliases and parameters (names and kinds),
+# enough to list duties, print their help and complete their parameters without running the duties file.
+_DutyMetadata = dict[str, Any]
+
+
+def _metadata_file(path: str) -> Path:
+    return _cache_dir(path) / "metadata" / f"{_digest(os.path.abspath(path))}.json"
+
+
+def _file_hash(path: str) -> str:
+    return hashlib.sha256(Path(path).read_bytes()).hexdigest()
+
+
+def _mtimes(paths: Iterable[str]) -> dict[str, int | None]:
+    mtimes: dict[str, int | None] = {}
+    for path in paths:
+        try:
+            mtimes[path] = os.stat(path).st_mtime_ns
+        except OSError:
+            mtimes[path] = None
+    return mtimes
+
+
+def _duty_metadata(duty: Duty) -> _DutyMetadata:
+    try:
+        parameters = [[param.name, param.kind.name] for param in inspect.signature(duty.function).parameters.values()]
+    except (TypeError, ValueError):
+        parameters = []
+    return {
+        "name": duty.name,
+        "description": duty.description,
+        "aliases": sorted(duty.aliases),
+        "parameters": parameters,
+    }
+
+
+def _save_metadata(path: str, collection: Collection, modules: Iterable[str]) -> None:
+    """Save the metadata of the duties loaded from a file.
+
+    Metadata are valid as long as the duties file, the modules it imported
+    and duty itself are not modified.
+
+    Parameters:
+        path: The path to the duties file.
+        collection: The collection the duties were loaded into.
+        modules: The files of the modules imported while loading the duties file.
+    """
+    try:
+        record = {
+            "hash": _file_hash(path),
+            "modules": _mtimes(sorted({*modules, __file__})),
+            "duties": [_duty_metadata(duty) for duty in collection.duties.values()],
+        }
+        contents = json.dumps(record)
+        metadata_file = _metadata_file(path)
+        if not metadata_file.exists() or metadata_file.read_text(encoding="utf8") != contents:
+            _write_atomically(metadata_file, contents)
+    except OSError:
+        # Metadata are only a cache: failing to save them is not an error.
+        return
+
+
+def _cached_metadata(path: str) -> list[_DutyMetadata] | None:
+    """Return the cached metadata of the duties of a file, if still valid.
+
+    Parameters:
+        path: The path to the duties file.
+
+    Returns:
+        The metadata of each duty, or none.
+    """
+    try:
+        record = json.loads(_metadata_file(path).read_text(encoding="utf8"))
+        if record["hash"] != _file_hash(path) or record["modules"] != _mtimes(record["modules"]):
+            return None
+        return record["duties"]
+    except (OSError, ValueError, TypeError, KeyError):
+        return None
+
+
+def _is_duty(node: ast.expr, names: set[str], modules: set[str]) -> bool:
+    # Whether the expression is the `duty` function (`duty`, or `module.duty`).
+    if isinstance(node, ast.Name):
+        return node.id in names
+    return (
+        isinstance(node, ast.Attribute)
+        and node.attr == "duty"
+        and isinstance(node.value, ast.Name)
+        and node.value.id in modules
+    )
+
+
+def _decorator_kwargs(decorator: ast.expr, names: set[str], modules: set[str]) -> dict[str, ast.expr] | None:
+    # Return the keyword arguments of the `duty` decorator (empty without parentheses), or none for other decorators.
+    kwargs: dict[str, ast.expr] = {}
+    if isinstance(decorator, ast.Call):
+        if decorator.args or any(keyword.arg is None for keyword in decorator.keywords):
+            raise ValueError("positional or unpacked arguments")
+        kwargs = {keyword.arg: keyword.value for keyword in decorator.keywords}  # type: ignore[misc]
+        decorator = decorator.func
+    return kwargs if _is_duty(decorator, names, modules) else None
+
+
+def _is_local(module: str, directory: Path) -> bool:
+    root = module.split(".", 1)[0]
+    return (directory / f"{root}.py").exists() or (directory / root / "__init__.py").exists()
+
+
+def _scan_duties(path: str) -> list[_DutyMetadata] | None:
+    """Find the duties declared in a file, without executing it.
+
+    Only duties declared with the `duty` decorator, at the top-level of the file,
+    and with literal names and aliases, can be found. If the file declares duties
+    in any other way (for example by calling `duty` directly), imports modules next to it
+    (that could declare duties), or imports names from modules other than duty
+    and the standard library (that could be duties), the scan fails.
+
+    Parameters:
+        path: The path to the duties file.
+
+    Returns:
+        The metadata of each duty, or none if the scan failed.
+    """
+    try:
+        tree = ast.parse(Path(path).read_bytes(), filename=path)
+    except (OSError, SyntaxError, ValueError):
+        return None
+
+    directory = Path(path).parent
+    names: set[str] = set()
+    modules: set[str] = set()
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Import):
+            for alias in node.names:
+                if _is_local(alias.name, directory):
+                    return None
+                if alias.name == "duty":
+                    modules.add(alias.asname or "duty")
+        elif isinstance(node, ast.ImportFrom):
+            if node.level or _is_local(node.module or "", directory):
+                return None
+            # Names imported from other modules could be duties.
+            if (node.module or "").split(".", 1)[0] not in {"duty", *sys.stdlib_module_names}:
+                return None
+            for alias in node.names:
+                if alias.name == "*":
+                    return None
+                if node.module in {"duty", "duty.decorator"} and alias.name == "duty":
+                    names.add(alias.asname or "duty")
+                elif alias.name in {"Duty", "create_duty"}:
+                    return None
+
+    functions: dict[str, _DutyMetadata] = {}
+    top_level = set(tree.body)
+    decorators = {
+        decorator
+        for node in ast.walk(tree)
+        if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef))
+        for decorator in node.decorator_list
+    }
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Attribute) and node.attr in {"Duty", "create_duty"}:
+            return None
+        # Duties created by calling `duty` directly, for example `lint = duty(_lint, name="lint")`.
+        if isinstance(node, ast.Call) and node not in decorators and _is_duty(node.func, names, modules):
+            return None
+        if not isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef)):
+            continue
+        for decorator in node.decorator_list:
+            try:
+                kwargs = _decorator_kwargs(decorator, names, modules)
+                if kwargs is None:
+                    continue
+                name = ast.literal_eval(kwargs["name"]) if "name" in kwargs else node.name
+                aliases = set(ast.literal_eval(kwargs["aliases"])) if "aliases" in kwargs else set()
+            except (ValueError, TypeError, SyntaxError):
+                return None
+            if node not in top_level or len(node.decorator_list) > 1:
+                return None
+            # Same logic as `create_duty`.
+            dash_name = name.replace("_", "-")
+            if name != dash_name:
+                aliases.add(name)
+            functions[node.name] = {
+                "name": dash_name,
+                "description": ast.get_docstring(node) or "",
+                "aliases": sorted(aliases),
+                "parameters": _parameters(node.args),
+            }
+
+    # Duties are loaded in the order of the module attributes names.
+    return [functions[name] for name in sorted(functions)]
+
+
+def _parameters(args: ast.arguments) -> list[list[str]]:
+    parameters = [[arg.arg, "POSITIONAL_ONLY"] for arg in args.posonlyargs]
+    parameters.extend([arg.arg, "POSITIONAL_OR_KEYWORD"] for arg in args.args)
+    if args.vararg:
+        parameters.append([args.vararg.arg, "VAR_POSITIONAL"])
+    parameters.extend([arg.arg, "KEYWORD_ONLY"] for arg in args.kwonlyargs)
+    if args.kwarg:
+        parameters.append([args.kwarg.arg, "VAR_KEYWORD"])
+    return parameters
+
+
+def _placeholder(name: str, parameters: list[list[str]]) -> Callable:
+    """Create a function standing for a duty function that was not loaded.
+
+    Parameters:
+        name: The duty name.
+        parameters: The names and kinds of the parameters of the duty function.
+
+    Returns:
+        A function with the same signature, that cannot be called.
+    """
+
+    def function(*args: Any, **kwargs: Any) -> None:  # noqa: ARG001
+        raise RuntimeError(f"Duty '{name}' was loaded from metadata only, and cannot run")
+
+    function.__signature__ = inspect.Signature(  # type: ignore[attr-defined]
+        [inspect.Parameter(param_name, getattr(inspect.Parameter, kind)) for param_name, kind in parameters],
+    )
+    return function
+
+
+def _loaded_modules(before: set[str]) -> list[str]:
+    # Files of the modules imported since the given snapshot of `sys.modules`.
+    files = []
+    for name in set(sys.modules) - before:
+        file = getattr(sys.modules.get(name), "__file__", None)
+        if file:
+            files.append(file)
+    return files
+
+
+def _completions_file(path: str) -> Path:
+    # Shell completion scripts find this file without Python, from the path of the duties file only.
+    return _cache_dir(path) / "completions" / Path(path).name
+
+
+def _save_completions(path: str, collection: Collection, options: list[str]) -> None:
+    """Save the completion candidates of a collection, for shell completion scripts.
+
+    The file contains the real path of the duties file, the global options,
+    then one line per duty name or alias, followed by the parameters of the duty
+    (as returned by [`completion_candidates`][duty.Collection.completion_candidates]).
+
+    Parameters:
+        path: The path to the duties file.
+        collection: The collection loaded from this file.
+        options: The global options of the CLI.
+    """
+    names = sorted(set(collection.names()))
+    lines = [os.path.realpath(path), " ".join(options)]
+    lines.extend(" ".join([name, *collection.completion_candidates((name,))[len(names) :]]) for name in names)
+    # Always written, since completion scripts compare its modification time to the duties file's.
+    with suppress(OSError):
+        _write_atomically(_completions_file(path), "\n".join(lines) + "\n")
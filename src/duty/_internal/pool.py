@@ -0,0 +1,285 @@
+from __future__ import annotations
+
+import atexit
+import codecs
+import json
+import os
+import pickle
+import select
+import signal
+import socket
+import struct
+import subprocess
+import sys
+import threading
+from contextlib import closing, suppress
+from typing import IO, TYPE_CHECKING, Any
+
+from duty._internal.cache import _cache_dir, _digest, _write_atomically
+from duty._internal.processes import _GRACE_PERIOD, _own_group, _signal_group
+
+if TYPE_CHECKING:
+    from collections.abc import Iterator
+    from pathlib import Path
+
+    from duty._internal.tools._base import Tool
+
+# Tools run in children forked from warm processes (zygotes), one per tool class.
+# Messages are pickled objects, prefixed with their length.
+# The client sends control messages to the zygote: `{"call": True}` along with three file descriptors
+# (one end of a socket pair, standard output and error), or `{"import": [...]}` to import modules.
+# On its socket, the child sends its PID, receives the call, and sends the exit code and imported modules.
+_LENGTH = struct.Struct("!I")
+
+_zygotes: dict[str, _Zygote] = {}
+_zygotes_pid = os.getpid()
+_lock = threading.Lock()
+
+
+def _poolable(cmd: Any) -> bool:
+    # Only tools can run in the pool: zygotes import their class, and receive them pickled.
+    from duty._internal.tools._base import Tool  # noqa: PLC0415
+
+    if not (hasattr(os, "fork") and hasattr(socket, "send_fds")) or not isinstance(cmd, Tool):
+        return False
+    # Tools declared in the duties file cannot be imported by zygotes.
+    if type(cmd).__module__ in {"__main__", "duty.duties"}:
+        return False
+    try:
+        pickle.dumps(cmd)
+    except Exception:  # noqa: BLE001
+        return False
+    return True
+
+
+def _frame(message: Any) -> bytes:
+    payload = pickle.dumps(message)
+    return _LENGTH.pack(len(payload)) + payload
+
+
+def _read_exactly(sock: socket.socket, size: int) -> bytes:
+    data = b""
+    while len(data) < size:
+        if not (chunk := sock.recv(size - len(data))):
+            raise EOFError("connection closed")
+        data += chunk
+    return data
+
+
+def _receive(sock: socket.socket) -> Any:
+    (size,) = _LENGTH.unpack(_read_exactly(sock, _LENGTH.size))
+    return pickle.loads(_read_exactly(sock, size))  # noqa: S301
+
+
+def _modules_file(key: str) -> Path:
+    return _cache_dir().absolute() / "pool" / f"{_digest(key)}.json"
+
+
+class _Zygote:
+    """A warm process forking children that run the calls of a tool."""
+
+    def __init__(self, key: str) -> None:
+        self.key = key
+        self.modules: set[str] = set()
+        with suppress(OSError, ValueError):
+            self.modules = set(json.loads(_modules_file(key).read_text(encoding="utf8")))
+        self.lock = threading.Lock()
+        self.sock, theirs = socket.socketpair()
+        with closing(theirs):
+            code = f"import sys; sys.path[:] = {sys.path!r}; from duty._internal.pool import _serve; _serve({theirs.fileno()})"
+            # In its own session: interrupting duty from the terminal does not kill the zygote.
+            self.process = subprocess.Popen(  # noqa: S603
+                [sys.executable, "-c", code],
+                pass_fds=[theirs.fileno()],
+                # The zygote must not hold the standard streams of duty, which may be captured.
+                stdin=subprocess.DEVNULL,
+                stdout=subprocess.DEVNULL,
+                stderr=subprocess.DEVNULL,
+                start_new_session=True,
+            )
+        # Import what the tool imported in previous runs.
+        self.send({"import": sorted(self.modules), "directory": os.getcwd()})
+
+    def send(self, message: dict[str, Any], fds: list[int] | None = None) -> None:
+        with self.lock:
+            if fds:
+                socket.send_fds(self.sock, [_frame(message)], fds)
+            else:
+                self.sock.sendall(_frame(message))
+
+    def learn(self, modules: list[str]) -> None:
+        # Let the zygote import the modules that the tool imported, for next calls.
+        if new := set(modules) - self.modules:
+            self.modules |= new
+            self.send({"import": sorted(new), "directory": os.getcwd()})
+            with suppress(OSError):
+                _write_atomically(_modules_file(self.key), json.dumps(sorted(self.modules)))
+
+    def close(self) -> None:
+        # The zygote exits when its socket is closed.
+        self.sock.close()
+        try:
+            self.process.wait(_GRACE_PERIOD)
+        except subprocess.TimeoutExpired:
+            self.process.kill()
+            self.process.wait()
+
+
+def _close_zygotes() -> None:
+    if _zygotes_pid == os.getpid():
+        for zygote in _zygotes.values():
+            zygote.close()
+    _zygotes.clear()
+
+
+atexit.register(_close_zygotes)
+
+
+def _zygote(key: str) -> _Zygote:
+    global _zygotes_pid  # noqa: PLW0603
+    with _lock:
+        if _zygotes_pid != os.getpid():
+            # Forked from a process that started zygotes: they belong to the parent.
+            _zygotes.clear()
+            _zygotes_pid = os.getpid()
+        if key not in _zygotes or _zygotes[key].process.poll() is not None:
+            _zygotes[key] = _Zygote(key)
+        return _zygotes[key]
+
+
+def _pump(readers: dict[int, IO[str]]) -> None:
+    # Write the output of the child to the given streams, as it comes.
+    # Readers are removed from the dictionary once closed.
+    decoders = {fd: codecs.getincrementaldecoder("utf8")(errors="replace") for fd in readers}
+    while readers:
+        readable, _, _ = select.select(list(readers), [], [])
+        for fd in readable:
+            chunk = os.read(fd, 65536)
+            stream = readers[fd]
+            stream.write(decoders[fd].decode(chunk, final=not chunk))
+            stream.flush()
+            if not chunk:
+                os.close(fd)
+                del readers[fd]
+
+
+def _call(tool: Tool, args: tuple, kwargs: dict[str, Any], stdout: IO[str], stderr: IO[str]) -> int:
+    """Run a tool in a child of its zygote.
+
+    Parameters:
+        tool: The tool to run.
+        args: Positional arguments for the tool.
+        kwargs: Keyword arguments for the tool.
+        stdout: Where to write the standard output of the tool.
+        stderr: Where to write the standard error of the tool (it can be the same as `stdout`).
+
+    Returns:
+        The exit code of the tool.
+    """
+    request = _frame({"tool": tool, "args": args, "kwargs": kwargs, "cwd": os.getcwd(), "env": dict(os.environ)})
+    zygote = _zygote(f"{type(tool).__module__}.{type(tool).__qualname__}")
+    ours, theirs = socket.socketpair()
+    out_reader, out_writer = os.pipe()
+    err_reader, err_writer = (out_reader, out_writer) if stdout is stderr else os.pipe()
+    try:
+        zygote.send({"call": True}, [theirs.fileno(), out_writer, err_writer])
+    finally:
+        theirs.close()
+        os.close(out_writer)
+        if err_writer != out_writer:
+            os.close(err_writer)
+    readers = {out_reader: stdout, err_reader: stderr}
+    pid = 0
+    try:
+        pid = _receive(ours)["pid"]
+        ours.sendall(request)
+        _pump(readers)
+        response = _receive(ours)
+    except (EOFError, OSError):
+        stderr.write("> The tool process exited unexpectedly\n")
+        return 1
+    except BaseException:
+        # Interrupted: don't leave the processes of the tool behind.
+        if pid:
+            _signal_group(pid)
+        raise
+    finally:
+        ours.close()
+        for reader in readers:
+            os.close(reader)
+    zygote.learn(response["modules"])
+    return response["code"]
+
+
+def _messages(sock: socket.socket) -> Iterator[tuple[dict[str, Any], list[int]]]:
+    data = b""
+    fds: list[int] = []
+    while True:
+        chunk, received, _, _ = socket.recv_fds(sock, 65536, 3)
+        if not chunk:
+            return
+        data += chunk
+        fds.extend(received)
+        while len(data) >= _LENGTH.size and len(data) >= _LENGTH.size + (size := _LENGTH.unpack_from(data)[0]):
+            message = pickle.loads(data[_LENGTH.size : _LENGTH.size + size])  # noqa: S301
+            data = data[_LENGTH.size + size :]
+            count = 3 if "call" in message else 0
+            yield message, fds[:count]
+            del fds[:count]
+
+
+def _serve(fd: int) -> None:
+    """Fork children running the calls sent on the given socket, until it is closed.
+
+    Parameters:
+        fd: The file descriptor of the socket.
+    """
+    from duty._internal.server import _warm_up  # noqa: PLC0415
+
+    sock = socket.socket(fileno=fd)
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    # Children are reaped automatically.
+    signal.signal(signal.SIGCHLD, signal.SIG_IGN)
+    for message, fds in _messages(sock):
+        if "import" in message:
+            _warm_up(message["import"], message["directory"])
+            continue
+        sys.stdout.flush()
+        sys.stderr.flush()
+        if os.fork() == 0:  # pragma: no cover
+            sock.close()
+            code = 1
+            with suppress(BaseException):
+                code = _run_child(*fds)
+            os._exit(code)
+        for received in fds:
+            os.close(received)
+
+
+def _run_child(fd: int, stdout: int, stderr: int) -> int:
+    # Run the call in a fresh copy of the zygote, with the output, directory and environment of the client.
+    from failprint import run_function_get_code  # noqa: PLC0415
+
+    _own_group()
+    signal.signal(signal.SIGCHLD, signal.SIG_DFL)
+    signal.signal(signal.SIGINT, signal.default_int_handler)
+    sock = socket.socket(fileno=fd)
+    sock.sendall(_frame({"pid": os.getpid()}))
+    os.dup2(stdout, 1)
+    os.dup2(stderr, 2)
+    os.close(stdout)
+    if stderr != stdout:
+        os.close(stderr)
+    modules = set(sys.modules)
+    request = _receive(sock)
+    os.chdir(request["cwd"])
+    os.environ.clear()
+    os.environ.update(request["env"])
+    code = run_function_get_code(request["tool"], args=request["args"], kwargs=request["kwargs"])
+    sys.stdout.flush()
+    sys.stderr.flush()
+    # Close the output before answering, so that the client has read all of it.
+    os.close(1)
+    os.close(2)
+    sock.sendall(_frame({"code": code, "modules": sorted(set(sys.modules) - modules)}))
+    return 0
@@ -0,0 +1,25 @@
+from __future__ import annotations
+
+import os
+import signal
+from contextlib import suppress
+
+# Time given to processes to exit after being asked to terminate, before they are killed.
+_GRACE_PERIOD = 2.0
+
+
+def _own_group() -> None:
+    # Put the current process in its own process group, with all the processes it starts,
+    # so that the whole tree can be terminated at once.
+    if hasattr(os, "setpgid"):
+        with suppress(OSError):
+            os.setpgid(0, 0)
+
+
+def _signal_group(pid: int, *, kill: bool = False) -> None:
+    # Terminate (or kill) a process group, or just the process on platforms without process groups.
+    with suppress(ProcessLookupError, PermissionError):
+        if hasattr(os, "killpg"):
+            os.killpg(pid, signal.SIGKILL if kill else signal.SIGTERM)
+        else:
+            os.kill(pid, signal.SIGTERM)
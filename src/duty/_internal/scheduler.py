@@ -0,0 +1,572 @@
+from __future__ import annotations
+
+import json
+import multiprocessing
+import os
+import sys
+import time
+import traceback
+from contextlib import suppress
+from dataclasses import dataclass, field
+from multiprocessing.connection import wait
+from typing import TYPE_CHECKING, Any, Callable, cast
+
+from failprint import Capture
+
+from duty._internal.cache import _cache_dir, _write_atomically
+from duty._internal.context import Context
+from duty._internal.exceptions import DutyCycleError, DutyFailure
+from duty._internal.processes import _GRACE_PERIOD, _own_group, _signal_group
+from duty._internal.worker import _invocation, _run_remote
+
+if TYPE_CHECKING:
+    from collections.abc import Sequence
+    from multiprocessing.connection import Connection
+    from multiprocessing.process import BaseProcess
+    from pathlib import Path
+
+    from duty._internal.collection import Collection, Duty
+    from duty._internal.jobserver import _JobServer
+
+# With the fork start method, children inherit the jobs
+# (including duties declared in memory), so nothing needs to be pickled.
+# Other platforms fall back to spawning, reloading the duties file
+# and rebuilding the same jobs graph.
+_START_METHOD = "fork" if "fork" in multiprocessing.get_all_start_methods() else "spawn"
+
+
+@dataclass(eq=False)
+class _Job:
+    """A node of the jobs graph: the body of a duty, or a callable pre/post duty."""
+
+    index: int
+    key: tuple
+    name: str
+    function: Callable
+    args: tuple = ()
+    kwargs: dict[str, Any] = field(default_factory=dict)
+    context: Context | None = None
+    options: dict[str, Any] = field(default_factory=dict)
+    options_override: dict[str, Any] = field(default_factory=dict)
+    deps: list[_Job] = field(default_factory=list)
+    resources: dict[str, int | str] = field(default_factory=dict)
+    limits: dict[str, int] = field(default_factory=dict)
+    locks: list[str] = field(default_factory=list)
+    cell: dict[str, Any] = field(default_factory=dict)
+    code: int | None = None
+    output: str = ""
+    duration: float = 0.0
+
+
+def _build_jobs(
+    commands: Sequence[tuple[Duty | Callable, Sequence, dict[str, Any]]],
+    *,
+    context: Context | None = None,
+    skip: set[tuple] | None = None,
+) -> list[_Job]:
+    """Build the graph of jobs for the given commands.
+
+    Each duty (for a given set of arguments) or callable gives exactly one job,
+    so shared pre- and post-duties are only run once.
+    Pre- and post-duties run one after the other, unless their duty
+    declares them as parallel, in which case they only depend on
+    what the duty itself depends on. When the duty bounds the number
+    of concurrent pre/post-duties, the jobs of each group share
+    an implicit resource with this capacity.
+    Jobs are returned in the order they would run sequentially,
+    and only ever depend on jobs that come before them.
+
+    Parameters:
+        commands: Duties (or callables) with their positional and keyword arguments.
+        context: The context to run all jobs with. By default, jobs
+            use the context of the command they were expanded from.
+        skip: Keys of duties that already ran, and must not be run again.
+
+    Raises:
+        DutyCycleError: When pre- and post-duties form a cycle.
+
+    Returns:
+        The jobs.
+    """
+    from duty._internal.collection import Duty, _duty_key  # noqa: PLC0415
+
+    jobs: list[_Job] = []
+    completions: dict[tuple, list[_Job]] = {key: [] for key in skip or ()}
+    visiting: list[str] = []
+
+    def add_job(
+        key: tuple,
+        function: Callable,
+        name: str,
+        root: Duty | Callable,
+        deps: list[_Job],
+        *args: Any,
+        **kwargs: Any,
+    ) -> _Job:
+        job = _Job(
+            index=len(jobs),
+            key=key,
+            name=name,
+            function=function,
+            args=args,
+            kwargs=kwargs,
+            context=context,
+            # Pre- and post-duties run with the context of the selected duty.
+            options=getattr(root, "options", {}),
+            options_override=getattr(root, "options_override", {}),
+            deps=list(dict.fromkeys(deps)),
+        )
+        jobs.append(job)
+        return job
+
+    def limit(group: list[_Job], name: str, *, parallel: bool | int) -> None:
+        # `True` is only bounded by the maximum number of jobs.
+        if isinstance(parallel, bool) or not parallel or not group:
+            return
+        for job in group:
+            job.resources = {**job.resources, name: 1}
+            job.limits = {**job.limits, name: int(parallel)}
+
+    def expand(
+        item: Duty | Callable,
+        root: Duty | Callable,
+        after: list[_Job],
+        *args: Any,
+        **kwargs: Any,
+    ) -> list[_Job]:
+        # Return the jobs that must complete for the item to be considered done.
+        key = _duty_key(item, args, kwargs)
+        if key in completions:
+            return completions[key]
+
+        if not isinstance(item, Duty):
+            name = getattr(item, "__name__", repr(item))
+            completions[key] = [add_job(key, item, name, root, after, *args, **kwargs)]
+            return completions[key]
+
+        if item.name in visiting:
+            raise DutyCycleError([*visiting[visiting.index(item.name) :], item.name])
+        visiting.append(item.name)
+
+        deps = list(after)
+        start = len(jobs)
+        for pre in item.pre:
+            if (resolved := item._resolve_duty(pre)) is not None:
+                deps.extend(expand(resolved, root, after if item.pre_parallel else deps))
+        limit(jobs[start:], f"{item.name}:pre:{start}", parallel=item.pre_parallel)
+
+        body = add_job(key, item._run_function, item.name, root, deps, *args, **kwargs)
+        body.resources = item.resources
+        body.locks = item.locks
+        completion = [body]
+        start = len(jobs)
+        for post in item.post:
+            if (resolved := item._resolve_duty(post)) is not None:
+                completion.extend(expand(resolved, root, [body] if item.post_parallel else completion))
+        limit(jobs[start:], f"{item.name}:post:{start}", parallel=item.post_parallel)
+
+        visiting.pop()
+        completions[key] = list(dict.fromkeys(completion))
+        return completions[key]
+
+    for item, args, kwargs in commands:
+        expand(item, item, [], *args, **kwargs)
+    return jobs
+
+
+def _load_durations(path: Path) -> dict[str, float]:
+    try:
+        return json.loads(path.read_text(encoding="utf8"))
+    except (OSError, ValueError):
+        return {}
+
+
+def _save_durations(path: Path, jobs: list[_Job]) -> None:
+    durations = _load_durations(path)
+    # Only record durations of successful duties: callables have no stable name.
+    durations.update({job.name: round(job.duration, 3) for job in jobs if job.code == 0 and job.key[0] != "callable"})
+    with suppress(OSError):
+        _write_atomically(path, json.dumps(durations, indent=2, sort_keys=True))
+
+
+def _estimate(jobs: list[_Job], durations: dict[str, float]) -> list[float]:
+    # Jobs without history are estimated with the average known duration.
+    known = [durations[job.name] for job in jobs if job.name in durations]
+    default = sum(known) / len(known) if known else 0.0
+    return [durations.get(job.name, default) for job in jobs]
+
+
+def _critical_paths(jobs: list[_Job], estimates: list[float]) -> list[float]:
+    # Length of the longest path from each job to the end of the graph.
+    # Jobs only depend on previous jobs, so a reverse pass is enough.
+    lengths = list(estimates)
+    for job in reversed(jobs):
+        for dep in job.deps:
+            lengths[dep.index] = max(lengths[dep.index], estimates[dep.index] + lengths[job.index])
+    return lengths
+
+
+def _pick(ready: list[_Job], priorities: list[float]) -> _Job:
+    # Longest remaining critical path first, declaration order on ties.
+    return max(ready, key=lambda job: (priorities[job.index], -job.index))
+
+
+def _capacities(jobs: list[_Job], max_jobs: int, resources: dict[str, int] | None = None) -> dict[str, int]:
+    capacities = {**(resources or {}), "cpu": max_jobs}
+    for job in jobs:
+        capacities.update(job.limits)
+    return capacities
+
+
+def _demands(job: _Job, capacities: dict[str, int]) -> dict[str, int]:
+    # Each job uses one CPU slot by default. Demands are capped to capacities,
+    # so that a job asking for more than available can still run (alone).
+    demands = {"cpu": 1, **job.resources}
+    return {
+        name: capacities.get(name, 1) if amount == "all" else min(int(amount), capacities.get(name, 1))
+        for name, amount in demands.items()
+    }
+
+
+def _admit(
+    ready: list[_Job],
+    priorities: list[float],
+    running: list[_Job],
+    capacities: dict[str, int],
+) -> list[_Job]:
+    # Select the ready jobs that can start given the slots and locks used by running jobs.
+    free = dict(capacities)
+    locked: set[str] = set()
+    for job in running:
+        for name, amount in _demands(job, capacities).items():
+            free[name] = free.get(name, 1) - amount
+        locked.update(job.locks)
+
+    admitted = []
+    candidates = list(ready)
+    while candidates:
+        job = _pick(candidates, priorities)
+        candidates.remove(job)
+        demands = _demands(job, capacities)
+        if locked.isdisjoint(job.locks) and all(free.get(name, 1) >= amount for name, amount in demands.items()):
+            admitted.append(job)
+        # Reserve what the job needs even when it cannot start yet,
+        # so that jobs with lower priority do not starve it.
+        for name, amount in demands.items():
+            free[name] = free.get(name, 1) - amount
+        locked.update(job.locks)
+    return admitted
+
+
+def _simulate(
+    jobs: list[_Job],
+    estimates: list[float],
+    priorities: list[float],
+    max_jobs: int,
+    resources: dict[str, int] | None = None,
+) -> float:
+    # Estimate the total duration of a run by replaying the scheduling with the estimates.
+    capacities = _capacities(jobs, max_jobs, resources)
+    by_index = {job.index: job for job in jobs}
+    finished_at: dict[int, float] = {}
+    running: list[tuple[float, int]] = []
+    pending = list(jobs)
+    now = 0.0
+    while pending or running:
+        ready = [job for job in pending if all(dep.index in finished_at for dep in job.deps)]
+        for job in _admit(ready, priorities, [by_index[index] for _, index in running], capacities):
+            pending.remove(job)
+            running.append((now + estimates[job.index], job.index))
+        running.sort()
+        now, index = running.pop(0)
+        finished_at[index] = now
+    return now
+
+
+def _execute(job: _Job) -> tuple[int, str]:
+    from duty._internal.collection import _call  # noqa: PLC0415
+
+    context = job.context or Context(job.options, job.options_override)
+    with Capture.BOTH.here() as captured:
+        try:
+            _call(job.function, context, *job.args, **job.kwargs)
+        except DutyFailure as failure:
+            code = failure.code
+        except KeyboardInterrupt:
+            code = 130
+        except BaseException:  # noqa: BLE001
+            sys.stderr.write(traceback.format_exc())
+            code = 1
+        else:
+            code = 0
+    return code, str(captured)
+
+
+def _child(conn: Connection, job: _Job | tuple[str, list[tuple], int]) -> None:
+    _own_group()
+    if isinstance(job, tuple):
+        from duty._internal.collection import Collection  # noqa: PLC0415
+
+        path, specs, index = job
+        collection = Collection(path)
+        collection.load()
+        commands = []
+        for name, args, kwargs, options_override in specs:
+            duty = collection.get(name)
+            duty.options_override = options_override
+            commands.append((duty, args, kwargs))
+        job = _build_jobs(commands)[index]
+    conn.send(_execute(job))
+    conn.close()
+
+
+def _remote_child(conn: Connection, address: str, invocation: dict[str, Any]) -> None:
+    # Terminating this process closes the connection, which makes the worker terminate the duty.
+    _own_group()
+    conn.send(_run_remote(address, invocation))
+    conn.close()
+
+
+def _start(
+    job: _Job,
+    respawn: tuple[str, list[tuple]] | None,
+    worker: str | None = None,
+) -> tuple[Connection, BaseProcess]:
+    mp_context = multiprocessing.get_context(_START_METHOD)
+    reader, writer = mp_context.Pipe(duplex=False)
+    if worker is not None:
+        invocation = _invocation(job.name, job.args, job.kwargs, job.options, job.options_override)
+        process = mp_context.Process(target=_remote_child, args=(writer, worker, invocation), daemon=True)  # type: ignore[attr-defined]
+    else:
+        target: _Job | tuple = job if respawn is None else (*respawn, job.index)
+        process = mp_context.Process(target=_child, args=(writer, target), daemon=True)  # type: ignore[attr-defined]
+    process.start()
+    # Also set the group from the parent, in case the job is cancelled before the child sets it.
+    if hasattr(os, "setpgid"):
+        with suppress(OSError):
+            os.setpgid(process.pid, process.pid)
+    writer.close()
+    return reader, process
+
+
+def _terminate(processes: list[BaseProcess]) -> None:
+    # Terminate the processes trees (the job processes and the commands they run),
+    # then kill what is left after the grace period.
+    for process in processes:
+        _signal_group(process.pid)  # type: ignore[arg-type]
+    deadline = time.monotonic() + _GRACE_PERIOD
+    for process in processes:
+        process.join(max(0, deadline - time.monotonic()))
+    for process in processes:
+        _signal_group(process.pid, kill=True)  # type: ignore[arg-type]
+        process.join()
+
+
+def _collect(job: _Job, conn: Connection, process: BaseProcess, started_at: float) -> None:
+    job.duration = time.monotonic() - started_at
+    try:
+        job.code, job.output = conn.recv()
+    except EOFError:
+        # The child died before reporting (killed, segfault, etc.).
+        process.join()
+        job.code = process.exitcode or 1
+    else:
+        process.join()
+    conn.close()
+
+
+def _history_file(duties_file: str) -> Path:
+    return _cache_dir(duties_file) / "durations.json"
+
+
+def _respawn_spec(collection: Collection, commands: Sequence[tuple]) -> tuple[str, list[tuple]] | None:
+    # Without fork, children rebuild the jobs from the duties file and the commands.
+    if _START_METHOD == "fork":
+        return None
+    return collection.path, [(duty.name, tuple(args), kwargs, duty.options_override) for duty, args, kwargs in commands]
+
+
+def _cell_label(cell: dict[str, Any]) -> str:
+    return " ".join(f"{name}={value}" for name, value in cell.items())
+
+
+def _job_output(job: _Job) -> str:
+    # Output of matrix cells is prefixed with the cell values, to tell them apart.
+    if not job.cell:
+        return job.output
+    prefix = f"[{_cell_label(job.cell)}] "
+    return "".join(prefix + line for line in job.output.splitlines(keepends=True))
+
+
+def _print_matrix_results(jobs: list[_Job]) -> None:
+    # Table of the results of all matrix cells.
+    rows = [("duty", "cell", "result", "duration")]
+    for job in jobs:
+        if not job.cell:
+            continue
+        if job.code is None:
+            result, duration = "not run", ""
+        else:
+            result = "passed" if job.code == 0 else f"failed ({job.code})"
+            duration = f"{job.duration:.2f}s"
+        rows.append((job.name, _cell_label(job.cell), result, duration))
+    if len(rows) == 1:
+        return
+    widths = [max(len(row[column]) for row in rows) for column in range(len(rows[0]))]
+    for row in rows:
+        print("  ".join(value.ljust(width) for value, width in zip(row, widths)).rstrip())  # noqa: T201
+
+
+def _print_failures(failures: list[tuple[str, int | None]]) -> None:
+    # Summary printed at the end of runs that kept going after failures.
+    if not failures:
+        return
+    print(f"> {len(failures)} failed:", file=sys.stderr)  # noqa: T201
+    for name, code in failures:
+        reason = f"exit code {code}" if code is not None else "not run, a duty it depends on failed"
+        print(f">   {name} ({reason})", file=sys.stderr)  # noqa: T201
+
+
+def _run_jobs(
+    jobs: list[_Job],
+    max_jobs: int,
+    respawn: tuple[str, list[tuple]] | None = None,
+    history: Path | None = None,
+    *,
+    fail_fast: bool = False,
+    keep_going: bool = False,
+    resources: dict[str, int] | None = None,
+    jobserver: _JobServer | None = None,
+    workers: Sequence[str] = (),
+    estimate: bool = True,
+) -> int:
+    """Run jobs concurrently, in child processes.
+
+    A job starts once all the jobs it depends on have succeeded.
+    Among ready jobs, the one with the longest remaining critical path
+    (based on durations recorded by previous runs) starts first.
+    Without history, jobs start in declaration order.
+    Output of each job is captured and printed in the jobs order,
+    as soon as all previous jobs have been printed.
+    Once a job fails, no new job is started, but running ones are waited for.
+
+    Jobs only start when the resources they need are available, and their locks are free.
+    The capacity of the `cpu` resource is the maximum number of jobs.
+
+    With a jobserver, a token must also be acquired for each job running
+    in addition to the first one, so that the total number of jobs
+    is bounded across the whole processes tree (including make or duty
+    processes started by the jobs themselves).
+
+    With workers, duties are dispatched to free workers (each worker runs one duty at a time),
+    and only run locally when all workers are busy. Callables always run locally.
+
+    Each job runs in its own process group, so that the commands it runs
+    can be terminated with it, when the run is interrupted or fails fast.
+
+    Parameters:
+        jobs: The jobs to run, as built by `_build_jobs`.
+        max_jobs: The maximum number of jobs running at the same time.
+        respawn: When children cannot be forked: the duties file path and the commands
+            the jobs were built from, for children to rebuild them.
+        history: The file in which durations are recorded.
+        fail_fast: Once a job fails, terminate running jobs instead of waiting for them.
+        keep_going: Keep starting jobs after failures (except the ones depending on failed jobs),
+            and print a summary of all failures at the end.
+        resources: Capacities of resources other than `cpu`. Undeclared resources have a capacity of 1.
+        jobserver: A GNU make jobserver to acquire tokens from.
+        workers: Addresses of workers to dispatch duties to (repeat an address to give it more slots).
+        estimate: Whether to print the estimated and actual durations of the run at the end,
+            when durations are known.
+
+    Returns:
+        The exit code of the first failed job (in the jobs order), or 0.
+        130 when interrupted.
+    """
+    durations = _load_durations(history) if history else {}
+    capacities = _capacities(jobs, max_jobs, resources)
+    estimates = _estimate(jobs, durations)
+    priorities = _critical_paths(jobs, estimates)
+    run_started_at = time.monotonic()
+    pending = list(jobs)
+    running: dict[Connection, tuple[_Job, BaseProcess, float]] = {}
+    # Jobserver token held by each running job (none for the process' implicit token).
+    tokens: dict[Connection, bytes | None] = {}
+    free_workers = list(workers)
+    assigned: dict[Connection, str] = {}
+    printed = 0
+    failed = False
+    interrupted = False
+
+    def print_ready() -> None:
+        nonlocal printed
+        while printed < len(jobs) and jobs[printed].code is not None:
+            print(_job_output(jobs[printed]), end="", flush=True)  # noqa: T201
+            printed += 1
+
+    try:
+        while True:
+            waiting_for_token = False
+            if keep_going or not failed:
+                ready = [job for job in pending if all(dep.code == 0 for dep in job.deps)]
+                for job in _admit(ready, priorities, [job for job, _, _ in running.values()], capacities):
+                    token = None
+                    # The first running job uses the implicit token of this process.
+                    if jobserver is not None and None in tokens.values() and (token := jobserver.acquire()) is None:
+                        waiting_for_token = True
+                        break
+                    pending.remove(job)
+                    worker = free_workers.pop(0) if free_workers and job.key[0] != "callable" else None
+                    conn, process = _start(job, respawn, worker)
+                    running[conn] = (job, process, time.monotonic())
+                    tokens[conn] = token
+                    if worker is not None:
+                        assigned[conn] = worker
+            if not running:
+                break
+            # Also wake up when tokens become available.
+            waitables: list[Connection | int] = list(running)
+            if waiting_for_token and jobserver is not None:
+                waitables.append(jobserver.fileno())
+            for ready_conn in wait(waitables):
+                if isinstance(ready_conn, int):
+                    continue
+                conn = cast("Connection", ready_conn)
+                job, process, started_at = running.pop(conn)
+                _collect(job, conn, process, started_at)
+                if (token := tokens.pop(conn)) is not None and jobserver is not None:
+                    jobserver.release(token)
+                if conn in assigned:
+                    free_workers.append(assigned.pop(conn))
+                failed = failed or bool(job.code)
+            print_ready()
+            if failed and fail_fast:
+                break
+    except KeyboardInterrupt:
+        interrupted = True
+    finally:
+        _terminate([process for _, process, _ in running.values()])
+        for conn in running:
+            conn.close()
+            if (token := tokens.pop(conn)) is not None and jobserver is not None:
+                jobserver.release(token)
+
+    # Print the output of jobs that completed after a job that never started.
+    for job in jobs[printed:]:
+        if job.code is not None:
+            print(_job_output(job), end="", flush=True)  # noqa: T201
+
+    if history:
+        if estimate and any(job.name in durations for job in jobs):
+            estimated = _simulate(jobs, estimates, priorities, max_jobs, resources)
+            actual = time.monotonic() - run_started_at
+            print(f"Estimated duration: {estimated:.2f}s, actual duration: {actual:.2f}s")  # noqa: T201
+        _save_durations(history, jobs)
+
+    _print_matrix_results(jobs)
+    if keep_going:
+        # Failures of matrix cells are already reported in the results table.
+        _print_failures([(job.name, job.code) for job in jobs if job.code != 0 and not job.cell])
+    if interrupted:
+        return 130
+    return next((job.code for job in jobs if job.code), 0)
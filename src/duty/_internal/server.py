@@ -0,0 +1,335 @@
+from __future__ import annotations
+
+import json
+import os
+import select
+import signal
+import socket
+import sys
+import time
+import traceback
+from contextlib import closing, suppress
+from importlib import import_module
+from importlib.util import find_spec
+from typing import TYPE_CHECKING, Any
+
+from duty._internal.cache import _cache_dir
+from duty._internal.processes import _GRACE_PERIOD, _own_group, _signal_group
+
+if TYPE_CHECKING:
+    from collections.abc import Mapping
+
+    from duty._internal.collection import Collection
+
+# Clients send one JSON line (the command line arguments, working directory and environment),
+# along with their standard input, output and error file descriptors, and then signals to forward.
+# The server answers with the exit code, as a JSON line.
+_MAX_REQUEST_SIZE = 16 * 1024 * 1024
+# Requests are received in the accept loop: a stalled client must not block the others for long.
+_RECEIVE_TIMEOUT = 2.0
+_FORWARDED_SIGNALS = ("SIGINT", "SIGTERM", "SIGHUP")
+# Variables set by shells that change from one command to another.
+_SHELL_VARIABLES = ("_", "OLDPWD", "PWD", "SHLVL")
+
+# Whether this process is a server (or one of its children), which must not be a client.
+_serving = False
+
+
+def _server_address() -> str:
+    return os.getenv("DUTY_SERVER") or str(_cache_dir() / "server.sock")
+
+
+def _send(sock: socket.socket, message: dict[str, Any]) -> None:
+    sock.sendall(json.dumps(message).encode("utf8") + b"\n")
+
+
+def _client(argv: list[str]) -> int | None:
+    """Run a command on the server, if one is running.
+
+    Parameters:
+        argv: The command line arguments.
+
+    Returns:
+        The exit code of the command, or none if no server is running.
+    """
+    address = _server_address()
+    if _serving or not hasattr(socket, "send_fds") or not os.path.exists(address):
+        return None
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    with closing(sock):
+        request = {"argv": argv, "cwd": os.getcwd(), "env": dict(os.environ)}
+        try:
+            sock.connect(address)
+            # The server runs the command with our own terminal (or pipes, files, etc.).
+            socket.send_fds(sock, [json.dumps(request).encode("utf8") + b"\n"], [0, 1, 2])
+        except OSError:
+            # Stale socket, or closed standard streams: run the command in this process.
+            return None
+
+        def forward(signum: int, frame: Any) -> None:  # noqa: ARG001
+            with suppress(OSError):
+                _send(sock, {"signal": signum})
+
+        signals = [getattr(signal, name) for name in _FORWARDED_SIGNALS if hasattr(signal, name)]
+        handlers = {signum: signal.signal(signum, forward) for signum in signals}
+        try:
+            with sock.makefile("rb") as stream:
+                response = stream.readline()
+        finally:
+            for signum, handler in handlers.items():
+                signal.signal(signum, handler)
+    try:
+        return int(json.loads(response)["code"])
+    except (ValueError, KeyError, TypeError):
+        print("> The duty server disconnected", file=sys.stderr)  # noqa: T201
+        return 1
+
+
+class _Session:
+    """A command running in a child process of the server, for a client."""
+
+    # Not a dataclass: clients do not need to import dataclasses.
+    def __init__(self, sock: socket.socket, pid: int, reader: int, directory: str) -> None:
+        self.sock = sock
+        self.pid = pid
+        self.reader = reader
+        self.directory = directory
+        self.report = b""
+        self.connected = True
+        self.kill_at: float | None = None
+
+
+def _receive(sock: socket.socket) -> tuple[dict[str, Any], list[int]]:
+    deadline = time.monotonic() + _RECEIVE_TIMEOUT
+    sock.settimeout(_RECEIVE_TIMEOUT)
+    data, fds, _, _ = socket.recv_fds(sock, 65536, 3)
+    try:
+        while not data.endswith(b"\n") and len(data) <= _MAX_REQUEST_SIZE:
+            if (remaining := deadline - time.monotonic()) <= 0:
+                raise TimeoutError("request not received in time")
+            sock.settimeout(remaining)
+            if not (chunk := sock.recv(65536)):
+                break
+            data += chunk
+    except OSError:
+        for fd in fds:
+            os.close(fd)
+        raise
+    sock.settimeout(None)
+    try:
+        request = json.loads(data) if data.endswith(b"\n") and len(fds) == 3 else None  # noqa: PLR2004
+    except ValueError:
+        request = None
+    if not isinstance(request, dict):
+        for fd in fds:
+            os.close(fd)
+        raise ValueError("invalid request")  # noqa: TRY004
+    return request, fds
+
+
+def _run_child(request: dict[str, Any], fds: list[int], closed: list[int]) -> int:
+    # Run the command as if it was run by the client, in its terminal, directory and environment.
+    from duty._internal import cli  # noqa: PLC0415
+
+    for fd in closed:
+        with suppress(OSError):
+            os.close(fd)
+    signal.signal(signal.SIGINT, signal.default_int_handler)
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+    for target, fd in enumerate(fds):
+        os.dup2(fd, target)
+        os.close(fd)
+    try:
+        os.chdir(request["cwd"])
+        # Duties files can read environment variables when loaded: the collection loaded
+        # by the server is only used when the client environment is the same as the server one.
+        if _differ(request["env"], os.environ):
+            cli._preloaded = {}
+        os.environ.clear()
+        os.environ.update(request["env"])
+        code = cli.main(request["argv"])
+    except SystemExit as exit_:
+        code = exit_.code if isinstance(exit_.code, int) else int(exit_.code is not None)
+    except KeyboardInterrupt:
+        code = 130
+    except BaseException:  # noqa: BLE001
+        traceback.print_exc()
+        code = 1
+    with suppress(Exception):
+        sys.stdout.flush()
+        sys.stderr.flush()
+    return code
+
+
+def _differ(env: dict[str, str], other: Mapping[str, str]) -> bool:
+    keys = (env.keys() | other.keys()).difference(_SHELL_VARIABLES)
+    return any(env.get(key) != other.get(key) for key in keys)
+
+
+def _start(sock: socket.socket, closed: list[int]) -> _Session:
+    request, fds = _receive(sock)
+    reader, writer = os.pipe()
+    sys.stdout.flush()
+    sys.stderr.flush()
+    pid = os.fork()
+    if pid == 0:  # pragma: no cover
+        os.close(reader)
+        _own_group()
+        modules = set(sys.modules)
+        code = _run_child(request, fds, [*closed, sock.fileno()])
+        # Report the modules imported by the command, for the server to import them too.
+        with suppress(OSError):
+            os.write(writer, json.dumps(sorted(set(sys.modules) - modules)).encode("utf8"))
+        os._exit(code)
+    os.close(writer)
+    for fd in fds:
+        os.close(fd)
+    return _Session(sock, pid, reader, request["cwd"])
+
+
+def _warm_up(names: list[str], directory: str) -> None:
+    # Import the modules of installed packages that commands imported, so that next commands
+    # start with them already imported. Modules of the project are not imported, since they change.
+    directory = os.path.join(os.path.realpath(directory), "")
+    for name in names:
+        if name in sys.modules or name.startswith("__main__") or name == "duty.duties":
+            continue
+        with suppress(Exception):
+            # Finding the top-level package does not import it.
+            spec = find_spec(name.partition(".")[0])
+            if spec is None or os.path.realpath(spec.origin or "").startswith(directory):
+                continue
+            import_module(name)
+
+
+def _reload(collection: Collection | None, path: str) -> Collection | None:
+    # Load the duties file again when it changed, or when one of the modules it imported changed.
+    from duty._internal.collection import Collection  # noqa: PLC0415
+    from duty._internal.metadata import _cached_metadata, _metadata_file, _mtimes  # noqa: PLC0415
+
+    if collection is not None and _cached_metadata(path) is not None:
+        return collection
+    with suppress(OSError, ValueError, KeyError, AttributeError):
+        recorded = json.loads(_metadata_file(path).read_text(encoding="utf8"))["modules"]
+        changed = {file for file, mtime in _mtimes(recorded).items() if mtime != recorded[file]}
+        for name, module in list(sys.modules.items()):
+            if getattr(module, "__file__", None) in changed:
+                del sys.modules[name]
+    collection = Collection(path)
+    try:
+        collection.load()
+    except Exception:  # noqa: BLE001
+        # Commands load the file themselves, and report the error to clients.
+        traceback.print_exc()
+        return None
+    print(f"Loaded duties from {path}", file=sys.stderr, flush=True)  # noqa: T201
+    return collection
+
+
+def _finish(session: _Session) -> None:
+    os.close(session.reader)
+    _, status = os.waitpid(session.pid, 0)
+    code = os.waitstatus_to_exitcode(status)
+    with suppress(OSError), closing(session.sock):
+        _send(session.sock, {"code": 128 - code if code < 0 else code})
+    with suppress(ValueError):
+        _warm_up(json.loads(session.report or b"[]"), session.directory)
+
+
+def _run_server(collection: Collection, address: str) -> int:
+    """Serve commands to clients, in children processes forked from this warm process.
+
+    Parameters:
+        collection: The loaded collection of duties.
+        address: The path of the Unix socket to listen on.
+
+    Returns:
+        An exit code.
+    """
+    global _serving  # noqa: PLW0603
+    if not hasattr(os, "fork") or not hasattr(socket, "send_fds"):
+        print("> The duty server is only supported on platforms with fork and Unix sockets", file=sys.stderr)  # noqa: T201
+        return 1
+
+    from duty._internal import cli  # noqa: PLC0415
+
+    _serving = True
+    path = os.path.realpath(collection.path)
+    loaded: Collection | None = collection
+    os.makedirs(os.path.dirname(os.path.abspath(address)), exist_ok=True)
+    with suppress(FileNotFoundError):
+        os.unlink(address)
+    server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    # Commands run with the permissions of the server: only its user can connect,
+    # from the moment the socket is created.
+    umask = os.umask(0o177)
+    try:
+        server.bind(address)
+    finally:
+        os.umask(umask)
+    os.chmod(address, 0o600)
+    server.listen()
+    signal.signal(signal.SIGTERM, lambda *_: sys.exit(0))
+    print(f"Server listening on {address}", file=sys.stderr, flush=True)  # noqa: T201
+
+    sessions: dict[int, _Session] = {}
+    try:
+        while True:
+            now = time.monotonic()
+            deadlines = [session.kill_at - now for session in sessions.values() if session.kill_at is not None]
+            timeout = max(0, min(deadlines)) if deadlines else None
+            socks = [session.sock.fileno() for session in sessions.values() if session.connected]
+            fds = [server.fileno(), *sessions, *socks]
+            readable, _, _ = select.select(fds, [], [], timeout)
+
+            for session in sessions.values():
+                if session.kill_at is not None and session.kill_at <= time.monotonic():
+                    _signal_group(session.pid, kill=True)
+                    session.kill_at = None
+
+            if server.fileno() in readable:
+                sock, _ = server.accept()
+                loaded = _reload(loaded, path)
+                cli._preloaded = {path: loaded} if loaded is not None else {}
+                closed = [fd for session in sessions.values() for fd in (session.reader, session.sock.fileno())]
+                try:
+                    session = _start(sock, [server.fileno(), *closed])
+                except (OSError, ValueError):
+                    sock.close()
+                else:
+                    sessions[session.reader] = session
+
+            for reader, session in list(sessions.items()):
+                if session.connected and session.sock.fileno() in readable:
+                    _forward(session)
+                if reader in readable:
+                    chunk = os.read(reader, 65536)
+                    if chunk:
+                        session.report += chunk
+                    else:
+                        del sessions[reader]
+                        _finish(session)
+    except (KeyboardInterrupt, SystemExit):
+        for session in sessions.values():
+            _signal_group(session.pid)
+        return 0
+    finally:
+        server.close()
+        with suppress(FileNotFoundError):
+            os.unlink(address)
+
+
+def _forward(session: _Session) -> None:
+    # Forward signals sent by the client, and terminate the command if the client disconnected.
+    try:
+        data = session.sock.recv(65536)
+    except OSError:
+        data = b""
+    if not data:
+        session.connected = False
+        _signal_group(session.pid)
+        session.kill_at = time.monotonic() + _GRACE_PERIOD
+        return
+    for line in data.splitlines():
+        with suppress(ValueError, KeyError, TypeError, OSError):
+            os.killpg(session.pid, int(json.loads(line)["signal"]))
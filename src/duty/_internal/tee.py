@@ -0,0 +1,84 @@
+from __future__ import annotations
+
+import os
+import sys
+import threading
+from contextlib import contextmanager
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from collections.abc import Iterator
+
+# Time given to subprocesses still holding the pipes to stop writing to them.
+_JOIN_TIMEOUT = 1.0
+
+
+class _TeeOutput:
+    """Output recorded by `_tee`, available once its block is exited."""
+
+    def __init__(self) -> None:
+        self.chunks: list[bytes] = []
+        self.lock = threading.Lock()
+
+    def add(self, data: bytes) -> None:
+        with self.lock:
+            self.chunks.append(data)
+
+    def __str__(self) -> str:
+        return b"".join(self.chunks).decode("utf8", errors="replace")
+
+
+def _copy(read_fd: int, target_fd: int, output: _TeeOutput) -> None:
+    pending = b""
+    try:
+        while chunk := os.read(read_fd, 65536):
+            view = memoryview(chunk)
+            while view:
+                view = view[os.write(target_fd, view) :]
+            # Only record complete lines, so that lines of both streams are not mixed together.
+            lines, newline, pending = (pending + chunk).rpartition(b"\n")
+            if newline:
+                output.add(lines + newline)
+    except OSError:
+        pass
+    finally:
+        if pending:
+            output.add(pending)
+        os.close(read_fd)
+
+
+@contextmanager
+def _tee() -> Iterator[_TeeOutput]:
+    """Record standard output and error at the file descriptor level, while still writing them.
+
+    Unlike `Capture.BOTH.here()`, output is written as soon as it is produced,
+    and standard error is written to standard error. Both streams are recorded together,
+    line by line, in the order they are received.
+
+    Yields:
+        The recorded output.
+    """
+    sys.stdout.flush()
+    sys.stderr.flush()
+    output = _TeeOutput()
+    streams = []
+    for stream_fd in (sys.stdout.fileno(), sys.stderr.fileno()):
+        saved_fd = os.dup(stream_fd)
+        read_fd, write_fd = os.pipe()
+        os.dup2(write_fd, stream_fd)
+        os.close(write_fd)
+        thread = threading.Thread(target=_copy, args=(read_fd, saved_fd, output), daemon=True)
+        thread.start()
+        streams.append((stream_fd, saved_fd, thread))
+    try:
+        yield output
+    finally:
+        sys.stdout.flush()
+        sys.stderr.flush()
+        # Restoring the streams closes the write ends of the pipes: copying threads then stop.
+        for stream_fd, saved_fd, _ in streams:
+            os.dup2(saved_fd, stream_fd)
+        for _, saved_fd, thread in streams:
+            thread.join(_JOIN_TIMEOUT)
+            if not thread.is_alive():
+                os.close(saved_fd)
@@ -1,25 +1,30 @@
 from __future__ import annotations
 
-from duty._internal.tools._autoflake import autoflake
-from duty._internal.tools._black import black
-from duty._internal.tools._blacken_docs import blacken_docs
-from duty._internal.tools._build import build
-from duty._internal.tools._coverage import coverage
-from duty._internal.tools._flake8 import flake8
-from duty._internal.tools._git_changelog import git_changelog
-from duty._internal.tools._griffe import griffe
-from duty._internal.tools._interrogate import interrogate
-from duty._internal.tools._isort import isort
-from duty._internal.tools._mkdocs import mkdocs
-from duty._internal.tools._mypy import mypy
-from duty._internal.tools._pytest import pytest
-from duty._internal.tools._ruff import ruff
-from duty._internal.tools._safety import safety
-from duty._internal.tools._ssort import ssort
-from duty._internal.tools._twine import twine
-from duty._internal.tools._ty import ty
-from duty._internal.tools._yore import yore
-from duty._internal.tools._zensical import zensical
+from importlib import import_module
+from typing import TYPE_CHECKING, Any
+
+# Tools are imported lazily (PEP 562): each one is only imported when used.
+if TYPE_CHECKING:
+    from duty._internal.tools._autoflake import autoflake
+    from duty._internal.tools._black import black
+    from duty._internal.tools._blacken_docs import blacken_docs
+    from duty._internal.tools._build import build
+    from duty._internal.tools._coverage import coverage
+    from duty._internal.tools._flake8 import flake8
+    from duty._internal.tools._git_changelog import git_changelog
+    from duty._internal.tools._griffe import griffe
+    from duty._internal.tools._interrogate import interrogate
+    from duty._internal.tools._isort import isort
+    from duty._internal.tools._mkdocs import mkdocs
+    from duty._internal.tools._mypy import mypy
+    from duty._internal.tools._pytest import pytest
+    from duty._internal.tools._ruff import ruff
+    from duty._internal.tools._safety import safety
+    from duty._internal.tools._ssort import ssort
+    from duty._internal.tools._twine import twine
+    from duty._internal.tools._ty import ty
+    from duty._internal.tools._yore import yore
+    from duty._internal.tools._zensical import zensical
 
 __all__ = [
     "autoflake",
@@ -43,3 +48,15 @@ __all__ = [
     "yore",
     "zensical",
 ]
+
+
+def __getattr__(name: str) -> Any:
+    if name not in __all__:
+        raise AttributeError(f"module '{__name__}' has no attribute '{name}'")
+    value = getattr(import_module(f"duty._internal.tools._{name}"), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__() -> list[str]:
+    return sorted({*globals(), *__all__})
@@ -1,10 +1,102 @@
 from __future__ import annotations
 
-from typing import Literal
+import os
+import shutil
+import tempfile
+from typing import Any, Literal
 
 from duty._internal.tools._base import Tool
 
 
+def _coverage(data_file: str | None, rcfile: str | None, debug_opts: list[str] | None, *, messages: bool) -> Any:
+    from coverage import Coverage  # noqa: PLC0415
+    from coverage.control import DEFAULT_DATAFILE  # noqa: PLC0415
+
+    return Coverage(
+        data_file=data_file or DEFAULT_DATAFILE,
+        config_file=rcfile or True,
+        debug=debug_opts,
+        messages=messages,
+    )
+
+
+def _combine_chunk(partial: str, paths: list[str], rcfile: str | None) -> None:
+    # Data files are merged one at a time into the partial data file:
+    # a worker only holds the partial data and the data file being merged.
+    cov = _coverage(partial, rcfile, None, messages=False)
+    cov.combine(paths, strict=True, keep=True)
+    cov.save()
+
+
+def _combine_parallel(
+    paths: list[str],
+    *,
+    jobs: int,
+    rcfile: str | None,
+    append: bool,
+    data_file: str | None,
+    keep: bool,
+    quiet: bool,
+    debug_opts: list[str] | None,
+) -> int:
+    """Combine data files in parallel.
+
+    Data files are split in as many chunks as jobs, each chunk being combined
+    into a partial data file by a separate process. Partial data files are then
+    combined into the final data file.
+
+    Parameters:
+        paths: Data files or directories containing data files.
+        jobs: Number of processes combining data files.
+        rcfile: Configuration file.
+        append: Whether to append to the existing data file.
+        data_file: The final data file.
+        keep: Whether to keep original data files.
+        quiet: Whether to print a summary.
+        debug_opts: Debug options.
+
+    Returns:
+        The exit code.
+    """
+    from concurrent.futures import ProcessPoolExecutor  # noqa: PLC0415
+    from multiprocessing import get_context  # noqa: PLC0415
+
+    from coverage.data import combinable_files  # noqa: PLC0415
+
+    from duty._internal.scheduler import _START_METHOD  # noqa: PLC0415
+
+    cov = _coverage(data_file, rcfile, debug_opts, messages=False)
+    final_file = os.path.abspath(cov.config.data_file)
+    data_files = combinable_files(final_file, paths or None)
+    if not data_files:
+        print("No data to combine")  # noqa: T201
+        return 1
+
+    chunks = [data_files[index::jobs] for index in range(min(jobs, len(data_files)))]
+    # Partial data files must not be picked up by other combinations: they are written in their own directory.
+    partials_dir = tempfile.mkdtemp(prefix=".combine-", dir=os.path.dirname(final_file))
+    partials = [os.path.join(partials_dir, f"partial.{index}") for index in range(len(chunks))]
+    try:
+        with ProcessPoolExecutor(max_workers=len(chunks), mp_context=get_context(_START_METHOD)) as executor:
+            for future in [
+                executor.submit(_combine_chunk, partial, chunk, rcfile) for partial, chunk in zip(partials, chunks)
+            ]:
+                future.result()
+        if append:
+            cov.load()
+        cov.combine(partials, strict=True, keep=True)
+        cov.save()
+    finally:
+        shutil.rmtree(partials_dir, ignore_errors=True)
+
+    if not keep:
+        for path in data_files:
+            os.remove(path)
+    if not quiet:
+        print(f"Combined {len(data_files)} data files into {os.path.relpath(final_file)} using {len(chunks)} processes")  # noqa: T201
+    return 0
+
+
 class coverage(Tool):  # noqa: N801
     """Call [Coverage.py](https://github.com/nedbat/coveragepy)."""
 
@@ -80,6 +172,7 @@ class coverage(Tool):  # noqa: N801
         keep: bool | None = None,
         quiet: bool | None = None,
         debug_opts: list[str] | None = None,
+        jobs: int | None = None,
     ) -> coverage:
         """Combine a number of data files.
 
@@ -98,6 +191,9 @@ class coverage(Tool):  # noqa: N801
             keep: Keep original coverage files, otherwise they are deleted.
             quiet: Don't print messages about what is happening.
             debug_opts: Debug options, separated by commas [env: `COVERAGE_DEBUG`].
+            jobs: Combine data files in this many processes. Each process merges a chunk of the data files,
+                one file at a time, into a partial data file, and partial data files are then merged together.
+                Useful when combining hundreds of data files, for example one per Python version and xdist worker.
         """
         cli_args = ["combine", *paths]
 
@@ -122,6 +218,21 @@ class coverage(Tool):  # noqa: N801
             cli_args.append("--rcfile")
             cli_args.append(rcfile)
 
+        if jobs is not None:
+            if jobs < 1:
+                raise ValueError(f"Invalid number of jobs {jobs}: must be at least 1")
+            py_args = {
+                "paths": list(paths),
+                "jobs": jobs,
+                "rcfile": rcfile,
+                "append": bool(append),
+                "data_file": data_file,
+                "keep": bool(keep),
+                "quiet": bool(quiet),
+                "debug_opts": debug_opts,
+            }
+            return cls(cli_args, py_args={"combine": py_args})
+
         return cls(cli_args)
 
     @classmethod
@@ -720,6 +831,9 @@ class coverage(Tool):  # noqa: N801
         Returns:
             The exit code of the command.
         """
+        if "combine" in self.py_args:
+            return _combine_parallel(**self.py_args["combine"])
+
         from coverage.cmdline import main as run_coverage  # noqa: PLC0415
 
         return run_coverage(self.cli_args)
@@ -1,9 +1,91 @@
 from __future__ import annotations
 
-from typing import Literal
+import os
+import subprocess
+import sys
+from typing import TYPE_CHECKING, Literal
 
+from duty._internal.cache import _cache_dir, _digest, _hash_file, _write_atomically
 from duty._internal.tools._base import LazyStderr, LazyStdout, Tool
 
+if TYPE_CHECKING:
+    from pathlib import Path
+
+# Files where mypy looks for its configuration, in the current directory.
+_CONFIG_FILES = ("mypy.ini", ".mypy.ini", "pyproject.toml", "setup.cfg")
+
+
+def _dmypy(*args: str) -> subprocess.CompletedProcess:
+    # The daemon is started from a fresh interpreter, not forked from this process:
+    # it must not inherit the state of duty (open sockets, signal handlers, captured output).
+    return subprocess.run(  # noqa: S603
+        [sys.executable, "-m", "mypy.dmypy", *args],
+        capture_output=True,
+        text=True,
+        check=False,
+    )
+
+
+def _config_digest(flags: list[str]) -> str:
+    # The daemon must restart when its configuration changes.
+    from mypy.version import __version__  # noqa: PLC0415
+
+    config_files = list(_CONFIG_FILES)
+    if "--config-file" in flags:
+        config_files.append(flags[flags.index("--config-file") + 1])
+    hashes = {file: _hash_file(file) for file in config_files if os.path.isfile(file)}
+    return _digest(__version__, flags, hashes)
+
+
+def _run_daemon(cli_args: list[str], flags: list[str]) -> None:
+    # Type-check through a mypy daemon, started once per project and options.
+    from mypy.dmypy.client import is_running  # noqa: PLC0415
+    from mypy.dmypy.client import main as run_dmypy  # noqa: PLC0415
+
+    status_file = _cache_dir().absolute() / "daemons" / f"mypy-{_digest(os.getcwd(), flags)}.json"
+    log_file = status_file.with_suffix(".log")
+    config_file = status_file.with_suffix(".config")
+    digest = _config_digest(flags)
+    running = is_running(str(status_file))
+    if not running or not config_file.exists() or config_file.read_text(encoding="utf8") != digest:
+        status_file.parent.mkdir(parents=True, exist_ok=True)
+        result = _dmypy(
+            "--status-file",
+            str(status_file),
+            "restart" if running else "start",
+            "--log-file",
+            str(log_file),
+            "--",
+            *flags,
+        )
+        # Another process may have started the same daemon concurrently.
+        if result.returncode and not is_running(str(status_file)):
+            sys.stdout.write(result.stdout)
+            sys.stderr.write(result.stderr)
+            sys.exit(result.returncode)
+        _write_atomically(config_file, digest)
+    run_dmypy(["--status-file", str(status_file), "run", "--log-file", str(log_file), "--", *cli_args])
+
+
+def _shutdown_daemons(cache_dir: Path) -> int:
+    """Stop the mypy daemons started from the given cache directory.
+
+    Parameters:
+        cache_dir: The cache directory.
+
+    Returns:
+        An exit code.
+    """
+    for status_file in sorted(cache_dir.joinpath("daemons").glob("mypy-*.json")):
+        result = _dmypy("--status-file", str(status_file), "stop")
+        if result.returncode:
+            # The daemon is not running anymore, or does not respond.
+            _dmypy("--status-file", str(status_file), "kill")
+        status_file.with_suffix(".config").unlink(missing_ok=True)
+        status_file.unlink(missing_ok=True)
+        print(f"Stopped mypy daemon ({status_file.name})")  # noqa: T201
+    return 0
+
 
 class mypy(Tool):  # noqa: N801
     """Call [Mypy](https://github.com/python/mypy)."""
@@ -97,6 +179,7 @@ class mypy(Tool):  # noqa: N801
         module: str | None = None,
         package: str | None = None,
         command: str | None = None,
+        daemon: bool = False,
     ) -> None:
         """Run mypy.
 
@@ -205,6 +288,9 @@ class mypy(Tool):  # noqa: N801
             module: Type-check module; can repeat for more modules.
             package: Type-check package recursively; can be repeated.
             command: Type-check program passed in as string.
+            daemon: Type-check through a mypy daemon (`dmypy`), started on first use and kept running
+                (one per project and options), so that following checks are incremental.
+                The daemon restarts when mypy's configuration changes. Stop it with `duty --shutdown-daemons`.
         """  # noqa: D301
         cli_args = list(paths)
 
@@ -488,10 +574,14 @@ class mypy(Tool):  # noqa: N801
             cli_args.append("--command")
             cli_args.append(command)
 
-        super().__init__(cli_args)
+        super().__init__(cli_args, py_args={"daemon": daemon, "paths": paths})
 
     def __call__(self) -> None:
         """Run the command."""
+        if self.py_args["daemon"]:
+            _run_daemon(self.cli_args, self.cli_args[len(self.py_args["paths"]) :])
+            return
+
         from mypy.main import main as run_mypy  # noqa: PLC0415
 
         run_mypy(
@@ -1,9 +1,425 @@
 from __future__ import annotations
 
-from typing import Literal
-
+import json
+import os
+import subprocess
+import sys
+from contextlib import contextmanager, suppress
+from pathlib import Path
+from typing import TYPE_CHECKING, Any, Literal
+
+from duty._internal.cache import FileIndex, _cache_dir, _digest, _write_atomically
 from duty._internal.tools._base import Tool
 
+if TYPE_CHECKING:
+    from collections.abc import Iterator
+
+# Exit code of pytest when no tests were collected (or all were deselected).
+_NO_TESTS_COLLECTED = 5
+
+
+def _partition(node_ids: list[str], durations: dict[str, float], count: int) -> list[list[str]]:
+    """Partition tests into shards taking about the same time to run.
+
+    Longest tests are assigned first, each to the shard with the smallest total duration.
+    Tests without recorded duration are assumed to take the average duration of the others.
+    The partition only depends on its arguments: every shard computes the same one.
+
+    Parameters:
+        node_ids: The node IDs of the tests.
+        durations: Recorded durations of tests, in seconds.
+        count: The number of shards.
+
+    Returns:
+        The node IDs of each shard, in their original order.
+    """
+    known = [durations[node_id] for node_id in node_ids if node_id in durations]
+    default = sum(known) / len(known) if known else 1.0
+    totals = [0.0] * count
+    shard_of = {}
+    for node_id in sorted(node_ids, key=lambda node_id: (-durations.get(node_id, default), node_id)):
+        index = min(range(count), key=lambda index: (totals[index], index))
+        shard_of[node_id] = index
+        totals[index] += durations.get(node_id, default)
+    return [[node_id for node_id in node_ids if shard_of[node_id] == index] for index in range(count)]
+
+
+def _load_durations(path: str) -> dict[str, float]:
+    with suppress(OSError, ValueError), open(path, encoding="utf8") as file:
+        return json.load(file)
+    return {}
+
+
+@contextmanager
+def _locked(path: str) -> Iterator[None]:
+    # Shards running concurrently update the same files: lock them while merging.
+    with open(f"{path}.lock", "w", encoding="utf8") as lock:
+        with suppress(ImportError):
+            import fcntl  # noqa: PLC0415
+
+            fcntl.flock(lock, fcntl.LOCK_EX)
+        yield
+
+
+def _merge_shards(path: str, shard_files: list[str]) -> None:
+    merged = _load_durations(path)
+    for shard_file in shard_files:
+        merged.update(_load_durations(shard_file))
+        os.remove(shard_file)
+    _write_atomically(Path(path), json.dumps(merged, indent=0, sort_keys=True))
+
+
+def _save_durations(path: str, durations: dict[str, float], shard: tuple[int, int] | None) -> list[int]:
+    """Record durations of tests.
+
+    All shards must partition tests with the same durations: the durations of each shard
+    are only merged into the file once all the shards ran (whether concurrently or one after the other).
+    When a shard runs again before all the others ran here (for example because they run on other machines),
+    the durations recorded by the shards that ran are merged before recording the new ones.
+
+    Parameters:
+        path: The durations file.
+        durations: The durations of the tests that ran.
+        shard: The shard that ran, if any.
+
+    Returns:
+        The indices of the shards whose durations were missing when merging the durations of the others.
+    """
+    with _locked(path):
+        if shard is None:
+            _write_atomically(Path(path), json.dumps({**_load_durations(path), **durations}, indent=0, sort_keys=True))
+            return []
+        index, count = shard
+        pending = [f"{path}.shard-{number}-of-{count}" for number in range(1, count + 1)]
+        missing = []
+        if os.path.exists(pending[index - 1]):
+            missing = [number for number, shard_file in enumerate(pending, 1) if not os.path.exists(shard_file)]
+            _merge_shards(path, [shard_file for shard_file in pending if os.path.exists(shard_file)])
+        _write_atomically(Path(pending[index - 1]), json.dumps(durations))
+        if all(os.path.exists(shard_file) for shard_file in pending):
+            _merge_shards(path, pending)
+        return missing
+
+
+def _shard_plugin(shard: tuple[int, int] | None, durations_file: str) -> Any:
+    # Defined when running pytest, to import it lazily.
+    import pytest as _pytest  # noqa: PT013,PLC0415
+
+    class Shards:
+        def __init__(self) -> None:
+            self.durations = _load_durations(durations_file)
+            self.recorded: dict[str, float] = {}
+            self.deselected: set[str] = set()
+            self.empty = False
+            self.missing: list[int] = []
+
+        # After other plugins deselected tests (for example with `-k`).
+        @_pytest.hookimpl(trylast=True)
+        def pytest_collection_modifyitems(self, config: _pytest.Config, items: list[_pytest.Item]) -> None:
+            if shard is None or not items:
+                return
+            index, count = shard
+            selected = set(_partition([item.nodeid for item in items], self.durations, count)[index - 1])
+            deselected = [item for item in items if item.nodeid not in selected]
+            items[:] = [item for item in items if item.nodeid in selected]
+            config.hook.pytest_deselected(items=deselected)
+            self.deselected = {item.nodeid for item in deselected}
+            self.empty = not items
+
+        def pytest_runtest_logreport(self, report: _pytest.TestReport) -> None:
+            # Setup, call and teardown.
+            self.recorded[report.nodeid] = self.recorded.get(report.nodeid, 0.0) + report.duration
+
+        def pytest_sessionfinish(self) -> None:
+            if self.recorded:
+                os.makedirs(os.path.dirname(os.path.abspath(durations_file)), exist_ok=True)
+                self.missing = _save_durations(durations_file, self.recorded, shard)
+
+        def pytest_terminal_summary(self, terminalreporter: Any) -> None:
+            if self.missing and shard is not None:
+                shards = ", ".join(str(index) for index in self.missing)
+                terminalreporter.write_line(
+                    f"Durations of shards {shards} of {shard[1]} are missing: "
+                    f"merged the durations of the shards that ran in {durations_file}",
+                    yellow=True,
+                )
+
+    return Shards()
+
+
+# Changes to these files can change which tests run, or how: all tests must run.
+_CONFIG_FILES = frozenset(
+    ("conftest.py", "pytest.ini", ".pytest.ini", "pyproject.toml", "setup.cfg", "tox.ini", ".coveragerc"),
+)
+
+
+def _impact_environment() -> str:
+    import pytest as _pytest  # noqa: PT013,PLC0415
+
+    return _digest(sys.version_info[:2], _pytest.__version__)
+
+
+def _load_impact(path: str) -> dict[str, Any] | None:
+    """Load the index of files covered by tests.
+
+    Parameters:
+        path: The path of the index.
+
+    Returns:
+        The index, with files mapped to their hash and the tests covering them
+        (`None` meaning all tests), or `None` when there is no usable index.
+    """
+    try:
+        with open(path, encoding="utf8") as file:
+            data = json.load(file)
+        tests = data["tests"]
+        return {
+            "environment": data["environment"],
+            "tests": set(tests),
+            "files": {
+                file_path: (digest, None if indices is None else {tests[index] for index in indices})
+                for file_path, (digest, indices) in data["files"].items()
+            },
+            "pending": set(data["pending"]),
+        }
+    except (OSError, ValueError, KeyError, TypeError, IndexError):
+        return None
+
+
+def _dump_impact(index: dict[str, Any]) -> str:
+    # Test node IDs are stored once, and referenced by their position in files entries.
+    tests = sorted(index["tests"])
+    positions = {node_id: position for position, node_id in enumerate(tests)}
+    files = {
+        file_path: [digest, None if covering is None else sorted(positions[node_id] for node_id in covering)]
+        for file_path, (digest, covering) in sorted(index["files"].items())
+    }
+    return json.dumps(
+        {"environment": index["environment"], "tests": tests, "files": files, "pending": sorted(index["pending"])},
+        separators=(",", ":"),
+    )
+
+
+def _git_changed_files(ref: str) -> set[str] | None:
+    """Return the files changed since the merge base of a Git reference and `HEAD`.
+
+    Changes in the working tree and untracked files are included.
+
+    Parameters:
+        ref: A Git reference, for example `origin/main`.
+
+    Returns:
+        Paths relative to the current working directory, or `None` when Git failed.
+    """
+
+    def git(*args: str) -> str:
+        return subprocess.run(  # noqa: S603
+            ["git", *args],  # noqa: S607
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout
+
+    try:
+        root = git("rev-parse", "--show-toplevel").strip()
+        base = git("merge-base", "HEAD", ref).strip()
+        changed = git("diff", "--name-only", "--no-renames", "-z", base).split("\0")
+        changed += git("ls-files", "--others", "--exclude-standard", "--full-name", "-z").split("\0")
+    except (OSError, subprocess.CalledProcessError):
+        return None
+    return {os.path.relpath(os.path.join(root, path)) for path in changed if path}
+
+
+def _affected_tests(files: dict[str, tuple[str, set[str] | None]], changed: set[str]) -> set[str] | None:
+    """Return the tests covering changed files.
+
+    Parameters:
+        files: The recorded files, mapped to their hash and the tests covering them.
+        changed: The changed files.
+
+    Returns:
+        The node IDs of the affected tests, or `None` when all tests must run.
+    """
+    affected: set[str] = set()
+    for path in changed:
+        if os.path.basename(path) in _CONFIG_FILES:
+            return None
+        if path in files:
+            covering = files[path][1]
+            if covering is None:
+                return None
+            affected |= covering
+    return affected
+
+
+def _merge_impact(
+    index: dict[str, Any] | None,
+    environment: str,
+    covered: dict[str, set[str] | None],
+    ran: set[str],
+    pending: set[str],
+) -> dict[str, Any]:
+    """Merge the files covered by the tests that ran into an index.
+
+    Parameters:
+        index: The index to update, if any.
+        environment: The digest of the current environment.
+        covered: The files covered during this run, mapped to the tests covering them
+            (`None` meaning files only executed outside of tests, for example when importing modules).
+        ran: The node IDs of the tests that ran.
+        pending: The node IDs of the affected tests that must run again next time.
+
+    Returns:
+        The updated index. Hashes of files are not updated.
+    """
+    if index is None or index["environment"] != environment:
+        index = {"environment": environment, "tests": set(), "files": {}, "pending": set()}
+    files: dict[str, tuple[str, set[str] | None]] = {}
+    for path in index["files"].keys() | covered.keys():
+        digest, previous = index["files"].get(path, ("", set()))
+        current = covered.get(path, set())
+        if current is None:
+            # Files only executed outside of tests (for example when importing modules) affect all of them.
+            tests = None if previous is None else (previous - ran) or None
+        elif previous is None and path not in covered:
+            tests = None
+        else:
+            tests = (previous or set()) - ran | current
+        if tests != set():
+            files[path] = (digest, tests)
+    return {"environment": environment, "tests": index["tests"] | ran, "files": files, "pending": pending}
+
+
+def _impact_plugin(affected_since: str | Literal[True] | None, impact_file: str, shards: Any) -> Any:
+    import pytest as _pytest  # noqa: PT013,PLC0415
+
+    class Impact:
+        def __init__(self) -> None:
+            self.environment = _impact_environment()
+            self.index = _load_impact(impact_file)
+            self.affected: set[str] | None = None
+            self.changed: set[str] = set()
+            self.reason = ""
+            if self.index is None or self.index["environment"] != self.environment:
+                self.reason = "all tests selected: no recorded coverage for this environment"
+            elif affected_since is not None:
+                self._select(self.index)
+            self.coverage: Any = None
+            self.own_coverage = False
+            self.selected: set[str] = set()
+            self.ran: set[str] = set()
+            self.failed: set[str] = set()
+            self.test_files: set[str] = set()
+            self.empty = False
+
+        def _select(self, index: dict[str, Any]) -> None:
+            files = index["files"]
+            hashes = FileIndex().hash_files(files)
+            changed = {path for path, (digest, _) in files.items() if hashes.get(path) != digest}
+            changed |= {name for name in _CONFIG_FILES if name not in files and os.path.exists(name)}
+            if isinstance(affected_since, str):
+                changed_in_git = _git_changed_files(affected_since)
+                if changed_in_git is None:
+                    self.reason = f"all tests selected: cannot list files changed since {affected_since}"
+                    return
+                changed |= changed_in_git
+            self.changed = changed
+            self.affected = _affected_tests(files, changed)
+            if self.affected is None:
+                self.reason = "all tests selected: configuration or code executed outside of tests changed"
+            else:
+                since = "last run" if affected_since is True else affected_since
+                self.reason = f"{len(changed)} files changed since {since}"
+
+        def pytest_report_header(self) -> list[str]:
+            return [] if affected_since is None else [f"affected tests: {self.reason}"]
+
+        @_pytest.hookimpl(tryfirst=True)
+        def pytest_sessionstart(self) -> None:
+            from coverage import Coverage  # noqa: PLC0415
+
+            # Coverage may already be measured, for example by `coverage run` or pytest-cov.
+            self.coverage = Coverage.current()
+            if self.coverage is None:
+                self.coverage = Coverage(data_file=None)
+                self.coverage.start()
+                self.own_coverage = True
+
+        def pytest_collection_modifyitems(self, config: _pytest.Config, items: list[_pytest.Item]) -> None:
+            self.test_files = {os.path.relpath(item.path) for item in items}
+            # Tests are only affected when coverage was recorded.
+            if self.affected is not None and (index := self.index) is not None:
+                # New tests, tests in changed files and tests that did not pass last time are selected too.
+                selected = self.affected | index["pending"]
+                keep = [
+                    item
+                    for item in items
+                    if item.nodeid in selected
+                    or item.nodeid not in index["tests"]
+                    or os.path.relpath(item.path) in self.changed
+                ]
+                deselected = [item for item in items if item not in keep]
+                items[:] = keep
+                config.hook.pytest_deselected(items=deselected)
+                self.empty = not items and bool(deselected)
+            self.selected = {item.nodeid for item in items}
+
+        def pytest_runtest_logstart(self, nodeid: str) -> None:
+            self.coverage.switch_context(nodeid)
+
+        def pytest_runtest_logfinish(self) -> None:
+            self.coverage.switch_context("")
+
+        def pytest_runtest_logreport(self, report: _pytest.TestReport) -> None:
+            self.ran.add(report.nodeid)
+            if report.failed:
+                self.failed.add(report.nodeid)
+
+        def pytest_sessionfinish(self, session: _pytest.Session) -> None:
+            if self.own_coverage:
+                self.coverage.stop()
+            covered = self._covered(session.config.rootpath)
+            config_files = [name for name in _CONFIG_FILES if os.path.exists(name)]
+            if session.config.inipath:
+                config_files.append(os.path.relpath(session.config.inipath))
+            covered.update(dict.fromkeys(config_files))
+            # Affected tests that did not pass (failed, or were deselected by other options) must run next time.
+            pending = (self.index["pending"] if self.index else set()) | self.selected | (self.affected or set())
+            pending = pending - self.ran - (shards.deselected if shards else set()) | self.failed
+            os.makedirs(os.path.dirname(os.path.abspath(impact_file)), exist_ok=True)
+            with _locked(impact_file):
+                index = _merge_impact(_load_impact(impact_file), self.environment, covered, self.ran, pending)
+                hashes = FileIndex().hash_files(index["files"])
+                index["files"] = {
+                    path: (hashes[path], tests) for path, (_, tests) in index["files"].items() if path in hashes
+                }
+                _write_atomically(Path(impact_file), _dump_impact(index))
+
+        def _covered(self, rootpath: Path) -> dict[str, set[str] | None]:
+            data = self.coverage.get_data()
+            covered: dict[str, set[str] | None] = {}
+            for filename in data.measured_files():
+                path = os.path.relpath(filename)
+                if path.startswith(os.pardir):
+                    continue
+                contexts = set().union(*data.contexts_by_lineno(filename).values())
+                # Static contexts configured in Coverage.py are prefixed to test node IDs.
+                tests = {context if context in self.ran else context.split("|", 1)[-1] for context in contexts}
+                covered[path] = (tests & self.ran) or None
+            # Conftest modules are loaded before coverage starts.
+            for test_file in self.test_files:
+                directory = Path(test_file).absolute().parent
+                while directory.is_relative_to(rootpath):
+                    conftest = directory / "conftest.py"
+                    if conftest.exists():
+                        covered[os.path.relpath(conftest)] = None
+                    if directory == rootpath:
+                        break
+                    directory = directory.parent
+            return covered
+
+    return Impact()
+
 
 class pytest(Tool):  # noqa: N801
     """Call [pytest](https://github.com/pytest-dev/pytest)."""
@@ -95,6 +511,10 @@ class pytest(Tool):  # noqa: N801
         log_file_format: str | None = None,
         log_file_date_format: str | None = None,
         log_auto_indent: str | None = None,
+        shard: tuple[int, int] | None = None,
+        durations_file: str | None = None,
+        affected_since: str | Literal[True] | None = None,
+        impact_file: str | None = None,
     ) -> None:
         """Run `pytest`.
 
@@ -181,6 +601,19 @@ class pytest(Tool):  # noqa: N801
             log_file_format: Log format used by the logging module.
             log_file_date_format: Log date format used by the logging module.
             log_auto_indent: Auto-indent multiline messages passed to the logging module. Accepts true|on, false|off or an integer.
+            shard: Only run the tests of the given shard, as a tuple `(index, count)`, index starting at 1.
+                Tests are partitioned using their durations recorded in previous runs,
+                so that all shards take about the same time to run.
+            durations_file: File where the durations of tests are recorded, to balance shards
+                (default: `.duty/pytest-durations.json`). Durations are only recorded
+                when running a shard, or when this file is given.
+            affected_since: Only run the tests affected by the files changed since the given Git reference
+                (since its merge base with `HEAD`, including uncommitted changes), or since the last recorded run
+                when `True`. The files covered by each test are recorded with Coverage.py in previous runs.
+                All tests run when no coverage was recorded, or when configuration files changed.
+            impact_file: File where the files covered by each test are recorded
+                (default: `.duty/pytest-impact.json`). Coverage is only recorded
+                when selecting affected tests, or when this file is given.
         """
         cli_args = list(paths)
 
@@ -474,7 +907,18 @@ class pytest(Tool):  # noqa: N801
             cli_args.append("--log-auto-indent")
             cli_args.append(log_auto_indent)
 
-        super().__init__(cli_args)
+        if shard is not None and not 1 <= shard[0] <= shard[1]:
+            raise ValueError(f"Invalid shard {shard[0]} of {shard[1]}: index must be between 1 and the count of shards")
+
+        super().__init__(
+            cli_args,
+            py_args={
+                "shard": shard,
+                "durations_file": durations_file,
+                "affected_since": affected_since,
+                "impact_file": impact_file,
+            },
+        )
 
     def __call__(self) -> int:
         """Run the command.
@@ -484,4 +928,22 @@ class pytest(Tool):  # noqa: N801
         """
         from pytest import main as run_pytest  # noqa: PT013,PLC0415
 
-        return run_pytest(self.cli_args)
+        shard = self.py_args["shard"]
+        durations_file = self.py_args["durations_file"]
+        affected_since = self.py_args["affected_since"]
+        impact_file = self.py_args["impact_file"]
+        plugins = []
+        if shard is not None or durations_file is not None:
+            durations_file = durations_file or str(_cache_dir().absolute() / "pytest-durations.json")
+            plugins.append(_shard_plugin(shard, durations_file))
+        if affected_since is not None or impact_file is not None:
+            impact_file = impact_file or str(_cache_dir().absolute() / "pytest-impact.json")
+            plugins.append(_impact_plugin(affected_since, impact_file, shards=plugins[0] if plugins else None))
+        if not plugins:
+            return run_pytest(self.cli_args)
+
+        code = run_pytest(self.cli_args, plugins=plugins)
+        # More shards than tests, or no affected tests: there is nothing to run.
+        if code == _NO_TESTS_COLLECTED and any(plugin.empty for plugin in plugins):
+            return 0
+        return code
@@ -1,14 +1,222 @@
 from __future__ import annotations
 
 import importlib
+import json
+import re
 import sys
+import time
+from contextlib import closing
 from io import StringIO
-from typing import TYPE_CHECKING, Literal, cast
+from pathlib import Path
+from typing import TYPE_CHECKING, Any, Literal, cast
 
+from duty._internal.cache import _cache_dir, _digest
 from duty._internal.tools._base import Tool
 
 if TYPE_CHECKING:
-    from collections.abc import Sequence
+    import sqlite3
+    from collections.abc import Iterable, Sequence
+
+# The two databases used by safety: vulnerable specifiers, and full vulnerabilities details.
+_DATABASES = ("insecure.json", "insecure_full.json")
+
+
+def _canonical_name(name: str) -> str:
+    return re.sub(r"[-_.]+", "-", name).lower()
+
+
+def _normalize_requirements(requirements: str) -> list[str]:
+    """Normalize requirements, so that equivalent requirements give the same results.
+
+    Comments, blank lines, whitespace, order and duplicates are ignored,
+    and package names are canonicalized.
+
+    Parameters:
+        requirements: Requirements, one per line.
+
+    Returns:
+        The normalized requirements.
+    """
+    normalized = set()
+    for line in requirements.splitlines():
+        requirement = re.sub(r"\s+", "", line.split("#", 1)[0])
+        if match := re.match(r"[A-Za-z0-9][A-Za-z0-9._-]*", requirement):
+            normalized.add(_canonical_name(match.group()) + requirement[match.end() :])
+        elif requirement:
+            normalized.add(requirement)
+    return sorted(normalized)
+
+
+class _VulnerabilityDatabase:
+    """A local copy of the vulnerability databases, indexed by package, with memoized results."""
+
+    def __init__(self, path: str | Path) -> None:
+        self.path = Path(path)
+
+    def _connect(self) -> sqlite3.Connection:
+        import sqlite3  # noqa: PLC0415
+
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        conn = sqlite3.connect(self.path, timeout=5)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("CREATE TABLE IF NOT EXISTS meta (db TEXT PRIMARY KEY, data TEXT, updated REAL)")
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS packages (db TEXT, name TEXT, data TEXT, PRIMARY KEY (db, name)) WITHOUT ROWID",
+        )
+        conn.execute("CREATE TABLE IF NOT EXISTS results (key TEXT PRIMARY KEY, passed INTEGER, report TEXT)")
+        return conn
+
+    def version(self) -> str | None:
+        """Return the version of the local copy, or `None` when there is none."""
+        if not self.path.exists():
+            return None
+        with closing(self._connect()) as conn:
+            rows = conn.execute("SELECT db, updated FROM meta ORDER BY db").fetchall()
+        if len(rows) < len(_DATABASES):
+            return None
+        return _digest(rows)
+
+    def store(self, databases: dict[str, dict[str, Any]]) -> None:
+        """Replace the local copy, and forget memoized results.
+
+        Parameters:
+            databases: The databases, by file name.
+        """
+        now = time.time()
+        with closing(self._connect()) as conn, conn:
+            conn.execute("DELETE FROM packages")
+            conn.execute("DELETE FROM meta")
+            conn.execute("DELETE FROM results")
+            for db, data in databases.items():
+                packages = data.get("vulnerable_packages", {})
+                rest = {key: value for key, value in data.items() if key != "vulnerable_packages"}
+                conn.execute("INSERT INTO meta VALUES (?, ?, ?)", (db, json.dumps(rest), now))
+                conn.executemany(
+                    "INSERT INTO packages VALUES (?, ?, ?)",
+                    ((db, name, json.dumps(entries)) for name, entries in packages.items()),
+                )
+
+    def write_mirror(self, directory: str, names: Iterable[str]) -> None:
+        """Write databases restricted to the given packages, to be used as a local mirror by safety.
+
+        Parameters:
+            directory: The directory of the mirror.
+            names: The canonical names of the packages.
+        """
+        names = sorted(set(names))
+        placeholders = ",".join("?" * len(names))
+        with closing(self._connect()) as conn:
+            for db, rest in conn.execute("SELECT db, data FROM meta").fetchall():
+                rows = conn.execute(
+                    f"SELECT name, data FROM packages WHERE db = ? AND name IN ({placeholders})",  # noqa: S608
+                    (db, *names),
+                ).fetchall()
+                data = {
+                    **json.loads(rest),
+                    "vulnerable_packages": {name: json.loads(entries) for name, entries in rows},
+                }
+                # Depending on their version, safety and its Python ecosystem look in one directory or the other.
+                for path in (Path(directory, db), Path(directory, "python", db)):
+                    path.parent.mkdir(parents=True, exist_ok=True)
+                    path.write_text(json.dumps(data), encoding="utf8")
+
+    def result(self, key: str) -> tuple[bool, str] | None:
+        """Return a memoized result.
+
+        Parameters:
+            key: The key of the result.
+
+        Returns:
+            Whether the check passed and its report, or `None` when there is no such result.
+        """
+        with closing(self._connect()) as conn:
+            row = conn.execute("SELECT passed, report FROM results WHERE key = ?", (key,)).fetchone()
+        return None if row is None else (bool(row[0]), row[1])
+
+    def save_result(self, key: str, passed: bool, report: str) -> None:  # noqa: FBT001
+        """Memoize a result.
+
+        Parameters:
+            key: The key of the result.
+            passed: Whether the check passed.
+            report: The report of the check.
+        """
+        with closing(self._connect()) as conn, conn:
+            conn.execute("INSERT OR REPLACE INTO results VALUES (?, ?, ?)", (key, int(passed), report))
+
+
+class _LocalSession:
+    # Safety ignores local mirrors when its session uses credentials: the local copy is used without them.
+    api_key = None
+
+    def is_using_auth_credentials(self) -> bool:
+        return False
+
+
+def _import_safety() -> None:
+    # undo possible patching
+    # see https://github.com/pyupio/safety/issues/348
+    for module in list(sys.modules):
+        if module.startswith("safety.") or module == "safety":
+            del sys.modules[module]
+
+    importlib.invalidate_caches()
+
+
+def _session(*, local: bool = False) -> Any:
+    # TODO: Safety 3 support, merge once support for v2 is dropped.
+    try:
+        from safety.auth.cli_utils import build_client_session  # noqa: PLC0415
+    except ImportError:
+        return None
+    if local:
+        return _LocalSession()
+    client_session, _ = build_client_session()
+    return client_session
+
+
+def _fetch_databases() -> dict[str, dict[str, Any]]:
+    _import_safety()
+    from safety.safety import fetch_database  # noqa: PLC0415
+
+    session = _session()
+    databases = {}
+    for db in _DATABASES:
+        fetch_kwargs: dict[str, Any] = {
+            "full": db == "insecure_full.json",
+            "db": False,
+            "cached": 0,
+            "telemetry": False,
+        }
+        if session is not None:
+            fetch_kwargs["session"] = session
+        databases[db] = fetch_database(**fetch_kwargs)
+    return databases
+
+
+def _safety_version() -> str:
+    from importlib.metadata import PackageNotFoundError, version  # noqa: PLC0415
+
+    try:
+        return version("safety")
+    except PackageNotFoundError:
+        return ""
+
+
+def _result_key(
+    normalized: list[str],
+    *,
+    ignore_vulns: dict[str, str],
+    formatter: str,
+    full_report: bool,
+    db_version: str | None,
+) -> str:
+    # Results depend on the requirements, the options, the database and safety itself.
+    return _digest(normalized, sorted(ignore_vulns.items()), formatter, full_report, db_version, _safety_version())
+
+
+def _db_path(db: str | bool) -> Path:  # noqa: FBT001
+    return Path(db) if isinstance(db, str) else _cache_dir() / "safety.db"
 
 
 class safety(Tool):  # noqa: N801
@@ -25,6 +233,8 @@ class safety(Tool):  # noqa: N801
         ignore_vulns: dict[str, str] | None = None,
         formatter: Literal["json", "bare", "text"] = "text",
         full_report: bool = True,
+        db: str | bool = False,
+        offline: bool = False,
     ) -> safety:
         """Run the safety check command.
 
@@ -35,12 +245,30 @@ class safety(Tool):  # noqa: N801
             ignore_vulns: Vulnerabilities to ignore.
             formatter: Report format.
             full_report: Whether to output a full report.
+            db: Check against a local copy of the vulnerability database, stored in the given file
+                (`.duty/safety.db` when true), downloaded if it does not exist yet.
+                Results are memoized: checking the same requirements against the same copy
+                returns immediately, without importing safety. Refresh the copy with [`update_db`][duty.tools.safety.update_db].
+            offline: Never download the vulnerability database: fail when there is no local copy.
+                Implies `db`.
 
         Returns:
             Success/failure.
         """
         return cls(py_args=dict(locals()))
 
+    @classmethod
+    def update_db(cls, *, db: str | bool = True) -> safety:
+        """Download the vulnerability database, and replace the local copy used by [`check`][duty.tools.safety.check].
+
+        Parameters:
+            db: The file storing the local copy (`.duty/safety.db` when true).
+
+        Returns:
+            Success/failure.
+        """
+        return cls(py_args={"update_db": db})
+
     @property
     def cli_command(self) -> str:
         """The equivalent CLI command."""
@@ -52,21 +280,87 @@ class safety(Tool):  # noqa: N801
         Returns:
             False when vulnerabilities are found.
         """
+        if "update_db" in self.py_args:
+            _VulnerabilityDatabase(_db_path(self.py_args["update_db"])).store(_fetch_databases())
+            return True
+
         requirements = self.py_args["requirements"]
         ignore_vulns = self.py_args["ignore_vulns"]
         formatter = self.py_args["formatter"]
         full_report = self.py_args["full_report"]
+        db = self.py_args.get("db", False)
+        offline = self.py_args.get("offline", False)
 
         # set default parameter values
         ignore_vulns = ignore_vulns or {}
+        if isinstance(requirements, (list, tuple, set)):
+            requirements = "\n".join(requirements)
+
+        if not db and not offline:
+            passed, report = self._check(requirements, ignore_vulns, formatter, full_report)
+        else:
+            passed, report = self._check_locally(
+                _db_path(db),
+                requirements,
+                ignore_vulns,
+                formatter,
+                full_report,
+                offline=offline,
+            )
+
+        # print report, return status
+        if not passed:
+            print(report)  # noqa: T201
+        return passed
+
+    def _check_locally(
+        self,
+        path: Path,
+        requirements: str,
+        ignore_vulns: dict[str, str],
+        formatter: str,
+        full_report: bool,  # noqa: FBT001
+        *,
+        offline: bool,
+    ) -> tuple[bool, str]:
+        from tempfile import TemporaryDirectory  # noqa: PLC0415
+
+        local_db = _VulnerabilityDatabase(path)
+        if local_db.version() is None:
+            if offline:
+                return (
+                    False,
+                    f"No local copy of the vulnerability database in {path}, download it with tools.safety.update_db()",
+                )
+            local_db.store(_fetch_databases())
 
-        # undo possible patching
-        # see https://github.com/pyupio/safety/issues/348
-        for module in sys.modules:
-            if module.startswith("safety.") or module == "safety":
-                del sys.modules[module]
+        normalized = _normalize_requirements(requirements)
+        key = _result_key(
+            normalized,
+            ignore_vulns=ignore_vulns,
+            formatter=formatter,
+            full_report=full_report,
+            db_version=local_db.version(),
+        )
+        if (result := local_db.result(key)) is not None:
+            return result
 
-        importlib.invalidate_caches()
+        names = [_canonical_name(match.group()) for line in normalized if (match := re.match(r"[a-z0-9-]+", line))]
+        with TemporaryDirectory() as mirror:
+            local_db.write_mirror(mirror, names)
+            passed, report = self._check(requirements, ignore_vulns, formatter, full_report, mirror=mirror)
+        local_db.save_result(key, passed, report)
+        return passed, report
+
+    def _check(
+        self,
+        requirements: str,
+        ignore_vulns: dict[str, str],
+        formatter: str,
+        full_report: bool,  # noqa: FBT001
+        mirror: str | None = None,
+    ) -> tuple[bool, str]:
+        _import_safety()
 
         # reload original, unpatched safety
         from safety.formatter import SafetyFormatter  # noqa: PLC0415
@@ -74,19 +368,13 @@ class safety(Tool):  # noqa: N801
         from safety.util import read_requirements  # noqa: PLC0415
 
         # check using safety as a library
-        if isinstance(requirements, (list, tuple, set)):
-            requirements = "\n".join(requirements)
         packages = list(read_requirements(StringIO(cast("str", requirements))))
 
-        # TODO: Safety 3 support, merge once support for v2 is dropped.
-        check_kwargs = {"packages": packages, "ignore_vulns": ignore_vulns}
-        try:
-            from safety.auth.cli_utils import build_client_session  # noqa: PLC0415
-
-            client_session, _ = build_client_session()
-            check_kwargs["session"] = client_session
-        except ImportError:
-            pass
+        check_kwargs: dict[str, Any] = {"packages": packages, "ignore_vulns": ignore_vulns}
+        if mirror is not None:
+            check_kwargs.update(db_mirror=mirror, telemetry=False)
+        if (session := _session(local=mirror is not None)) is not None:
+            check_kwargs["session"] = session
 
         vulns, db_full = check(**check_kwargs)
         remediations = calculate_remediations(vulns, db_full)
@@ -97,9 +385,4 @@ class safety(Tool):  # noqa: N801
             full=full_report,
             packages=packages,
         )
-
-        # print report, return status
-        if vulns:
-            print(output_report)  # noqa: T201
-            return False
-        return True
+        return not vulns, output_report
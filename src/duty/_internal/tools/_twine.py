@@ -1,9 +1,199 @@
 from __future__ import annotations
 
-from typing import Any
+import json
+import threading
+from typing import TYPE_CHECKING, Any, cast
 
+from duty._internal.cache import _cache_dir, _write_atomically
 from duty._internal.tools._base import Tool
 
+if TYPE_CHECKING:
+    from pathlib import Path
+
+
+class _UploadRecord:
+    """The files already uploaded to each repository, to resume interrupted uploads."""
+
+    def __init__(self, path: Path, repository_url: str) -> None:
+        self.path = path
+        self.repository_url = repository_url
+        self._lock = threading.Lock()
+
+    def _load(self) -> dict[str, list[str]]:
+        try:
+            return json.loads(self.path.read_text(encoding="utf8"))
+        except (OSError, ValueError):
+            return {}
+
+    def uploaded(self) -> set[str]:
+        """Return the SHA-256 digests of the files uploaded to the repository."""
+        return set(self._load().get(self.repository_url, ()))
+
+    def add(self, digest: str) -> None:
+        """Record that a file was uploaded to the repository.
+
+        Parameters:
+            digest: The SHA-256 digest of the file.
+        """
+        # Recorded as soon as a file is uploaded: an interrupted run resumes where it stopped.
+        with self._lock:
+            record = self._load()
+            record[self.repository_url] = sorted({*record.get(self.repository_url, ()), digest})
+            _write_atomically(self.path, json.dumps(record, indent=2))
+
+
+def _split_dists(patterns: list[str]) -> tuple[list[str], dict[str, str], dict[str, list[str]]]:
+    # Like `twine upload`: files or glob patterns, with signatures (`.asc`) and attestations next to distributions.
+    import fnmatch  # noqa: PLC0415
+    import glob  # noqa: PLC0415
+    import os  # noqa: PLC0415
+
+    from twine.exceptions import InvalidDistribution  # noqa: PLC0415
+
+    files = []
+    for pattern in patterns:
+        if os.path.exists(pattern):
+            files.append(pattern)
+        elif matches := glob.glob(pattern):
+            files.extend(matches)
+        else:
+            raise InvalidDistribution(f"Cannot find file (or expand pattern): '{pattern}'")
+    signatures = {os.path.basename(path): path for path in fnmatch.filter(files, "*.asc")}
+    attestations = fnmatch.filter(files, "*.*.attestation")
+    dists = [path for path in files if path not in {*signatures.values(), *attestations}]
+    # Wheels are uploaded first, so that the index uses their metadata.
+    dists.sort(key=lambda path: not path.endswith(".whl"))
+    attestations_by_dist = {
+        dist: [path for path in attestations if os.path.basename(path).startswith(os.path.basename(dist))]
+        for dist in dists
+    }
+    return dists, signatures, attestations_by_dist
+
+
+def _make_package(filename: str, signatures: dict[str, str], attestations: list[str], upload_settings: Any) -> Any:
+    from twine.exceptions import InvalidDistribution  # noqa: PLC0415
+    from twine.package import PackageFile  # noqa: PLC0415
+
+    # Hashes the file: the main cost of preparing packages, with signing.
+    package = PackageFile.from_filename(filename, upload_settings.comment)
+    if package.signed_basefilename in signatures:
+        package.add_gpg_signature(signatures[package.signed_basefilename], package.signed_basefilename)
+    elif upload_settings.sign:
+        package.sign(upload_settings.sign_with, upload_settings.identity)
+    # Attestations are only supported by twine 6 and later.
+    if getattr(upload_settings, "attestations", False):
+        if not attestations:
+            raise InvalidDistribution(
+                f"Upload with attestations requested, but {filename} has no associated attestations",
+            )
+        package.add_attestations(attestations)
+    return package
+
+
+def _upload_concurrently(upload_args: list[str], *, jobs: int, check: bool) -> int:
+    """Upload distributions concurrently.
+
+    Distributions are first hashed in parallel, then uploaded by a bounded number of threads
+    sharing the same HTTP session, and therefore the same pool of keep-alive connections.
+
+    Parameters:
+        upload_args: The arguments of the `twine upload` command.
+        jobs: The maximum number of concurrent uploads.
+        check: Whether to check distributions before uploading them.
+
+    Returns:
+        The exit code.
+    """
+    import argparse  # noqa: PLC0415
+    from concurrent.futures import ThreadPoolExecutor  # noqa: PLC0415
+
+    from requests.adapters import HTTPAdapter  # noqa: PLC0415
+    from twine import exceptions, settings, utils  # noqa: PLC0415
+    from twine.cli import configure_output  # noqa: PLC0415
+    from twine.commands.check import check as check_dists  # noqa: PLC0415
+    from twine.commands.upload import skip_upload  # noqa: PLC0415
+
+    configure_output()
+    parser = argparse.ArgumentParser(prog="twine upload")
+    settings.Settings.register_argparse_arguments(parser)
+    parser.add_argument("dists", nargs="+")
+    parsed_args = parser.parse_args(upload_args)
+    upload_settings = settings.Settings.from_argparse(parsed_args)
+    upload_settings.check_repository_url()
+    # Only available (and needed) with twine 6.1 and later.
+    if (verify_feature_capability := getattr(upload_settings, "verify_feature_capability", None)) is not None:
+        verify_feature_capability()
+    repository_url = utils.sanitize_url(cast("str", upload_settings.repository_config["repository"]))
+
+    uploads, signatures, attestations_by_dist = _split_dists(parsed_args.dists)
+    # Output of checks is not grouped by file: check distributions one after the other.
+    if check and check_dists(uploads):
+        return 1
+    print(f"Uploading distributions to {repository_url}")  # noqa: T201
+
+    with ThreadPoolExecutor(max_workers=jobs) as executor:
+        packages = list(
+            executor.map(
+                lambda filename: _make_package(filename, signatures, attestations_by_dist[filename], upload_settings),
+                uploads,
+            ),
+        )
+
+        record = _UploadRecord(_cache_dir() / "twine-uploads.json", repository_url)
+        # Files can be deleted from the index since they were recorded:
+        # the record is only trusted when existing files must be skipped anyway.
+        uploaded = record.uploaded() if upload_settings.skip_existing else set()
+        for package in packages:
+            if package.sha2_digest in uploaded:
+                print(f"Skipping {package.basefilename} because it was already uploaded")  # noqa: T201
+        packages = [package for package in packages if package.sha2_digest not in uploaded]
+
+        repository = upload_settings.create_repository()
+        # Progress bars of concurrent uploads would overwrite each other.
+        repository.disable_progress_bar = True
+        for scheme in ("http://", "https://"):
+            retries = cast("HTTPAdapter", repository.session.get_adapter(scheme)).max_retries
+            repository.session.mount(scheme, HTTPAdapter(max_retries=retries, pool_maxsize=jobs))
+
+        def upload(package: Any) -> bool:
+            if upload_settings.skip_existing and repository.package_is_uploaded(package):
+                print(f"Skipping {package.basefilename} because it appears to already exist")  # noqa: T201
+                return False
+            response = repository.upload(package)
+            if response.is_redirect:
+                raise exceptions.RedirectDetected.from_args(
+                    repository_url,
+                    utils.sanitize_url(response.headers["location"]),
+                )
+            if exists := skip_upload(response, upload_settings.skip_existing, package):
+                print(f"Skipping {package.basefilename} because it appears to already exist")  # noqa: T201
+            else:
+                utils.check_status_code(response, upload_settings.verbose)
+            # Only files the index accepted, or already has, are recorded.
+            if exists or 200 <= response.status_code < 300:  # noqa: PLR2004
+                record.add(package.sha2_digest)
+            return True
+
+        # Other files are still uploaded when one fails: uploading them again later will skip them.
+        futures = [(package, executor.submit(upload, package)) for package in packages]
+        code = 0
+        uploaded_packages = []
+        for package, future in futures:
+            try:
+                if future.result():
+                    uploaded_packages.append(package)
+            except Exception as error:  # noqa: BLE001
+                print(f"Failed to upload {package.basefilename}: {error}")  # noqa: T201
+                code = 1
+
+    release_urls = repository.release_urls(uploaded_packages)
+    if release_urls:
+        print("View at:")  # noqa: T201
+        for url in release_urls:
+            print(url)  # noqa: T201
+    repository.close()
+    return code
+
 
 class twine(Tool):  # noqa: N801
     """Call [Twine](https://github.com/pypa/twine)."""
@@ -186,6 +376,8 @@ class twine(Tool):  # noqa: N801
         disable_progress_bar: bool = False,
         version: bool = False,
         no_color: bool = False,
+        jobs: int | None = None,
+        check: bool = False,
     ) -> twine:
         """Uploads one or more distributions to a repository.
 
@@ -216,6 +408,12 @@ class twine(Tool):  # noqa: N801
             disable_progress_bar: Disable the progress bar.
             version: Show program's version number and exit.
             no_color: Disable colored output.
+            jobs: Upload distributions concurrently, with at most this many uploads at the same time.
+                Distributions are hashed in parallel before being uploaded, uploads share
+                a pool of keep-alive connections, and files uploaded by previous runs
+                (recorded in `.duty/twine-uploads.json`) are skipped.
+            check: Check all distributions before uploading any of them, like `twine check`.
+                Only used when uploading concurrently.
         """
         cli_args = ["upload", *dists]
 
@@ -282,6 +480,13 @@ class twine(Tool):  # noqa: N801
         if disable_progress_bar:
             cli_args.append("--disable-progress-bar")
 
+        if jobs is not None:
+            if jobs < 1:
+                raise ValueError(f"Invalid number of jobs {jobs}: must be at least 1")
+            # Global options are only handled by the `twine` command itself.
+            upload_args = [arg for arg in cli_args[1:] if arg not in {"--version", "--no-color"}]
+            return cls(cli_args, py_args={"upload_args": upload_args, "jobs": jobs, "check": check})
+
         return cls(cli_args)
 
     def __call__(self) -> Any:
@@ -290,6 +495,13 @@ class twine(Tool):  # noqa: N801
         Returns:
             The return value of the corresponding Twine command / entrypoint.
         """
+        if "jobs" in self.py_args and "--version" not in self.cli_args:
+            return _upload_concurrently(
+                self.py_args["upload_args"],
+                jobs=self.py_args["jobs"],
+                check=self.py_args["check"],
+            )
+
         from twine.cli import dispatch as run_twine  # noqa: PLC0415
 
         return run_twine(self.cli_args)
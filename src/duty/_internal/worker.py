@@ -0,0 +1,250 @@
+from __future__ import annotations
+
+import codecs
+import hmac
+import json
+import os
+import select
+import socket
+import sys
+import time
+import traceback
+from contextlib import closing, suppress
+from typing import TYPE_CHECKING, Any
+
+from duty._internal.context import Context
+from duty._internal.exceptions import DutyFailure
+from duty._internal.processes import _GRACE_PERIOD, _own_group, _signal_group
+from duty._internal.validation import validate
+
+if TYPE_CHECKING:
+    from duty._internal.collection import Collection
+
+# Invocations are sent as a single JSON line.
+# Workers answer with JSON lines: `{"output": "..."}` chunks, then the exit code (`{"code": 0}`).
+_MAX_REQUEST_SIZE = 16 * 1024 * 1024
+# Workers serve one client at a time: clients not sending their invocation in time are dropped.
+_RECEIVE_TIMEOUT = 5.0
+
+
+def _parse_address(address: str) -> tuple[int, str | tuple[str, int]]:
+    # `HOST:PORT` for TCP sockets, `unix:PATH` (or a path) for Unix sockets.
+    if address.startswith("unix:"):
+        return socket.AF_UNIX, address[5:]
+    host, _, port = address.rpartition(":")
+    if host and port.isdigit():
+        return socket.AF_INET6 if ":" in host.strip("[]") else socket.AF_INET, (host.strip("[]"), int(port))
+    return socket.AF_UNIX, address
+
+
+def _connect(address: str, timeout: float | None = None) -> socket.socket:
+    family, location = _parse_address(address)
+    if family == socket.AF_UNIX:
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        sock.settimeout(timeout)
+        try:
+            sock.connect(location)
+        except OSError:
+            sock.close()
+            raise
+        sock.settimeout(None)
+        return sock
+    return socket.create_connection(location, timeout=timeout)  # type: ignore[arg-type]
+
+
+def _listen(address: str) -> socket.socket:
+    family, location = _parse_address(address)
+    sock = socket.socket(family, socket.SOCK_STREAM)
+    if family == socket.AF_UNIX:
+        with suppress(FileNotFoundError):
+            os.unlink(location)  # type: ignore[arg-type]
+    else:
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind(location)
+    sock.listen()
+    return sock
+
+
+def _send(sock: socket.socket, message: dict[str, Any]) -> None:
+    sock.sendall(json.dumps(message).encode("utf8") + b"\n")
+
+
+def _forwarded_env() -> dict[str, str]:
+    # Workers can be on other machines: only forward the variables listed in `DUTY_WORKER_ENV`.
+    names = {name.strip() for name in os.getenv("DUTY_WORKER_ENV", "").split(",")} - {"DUTY_WORKER_TOKEN"}
+    return {name: value for name, value in os.environ.items() if name in names}
+
+
+def _invocation(
+    name: str,
+    args: tuple,
+    kwargs: dict[str, Any],
+    options: dict[str, Any],
+    options_override: dict[str, Any],
+) -> dict[str, Any]:
+    # Arguments are cast again by the worker, so they can be sent as strings when they are not JSON types.
+    return json.loads(
+        json.dumps(
+            {
+                "name": name,
+                "args": list(args),
+                "kwargs": kwargs,
+                "options": options,
+                "options_override": options_override,
+                "cwd": os.getcwd(),
+                "env": _forwarded_env(),
+                "token": os.getenv("DUTY_WORKER_TOKEN", ""),
+            },
+            default=str,
+        ),
+    )
+
+
+def _run_remote(address: str, invocation: dict[str, Any]) -> tuple[int, str]:
+    """Run a duty on a worker.
+
+    Parameters:
+        address: The address of the worker.
+        invocation: The invocation, as returned by `_invocation`.
+
+    Returns:
+        The exit code and the output of the duty.
+    """
+    chunks = []
+    try:
+        with closing(_connect(address, timeout=10)) as sock:
+            _send(sock, invocation)
+            with sock.makefile("rb") as stream:
+                for line in stream:
+                    message = json.loads(line)
+                    chunks.append(message.get("output", ""))
+                    if "code" in message:
+                        return message["code"], "".join(chunks)
+    except (OSError, ValueError) as error:
+        chunks.append(f"> Worker {address} failed: {error}\n")
+        return 1, "".join(chunks)
+    chunks.append(f"> Worker {address} disconnected\n")
+    return 1, "".join(chunks)
+
+
+def _invoke(collection: Collection, invocation: dict[str, Any]) -> int:
+    # Run the body of the duty (pre- and post-duties are separate invocations).
+    try:
+        os.chdir(invocation["cwd"])
+        os.environ.update(invocation["env"])
+        duty = collection.get(invocation["name"])
+        args, kwargs = validate(duty.function, *invocation["args"], **invocation["kwargs"])
+        context = Context(invocation["options"], invocation["options_override"])
+        duty._run_function(context, *args, **kwargs)
+    except DutyFailure as failure:
+        return failure.code
+    except KeyboardInterrupt:
+        return 130
+    except BaseException:  # noqa: BLE001
+        sys.stderr.write(traceback.format_exc())
+        return 1
+    return 0
+
+
+def _receive(sock: socket.socket) -> bytes | None:
+    deadline = time.monotonic() + _RECEIVE_TIMEOUT
+    request = b""
+    try:
+        while not request.endswith(b"\n"):
+            if len(request) > _MAX_REQUEST_SIZE or (remaining := deadline - time.monotonic()) <= 0:
+                return None
+            sock.settimeout(remaining)
+            if not (chunk := sock.recv(65536)):
+                return None
+            request += chunk
+    except OSError:
+        return None
+    finally:
+        sock.settimeout(None)
+    return request
+
+
+def _handle(collection: Collection, sock: socket.socket) -> None:
+    if (request := _receive(sock)) is None:
+        return
+    try:
+        invocation = json.loads(request)
+    except ValueError:
+        return
+    token = os.getenv("DUTY_WORKER_TOKEN", "")
+    if not hmac.compare_digest(str(invocation.get("token", "")), token):
+        _send(sock, {"output": "> Invalid worker token\n"})
+        _send(sock, {"code": 1})
+        return
+
+    # Each invocation runs in a forked process, with its own process group,
+    # working directory and environment, and its output sent through a pipe.
+    read_fd, write_fd = os.pipe()
+    sys.stdout.flush()
+    sys.stderr.flush()
+    pid = os.fork()
+    if pid == 0:  # pragma: no cover
+        _own_group()
+        os.close(read_fd)
+        os.dup2(write_fd, 1)
+        os.dup2(write_fd, 2)
+        os.close(write_fd)
+        code = _invoke(collection, invocation)
+        sys.stdout.flush()
+        sys.stderr.flush()
+        os._exit(code)
+
+    os.close(write_fd)
+    decoder = codecs.getincrementaldecoder("utf8")(errors="replace")
+    try:
+        while True:
+            readable, _, _ = select.select([read_fd, sock.fileno()], [], [])
+            if sock.fileno() in readable:
+                # The client never sends anything after the invocation: it disconnected.
+                raise ConnectionResetError
+            chunk = os.read(read_fd, 65536)
+            if not chunk:
+                break
+            _send(sock, {"output": decoder.decode(chunk)})
+    except OSError:
+        _signal_group(pid)
+        deadline = time.monotonic() + _GRACE_PERIOD
+        while time.monotonic() < deadline and not os.waitpid(pid, os.WNOHANG)[0]:
+            time.sleep(0.05)
+        _signal_group(pid, kill=True)
+        with suppress(ChildProcessError):
+            os.waitpid(pid, 0)
+        return
+    finally:
+        os.close(read_fd)
+    _, status = os.waitpid(pid, 0)
+    with suppress(OSError):
+        _send(sock, {"output": decoder.decode(b"", final=True), "code": os.waitstatus_to_exitcode(status)})
+
+
+def _serve(collection: Collection, address: str) -> int:
+    """Serve duties to clients, one at a time.
+
+    Parameters:
+        collection: The loaded collection of duties.
+        address: The address to listen on.
+
+    Returns:
+        An exit code.
+    """
+    if not hasattr(os, "fork"):
+        print("> Workers are only supported on platforms with fork", file=sys.stderr)  # noqa: T201
+        return 1
+    # Anyone able to connect can run duties: TCP sockets must be protected by a secret.
+    if _parse_address(address)[0] != socket.AF_UNIX and not os.getenv("DUTY_WORKER_TOKEN"):
+        print("> Workers listening on TCP addresses require a secret in DUTY_WORKER_TOKEN", file=sys.stderr)  # noqa: T201
+        return 1
+    with closing(_listen(address)) as server:
+        print(f"Worker listening on {address}", file=sys.stderr, flush=True)  # noqa: T201
+        try:
+            while True:
+                sock, _ = server.accept()
+                with closing(sock):
+                    _handle(collection, sock)
+        except KeyboardInterrupt:
+            return 0
@@ -8,28 +8,51 @@ These callables are **deprecated** in favor of our new [tools][duty.tools].
 from __future__ import annotations
 
 import warnings
+from importlib import import_module
+from typing import TYPE_CHECKING, Any
 
-from failprint import lazy  # noqa: F401
-
-from duty._internal.callables import (
-    autoflake,  # noqa: F401
-    black,  # noqa: F401
-    blacken_docs,  # noqa: F401
-    build,  # noqa: F401
-    coverage,  # noqa: F401
-    flake8,  # noqa: F401
-    git_changelog,  # noqa: F401
-    griffe,  # noqa: F401
-    interrogate,  # noqa: F401
-    isort,  # noqa: F401
-    mkdocs,  # noqa: F401
-    mypy,  # noqa: F401
-    pytest,  # noqa: F401
-    ruff,  # noqa: F401
-    safety,  # noqa: F401
-    ssort,  # noqa: F401
-    twine,  # noqa: F401
-)
+if TYPE_CHECKING:
+    from failprint import lazy  # noqa: F401
+
+    from duty._internal.callables import (
+        autoflake,  # noqa: F401
+        black,  # noqa: F401
+        blacken_docs,  # noqa: F401
+        build,  # noqa: F401
+        coverage,  # noqa: F401
+        flake8,  # noqa: F401
+        git_changelog,  # noqa: F401
+        griffe,  # noqa: F401
+        interrogate,  # noqa: F401
+        isort,  # noqa: F401
+        mkdocs,  # noqa: F401
+        mypy,  # noqa: F401
+        pytest,  # noqa: F401
+        ruff,  # noqa: F401
+        safety,  # noqa: F401
+        ssort,  # noqa: F401
+        twine,  # noqa: F401
+    )
+
+_callables = {
+    "autoflake",
+    "black",
+    "blacken_docs",
+    "build",
+    "coverage",
+    "flake8",
+    "git_changelog",
+    "griffe",
+    "interrogate",
+    "isort",
+    "mkdocs",
+    "mypy",
+    "pytest",
+    "ruff",
+    "safety",
+    "ssort",
+    "twine",
+}
 
 warnings.warn(
     "Callables are deprecated in favor of our new `duty.tools`. "
@@ -39,3 +62,11 @@ warnings.warn(
     DeprecationWarning,
     stacklevel=1,
 )
+
+
+def __getattr__(name: str) -> Any:
+    if name == "lazy":
+        return import_module("failprint").lazy
+    if name not in _callables:
+        raise AttributeError(f"module '{__name__}' has no attribute '{name}'")
+    return import_module(f"duty._internal.callables.{name}")
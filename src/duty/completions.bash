@@ -3,12 +3,57 @@
 # All rights reserved.
 
 _complete_duty() {
-    local candidates
+    local candidates duties_file="duties.py" cache_file cache_dir line name="" names=" " params="" options i
+    local -a lines
 
-    # COMP_WORDS contains the entire command string up til now (including # program name).
-    # We hand it to Invoke so it can figure out the current context:
-    # spit back core options, task names, the current task's options, or some combo.
-    candidates=$(duty --complete -- "${COMP_WORDS[@]}")
+    # Find the duties file given on the command line.
+    for ((i = 1; i < COMP_CWORD; i++)); do
+        case "${COMP_WORDS[i]}" in
+            -d|--duties-file)
+                # COMP_WORDBREAKS splits `--duties-file=FILE` into three words.
+                [[ "${COMP_WORDS[i+1]}" = "=" ]] && ((i++))
+                duties_file="${COMP_WORDS[i+1]}"
+                ;;
+        esac
+    done
+
+    # Candidates are read from the file written by `duty --complete`,
+    # unless the duties file changed since then: in that case, we hand
+    # COMP_WORDS to duty so it can figure out the current context
+    # (and write the candidates file again).
+    if [[ "${duties_file}" = */* ]]; then
+        cache_dir="${DUTY_CACHE_DIR:-${duties_file%/*}/.duty}"
+    else
+        cache_dir="${DUTY_CACHE_DIR:-.duty}"
+    fi
+    cache_file="${cache_dir}/completions/${duties_file##*/}"
+    [[ -f "${cache_file}" && ! "${duties_file}" -nt "${cache_file}" ]] && read -r line < "${cache_file}"
+    if [[ -z "${line}" || ! "${line}" -ef "${duties_file}" ]]; then
+        candidates=$(duty -d "${duties_file}" --complete -- "${COMP_WORDS[@]}")
+    else
+        # The file contains the path of the duties file, the global options,
+        # then one line per duty name or alias, followed by its parameters.
+        while read -r line; do
+            lines+=("${line}")
+        done < "${cache_file}"
+        options="${lines[1]}"
+        for line in "${lines[@]:2}"; do
+            names+="${line%% *} "
+        done
+        # Find the last duty name in the command line.
+        for ((i = ${#COMP_WORDS[@]} - 1; i > 0; i--)); do
+            if [[ "${names}" = *" ${COMP_WORDS[i]} "* ]]; then
+                name="${COMP_WORDS[i]}"
+                break
+            fi
+        done
+        for line in "${lines[@]:2}"; do
+            if [[ -n "${name}" && "${line%% *}" = "${name}" && "${line}" = *" "* ]]; then
+                params="${line#* }"
+            fi
+        done
+        candidates="${names} ${params} ${options}"
+    fi
 
     # `compgen -W` takes list of valid options & a partial word & spits back possible matches.
     # Necessary for any partial word completions
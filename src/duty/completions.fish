@@ -0,0 +1,54 @@
+function __duty_complete
+    set -l words (commandline -opc) (commandline -ct)
+    set -l duties_file duties.py
+
+    # Find the duties file given on the command line.
+    for i in (seq 2 (count $words))
+        switch $words[$i]
+            case -d --duties-file
+                set -l next (math $i + 1)
+                test $next -le (count $words); and set duties_file $words[$next]
+            case '--duties-file=*'
+                set duties_file (string replace -- --duties-file= '' $words[$i])
+        end
+    end
+
+    # Candidates are read from the file written by `duty --complete`,
+    # unless the duties file changed since then: in that case,
+    # duty computes them (and writes the candidates file again).
+    set -l cache_dir .duty
+    string match -q -- '*/*' $duties_file; and set cache_dir (path dirname -- $duties_file)/.duty
+    set -q DUTY_CACHE_DIR; and set cache_dir $DUTY_CACHE_DIR
+    set -l cache_file $cache_dir/completions/(path basename -- $duties_file)
+    set -l lines
+    if test -f $cache_file; and test (path mtime -- $duties_file) -lt (path mtime -- $cache_file)
+        # The file contains the path of the duties file, the global options,
+        # then one line per duty name or alias, followed by its parameters.
+        set lines (cat $cache_file)
+    end
+    if test (count $lines) -lt 2; or test (path resolve -- $lines[1]) != (path resolve -- $duties_file)
+        duty -d $duties_file --complete -- $words
+        return
+    end
+
+    set -l names
+    for line in $lines[3..-1]
+        set -a names (string split -f1 ' ' -- $line)
+    end
+    printf '%s\n' $names
+
+    # Complete the parameters of the last duty in the command line.
+    for word in $words[-1..2]
+        if contains -- $word $names
+            for line in $lines[3..-1]
+                set -l fields (string split ' ' -- $line)
+                test "$fields[1]" = $word; and printf '%s\n' $fields[2..-1]
+            end
+            break
+        end
+    end
+
+    string split ' ' -- $lines[2]
+end
+
+complete -c duty -f -a '(__duty_complete)'
@@ -1,30 +1,32 @@
 """Our collection of tools."""
 
 import warnings
-from typing import Any
+from importlib import import_module
+from typing import TYPE_CHECKING, Any
 
-from duty._internal.tools import (
-    autoflake,
-    black,
-    blacken_docs,
-    build,
-    coverage,
-    flake8,
-    git_changelog,
-    griffe,
-    interrogate,
-    isort,
-    mkdocs,
-    mypy,
-    pytest,
-    ruff,
-    safety,
-    ssort,
-    twine,
-    ty,
-    yore,
-    zensical,
-)
+if TYPE_CHECKING:
+    from duty._internal.tools import (
+        autoflake,
+        black,
+        blacken_docs,
+        build,
+        coverage,
+        flake8,
+        git_changelog,
+        griffe,
+        interrogate,
+        isort,
+        mkdocs,
+        mypy,
+        pytest,
+        ruff,
+        safety,
+        ssort,
+        twine,
+        ty,
+        yore,
+        zensical,
+    )
 
 __all__ = [
     "autoflake",
@@ -50,18 +52,18 @@ __all__ = [
 ]
 
 
-# YORE: Bump 2: Remove block.
 def __getattr__(name: str) -> Any:
     """Return the tool or lazy object by name."""
-    from failprint import lazy  # noqa: F401,PLC0415
-
-    from duty._internal.tools._base import LazyStderr, LazyStdout, Tool  # noqa: F401,PLC0415
-
-    if name in locals():
+    if name in __all__:
+        value = getattr(import_module("duty._internal.tools"), name)
+        globals()[name] = value
+        return value
+    # YORE: Bump 2: Remove block.
+    if name in {"lazy", "LazyStderr", "LazyStdout", "Tool"}:
         warnings.warn(
             f"Importing `{name}` from `duty.tools` is deprecated, import directly from `duty` instead.",
             DeprecationWarning,
             stacklevel=2,
         )
-        return locals()[name]
+        return getattr(import_module("duty"), name)
     raise AttributeError(f"module '{__name__}' has no attribute '{name}'")
@@ -1 +1,16 @@
 """Configuration for the pytest test suite."""
+
+from __future__ import annotations
+
+from typing import TYPE_CHECKING
+
+import pytest
+
+if TYPE_CHECKING:
+    from pathlib import Path
+
+
+@pytest.fixture(autouse=True)
+def _isolated_cache_dir(monkeypatch: pytest.MonkeyPatch, tmp_path: Path) -> None:
+    monkeypatch.setenv("DUTY_CACHE_DIR", str(tmp_path / ".duty"))
+    monkeypatch.delenv("DUTY_RESULT_CACHE", raising=False)
@@ -0,0 +1,11 @@
+from duty import duty
+
+
+@duty(pre=["second"])
+def first(ctx):
+    pass
+
+
+@duty(post=["first"])
+def second(ctx):
+    pass
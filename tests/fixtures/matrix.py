@@ -0,0 +1,11 @@
+from duty import duty
+
+
+@duty(matrix={"code": [0, 3]})
+def cells(ctx, code: int = 0):
+    ctx.run(lambda: code, title=f"cell {code}")
+
+
+@duty
+def echo(ctx, value="", times: int = 1):
+    ctx.run(["echo", value * times], title=f"echo {value * times}")
@@ -0,0 +1,66 @@
+import os
+import time
+from pathlib import Path
+
+from duty import duty
+
+MARKER = Path(os.environ.get("DUTY_TEST_MARKER", "marker"))
+RUNNING = MARKER.with_name("running")
+
+
+def wait_for_marker():
+    for _ in range(100):
+        if MARKER.exists():
+            return 0
+        time.sleep(0.05)
+    return 1
+
+
+def run_alone():
+    # Fail if another job runs at the same time.
+    RUNNING.mkdir(exist_ok=True)
+    (RUNNING / str(os.getpid())).touch()
+    time.sleep(0.3)
+    alone = len(list(RUNNING.iterdir())) == 1
+    (RUNNING / str(os.getpid())).unlink()
+    return 0 if alone else 1
+
+
+@duty
+def waiting(ctx):
+    ctx.run(wait_for_marker, title="waiting")
+
+
+@duty
+def marking(ctx):
+    ctx.run(MARKER.touch, title="marking")
+
+
+@duty
+def failing(ctx, code=2):
+    ctx.run(lambda: int(code), title="failing")
+
+
+@duty(pre=["waiting", "marking"], pre_parallel=2)
+def both(ctx):
+    ctx.run(lambda: 0, title="both")
+
+
+@duty
+def alone1(ctx):
+    ctx.run(run_alone, title="alone1")
+
+
+@duty
+def alone2(ctx):
+    ctx.run(run_alone, title="alone2")
+
+
+@duty(pre=["alone1", "alone2"], pre_parallel=1)
+def bounded(ctx):
+    ctx.run(lambda: 0, title="bounded")
+
+
+@duty
+def sleeping(ctx):
+    ctx.run(["sh", "-c", "sleep 30"], title="sleeping")
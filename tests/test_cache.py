@@ -0,0 +1,229 @@
+"""Tests for the persistent cache."""
+
+from __future__ import annotations
+
+import json
+import os
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import TYPE_CHECKING
+
+import pytest
+
+from duty._internal import cache
+from duty._internal.cache import FileIndex
+from duty._internal.collection import Duty
+
+if TYPE_CHECKING:
+    from collections.abc import Iterator
+
+
+def _age(path: Path, seconds: int = 10) -> None:
+    # Make files old enough to be recorded in the index.
+    stat = path.stat()
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns - seconds * 1_000_000_000))
+
+
+def test_index_hashes_only_changed_files(monkeypatch: pytest.MonkeyPatch, tmp_path: Path) -> None:
+    """Files are hashed again only when their size, modification time or inode changed.
+
+    Parameters:
+        monkeypatch: A Pytest fixture to patch objects.
+        tmp_path: A Pytest fixture providing a temporary directory.
+    """
+    first = tmp_path / "first.txt"
+    second = tmp_path / "second.txt"
+    first.write_text("first")
+    second.write_text("second")
+    _age(first)
+    _age(second)
+    database = tmp_path / "files.db"
+    hashes = FileIndex(database).hash_globs([str(tmp_path / "*.txt")])
+    assert set(hashes) == {str(first), str(second)}
+
+    hashed = []
+    hash_file = cache._hash_file
+
+    def spy(path: str) -> str:
+        hashed.append(path)
+        return hash_file(path)
+
+    monkeypatch.setattr(cache, "_hash_file", spy)
+    assert FileIndex(database).hash_globs([str(tmp_path / "*.txt")]) == hashes
+    assert not hashed
+
+    second.write_text("changed")
+    _age(second, 5)
+    new_hashes = FileIndex(database).hash_globs([str(tmp_path / "*.txt")])
+    assert hashed == [str(second)]
+    assert new_hashes[str(first)] == hashes[str(first)]
+    assert new_hashes[str(second)] != hashes[str(second)]
+
+
+def test_index_does_not_record_recently_modified_files(monkeypatch: pytest.MonkeyPatch, tmp_path: Path) -> None:
+    """Files modified very recently are hashed again on the next run.
+
+    Parameters:
+        monkeypatch: A Pytest fixture to patch objects.
+        tmp_path: A Pytest fixture providing a temporary directory.
+    """
+    recent = tmp_path / "recent.txt"
+    recent.write_text("recent")
+    database = tmp_path / "files.db"
+    FileIndex(database).hash_files([str(recent)])
+
+    hashed = []
+
+    def spy(path: str) -> str:
+        hashed.append(path)
+        return "00"
+
+    monkeypatch.setattr(cache, "_hash_file", spy)
+    FileIndex(database).hash_files([str(recent)])
+    assert hashed == [str(recent)]
+
+
+def test_index_ignores_missing_files_and_broken_database(tmp_path: Path) -> None:
+    """Missing files are ignored, and an unusable database does not prevent hashing.
+
+    Parameters:
+        tmp_path: A Pytest fixture providing a temporary directory.
+    """
+    existing = tmp_path / "existing.txt"
+    existing.write_text("existing")
+    database = tmp_path / "files.db"
+    database.write_text("not a database")
+    hashes = FileIndex(database).hash_files([str(existing), str(tmp_path / "missing.txt")])
+    assert list(hashes) == [str(existing)]
+
+
+class _CacheServer(ThreadingHTTPServer):
+    store: dict[str, bytes]
+
+
+class _CacheHandler(BaseHTTPRequestHandler):
+    server: _CacheServer
+
+    def do_GET(self) -> None:
+        data = self.server.store.get(self.path)
+        if data is None:
+            self.send_error(404)
+            return
+        self.send_response(200)
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_PUT(self) -> None:
+        self.server.store[self.path] = self.rfile.read(int(self.headers["Content-Length"]))
+        self.send_response(201)
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+
+    def log_message(self, *args: object) -> None:
+        pass
+
+
+@pytest.fixture(name="cache_server")
+def fixture_cache_server() -> Iterator[_CacheServer]:
+    """Serve an in-memory HTTP results cache."""
+    server = _CacheServer(("127.0.0.1", 0), _CacheHandler)
+    server.store = {}
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.mark.parametrize("backend", ["directory", "http"])
+def test_restore_results_from_shared_cache(
+    monkeypatch: pytest.MonkeyPatch,
+    tmp_path: Path,
+    capfd: pytest.CaptureFixture,
+    request: pytest.FixtureRequest,
+    backend: str,
+) -> None:
+    """Results of a duty are restored from the shared cache, without running it again.
+
+    Parameters:
+        monkeypatch: A Pytest fixture to patch objects.
+        tmp_path: A Pytest fixture providing a temporary directory.
+        capfd: A Pytest fixture to capture output.
+        request: A Pytest fixture giving access to other fixtures.
+        backend: The kind of shared cache.
+    """
+    if backend == "http":
+        server = request.getfixturevalue("cache_server")
+        location = f"http://127.0.0.1:{server.server_address[1]}"
+    else:
+        location = str(tmp_path / "shared")
+    monkeypatch.setenv("DUTY_RESULT_CACHE", location)
+    monkeypatch.chdir(tmp_path)
+    Path("input.txt").write_text("input")
+    calls = []
+
+    def build(ctx: object) -> None:  # noqa: ARG001
+        calls.append(True)
+        print("building")  # noqa: T201
+        Path("output.txt").write_text("output")
+
+    duty = Duty("build", "", build, inputs=["input.txt"], outputs=["output.txt"])
+    duty.run()
+    assert capfd.readouterr().out == "building\n"
+
+    # Simulate another machine: empty local cache, no outputs.
+    monkeypatch.setenv("DUTY_CACHE_DIR", str(tmp_path / "other"))
+    Path("output.txt").unlink()
+    duty.run()
+    assert len(calls) == 1
+    assert capfd.readouterr().out == "building\n"
+    assert Path("output.txt").read_text() == "output"
+
+    # Different inputs: the duty runs again.
+    Path("input.txt").write_text("changed")
+    duty.run()
+    assert len(calls) == 2
+
+
+@pytest.mark.parametrize("output", ["../escaped.txt", "sub/../../escaped.txt", "{outside}", "link/escaped.txt"])
+def test_refuse_to_restore_outputs_outside_project(
+    monkeypatch: pytest.MonkeyPatch,
+    tmp_path: Path,
+    output: str,
+) -> None:
+    """Outputs of a poisoned shared cache entry are never written outside the project.
+
+    Parameters:
+        monkeypatch: A Pytest fixture to patch objects.
+        tmp_path: A Pytest fixture providing a temporary directory.
+        output: The output path recorded in the poisoned entry.
+    """
+    shared = tmp_path / "shared"
+    project = tmp_path / "project"
+    project.mkdir()
+    (project / "link").symlink_to(tmp_path)
+    monkeypatch.setenv("DUTY_RESULT_CACHE", str(shared))
+    monkeypatch.chdir(project)
+    Path("input.txt").write_text("input")
+    calls = []
+
+    def build(ctx: object) -> None:  # noqa: ARG001
+        calls.append(True)
+        Path("output.txt").write_text("output")
+
+    duty = Duty("build", "", build, inputs=["input.txt"], outputs=["output.txt"])
+    duty.run()
+
+    # Poison the entry: point its output outside of the project.
+    escaped = tmp_path / "escaped.txt"
+    (entry,) = (shared / "ac").iterdir()
+    result = json.loads(entry.read_text())
+    result["outputs"] = {output.format(outside=escaped): result["outputs"]["output.txt"]}
+    entry.write_text(json.dumps(result))
+
+    monkeypatch.setenv("DUTY_CACHE_DIR", str(tmp_path / "other"))
+    duty.run()
+    assert len(calls) == 2
+    assert not escaped.exists()
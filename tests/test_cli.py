@@ -2,11 +2,21 @@
 
 from __future__ import annotations
 
+import json
+import os
+import shutil
+import subprocess
+import time
+from typing import TYPE_CHECKING
+
 import pytest
 
 from duty import main
 from duty._internal import debug
 
+if TYPE_CHECKING:
+    from pathlib import Path
+
 
 def test_no_duty(capsys: pytest.CaptureFixture) -> None:
     """Run no duties.
@@ -246,3 +256,240 @@ def test_show_debug_info(capsys: pytest.CaptureFixture) -> None:
     assert "system" in captured
     assert "environment" in captured
     assert "packages" in captured
+
+
+def test_run_duties_concurrently(
+    capfd: pytest.CaptureFixture,
+    monkeypatch: pytest.MonkeyPatch,
+    tmp_path: Path,
+) -> None:
+    """Run duties concurrently, printing their output in order.
+
+    Parameters:
+        capfd: Pytest fixture to capture output.
+        monkeypatch: Pytest fixture to set environment variables.
+        tmp_path: Pytest fixture for a temporary directory.
+    """
+    monkeypatch.setenv("DUTY_TEST_MARKER", str(tmp_path / "marker"))
+    # `waiting` only succeeds if `marking` runs while it waits.
+    assert main(["-d", "tests/fixtures/parallel.py", "-j", "2", "-f", "tap", "waiting", "marking"]) == 0
+    captured = capfd.readouterr()
+    assert captured.out.index("waiting") < captured.out.index("marking")
+
+
+def test_return_first_failure_code_when_running_concurrently(
+    monkeypatch: pytest.MonkeyPatch,
+    tmp_path: Path,
+) -> None:
+    """Return the exit code of the first failed duty, in the given order.
+
+    Parameters:
+        monkeypatch: Pytest fixture to set environment variables.
+        tmp_path: Pytest fixture for a temporary directory.
+    """
+    monkeypatch.setenv("DUTY_TEST_MARKER", str(tmp_path / "marker"))
+    args = ["-d", "tests/fixtures/parallel.py", "-j", "3", "failing", "code=3", "marking", "failing", "code=4"]
+    assert main(args) == 3
+
+
+def test_refuse_cycles(capsys: pytest.CaptureFixture) -> None:
+    """Refuse to run duties when pre- and post-duties form a cycle.
+
+    Parameters:
+        capsys: Pytest fixture to capture output.
+    """
+    assert main(["-d", "tests/fixtures/cycle.py", "first"]) == 1
+    captured = capsys.readouterr()
+    assert "first -> second -> first" in captured.err
+
+
+def test_run_pre_duties_concurrently(
+    capfd: pytest.CaptureFixture,
+    monkeypatch: pytest.MonkeyPatch,
+    tmp_path: Path,
+) -> None:
+    """Run pre-duties concurrently when the duty allows it.
+
+    Parameters:
+        capfd: Pytest fixture to capture output.
+        monkeypatch: Pytest fixture to set environment variables.
+        tmp_path: Pytest fixture for a temporary directory.
+    """
+    monkeypatch.setenv("DUTY_TEST_MARKER", str(tmp_path / "marker"))
+    assert main(["-d", "tests/fixtures/parallel.py", "-f", "tap", "both"]) == 0
+    captured = capfd.readouterr()
+    assert captured.out.index("waiting") < captured.out.index("marking") < captured.out.index("both")
+
+
+def test_bound_concurrent_pre_duties(monkeypatch: pytest.MonkeyPatch, tmp_path: Path) -> None:
+    """Limit the number of concurrent pre-duties to their bound, even with more jobs.
+
+    Parameters:
+        monkeypatch: Pytest fixture to set environment variables.
+        tmp_path: Pytest fixture for a temporary directory.
+    """
+    monkeypatch.setenv("DUTY_TEST_MARKER", str(tmp_path / "marker"))
+    # Pre-duties of `bounded` fail if they run at the same time.
+    assert main(["-d", "tests/fixtures/parallel.py", "-j", "4", "bounded"]) == 0
+
+
+def test_record_durations_of_concurrent_runs(
+    capfd: pytest.CaptureFixture,
+    monkeypatch: pytest.MonkeyPatch,
+    tmp_path: Path,
+) -> None:
+    """Record durations of concurrent runs, and print estimates in subsequent runs.
+
+    Parameters:
+        capfd: Pytest fixture to capture output.
+        monkeypatch: Pytest fixture to set environment variables.
+        tmp_path: Pytest fixture for a temporary directory.
+    """
+    monkeypatch.setenv("DUTY_TEST_MARKER", str(tmp_path / "marker"))
+    args = ["-d", "tests/fixtures/parallel.py", "-j", "2", "marking", "failing", "code=0"]
+    assert main(args) == 0
+    assert "Estimated duration" not in capfd.readouterr().out
+    assert set(json.loads((tmp_path / ".duty" / "durations.json").read_text())) == {"marking", "failing"}
+    assert main(args) == 0
+    assert "Estimated duration" in capfd.readouterr().out
+
+
+def test_fail_fast_terminates_running_duties(monkeypatch: pytest.MonkeyPatch, tmp_path: Path) -> None:
+    """Terminate running duties and their commands once a duty fails.
+
+    Parameters:
+        monkeypatch: Pytest fixture to set environment variables.
+        tmp_path: Pytest fixture for a temporary directory.
+    """
+    monkeypatch.setenv("DUTY_TEST_MARKER", str(tmp_path / "marker"))
+    start = time.monotonic()
+    assert main(["-d", "tests/fixtures/parallel.py", "-j", "2", "--fail-fast", "sleeping", "failing"]) == 2
+    assert time.monotonic() - start < 10
+
+
+@pytest.mark.parametrize("jobs", ["1", "2"])
+def test_keep_going_and_summarize_failures(
+    capfd: pytest.CaptureFixture,
+    monkeypatch: pytest.MonkeyPatch,
+    tmp_path: Path,
+    jobs: str,
+) -> None:
+    """Keep running duties after failures, and print a summary of failures.
+
+    Parameters:
+        capfd: Pytest fixture to capture output.
+        monkeypatch: Pytest fixture to set environment variables.
+        tmp_path: Pytest fixture for a temporary directory.
+        jobs: Number of concurrent jobs.
+    """
+    monkeypatch.setenv("DUTY_TEST_MARKER", str(tmp_path / "marker"))
+    args = ["-d", "tests/fixtures/parallel.py", "-j", jobs, "-k", "failing", "code=3", "marking", "failing", "code=4"]
+    assert main(args) == 3
+    assert (tmp_path / "marker").exists()
+    captured = capfd.readouterr()
+    assert "> 2 failed:" in captured.err
+    assert "failing (exit code 3)" in captured.err
+    assert "failing (exit code 4)" in captured.err
+
+
+def test_refuse_fail_fast_and_keep_going() -> None:
+    """Refuse to both fail fast and keep going."""
+    with pytest.raises(SystemExit):
+        main(["-d", "tests/fixtures/parallel.py", "--fail-fast", "-k", "marking"])
+
+
+def test_refuse_invalid_resource_capacity() -> None:
+    """Refuse invalid resource capacities."""
+    with pytest.raises(SystemExit):
+        main(["-d", "tests/fixtures/parallel.py", "--resource", "gpu=many", "marking"])
+
+
+def test_run_matrix_of_duty(capfd: pytest.CaptureFixture) -> None:
+    """Run a duty once per cell of its matrix, and print a table of results.
+
+    Parameters:
+        capfd: Pytest fixture to capture output.
+    """
+    assert main(["-d", "tests/fixtures/matrix.py", "-f", "tap", "cells"]) == 3
+    lines = capfd.readouterr().out.splitlines()
+    assert "[code=0] ok 1 - cell 0" in lines
+    assert "[code=3] not ok 1 - cell 3" in lines
+    assert any(line.split() == ["cells", "code=0", "passed", line.split()[-1]] for line in lines)
+    assert any(line.split()[:4] == ["cells", "code=3", "failed", "(3)"] for line in lines)
+
+
+def test_run_matrix_from_command_line(capfd: pytest.CaptureFixture) -> None:
+    """Run duties for each combination of values given on the command line.
+
+    Parameters:
+        capfd: Pytest fixture to capture output.
+    """
+    args = ["-d", "tests/fixtures/matrix.py", "-f", "tap", "--matrix", "value=a,b", "--matrix", "times=1,2", "echo"]
+    assert main(args) == 0
+    lines = capfd.readouterr().out.splitlines()
+    for cell, output in (("value=a times=1", "a"), ("value=a times=2", "aa"), ("value=b times=2", "bb")):
+        assert f"[{cell}] ok 1 - echo {output}" in lines
+    assert sum(line.startswith("echo ") and "passed" in line for line in lines) == 4
+
+
+def test_refuse_invalid_matrix(capsys: pytest.CaptureFixture) -> None:
+    """Refuse matrix parameters that the duty does not accept.
+
+    Parameters:
+        capsys: Pytest fixture to capture output.
+    """
+    assert main(["-d", "tests/fixtures/matrix.py", "--matrix", "nope=1", "echo"]) == 1
+    assert "unexpected keyword argument 'nope'" in capsys.readouterr().err
+
+
+@pytest.mark.parametrize("shell", ["bash", "zsh", "fish"])
+def test_print_completion_script(capsys: pytest.CaptureFixture, shell: str) -> None:
+    """Print completion scripts for each supported shell.
+
+    Parameters:
+        capsys: Pytest fixture to capture output.
+        shell: The shell to print the script for.
+    """
+    assert main(["--completion", shell]) == 0
+    assert "--complete --" in capsys.readouterr().out
+
+
+def test_save_completion_candidates(capsys: pytest.CaptureFixture, tmp_path: Path) -> None:
+    """Save completion candidates for shell scripts.
+
+    Parameters:
+        capsys: Pytest fixture to capture output.
+        tmp_path: A Pytest fixture providing a temporary directory.
+    """
+    assert main(["-d", "tests/fixtures/matrix.py", "--complete", "--", "duty", "echo"]) == 0
+    assert {"cells", "echo", "times=", "value=", "--jobs"} <= set(capsys.readouterr().out.split())
+    lines = tmp_path.joinpath(".duty", "completions", "matrix.py").read_text().splitlines()
+    assert lines[0] == os.path.realpath("tests/fixtures/matrix.py")
+    assert "--jobs" in lines[1].split()
+    assert lines[2:] == ["cells code=", "echo times= value="]
+
+
+@pytest.mark.skipif(not shutil.which("bash"), reason="Bash is not installed")
+def test_complete_in_bash_from_candidates_file(capsys: pytest.CaptureFixture, tmp_path: Path) -> None:
+    """Complete duties and parameters in Bash without running duty.
+
+    Parameters:
+        capsys: Pytest fixture to capture output.
+        tmp_path: A Pytest fixture providing a temporary directory.
+    """
+    duties_file = tmp_path / "duties.py"
+    shutil.copy("tests/fixtures/matrix.py", duties_file)
+    past = time.time() - 10
+    os.utime(duties_file, (past, past))
+    assert main(["-d", str(duties_file), "--complete"]) == 0
+    capsys.readouterr()
+    assert main(["--completion", "bash"]) == 0
+    script = capsys.readouterr().out + (
+        "duty() { echo called >&2; }\n"
+        "COMP_WORDS=(duty echo t); COMP_CWORD=2; _complete_duty duty t echo; echo ${COMPREPLY[*]}\n"
+        "COMP_WORDS=(duty c); COMP_CWORD=1; _complete_duty duty c duty; echo ${COMPREPLY[*]}\n"
+    )
+    env = {**os.environ, "DUTY_CACHE_DIR": ""}
+    result = subprocess.run(["bash", "-c", script], cwd=tmp_path, env=env, capture_output=True, text=True, check=True)  # noqa: S603,S607
+    assert result.stdout.split() == ["times=", "cells"]
+    assert "called" not in result.stderr
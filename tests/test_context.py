@@ -2,6 +2,10 @@
 
 from __future__ import annotations
 
+import asyncio
+import os
+import sys
+import time
 from collections import namedtuple
 from pathlib import Path
 
@@ -9,10 +13,34 @@ import pytest
 
 from duty._internal import context
 from duty._internal.exceptions import DutyFailure
+from duty._internal.tools._base import Tool
 
 RunResult = namedtuple("RunResult", "code output")  # noqa: PYI024
 
 
+class _Probe(Tool):
+    cli_name = "probe"
+
+    def __init__(self, code: int = 0, wait_for: str = "", touch: str = "") -> None:
+        super().__init__(py_args={"code": code, "wait_for": wait_for, "touch": touch})
+
+    def __call__(self) -> int:
+        import wave  # noqa: F401,PLC0415
+
+        print(f"pid {os.getpid()}")  # noqa: T201
+        sys.stderr.write("some error\n")
+        if self.py_args["touch"]:
+            Path(self.py_args["touch"]).touch()
+        if self.py_args["wait_for"]:
+            for _ in range(50):
+                if Path(self.py_args["wait_for"]).exists():
+                    break
+                time.sleep(0.1)
+            else:
+                return 1
+        return self.py_args["code"]
+
+
 def test_allow_overrides(monkeypatch: pytest.MonkeyPatch) -> None:
     """Test the `allow_overrides` option.
 
@@ -101,3 +129,193 @@ def test_workdir_as_context_manager(monkeypatch: pytest.MonkeyPatch) -> None:
     # eventually be the root, so cap the lowest depth at 1.
     expected_depths = [max(1, base - offset) for offset in range(len(records))]
     assert records == expected_depths
+
+
+def test_arun_commands_concurrently(tmp_path: Path) -> None:
+    """Run commands concurrently with `arun`.
+
+    Parameters:
+        tmp_path: A Pytest fixture providing a temporary directory.
+    """
+    ctx = context.Context({})
+    marker = tmp_path / "marker"
+    wait = f"for i in $(seq 50); do [ -f {marker} ] && echo waited && exit 0; sleep 0.1; done; exit 1"
+
+    async def run_both() -> list[str]:
+        return list(await asyncio.gather(ctx.arun(wait), ctx.arun(["touch", str(marker)])))
+
+    assert asyncio.run(run_both()) == ["waited\n", ""]
+
+
+def test_arun_failure() -> None:
+    """Raise a duty failure when an asynchronous command fails."""
+    ctx = context.Context({})
+    with pytest.raises(DutyFailure) as failure:
+        asyncio.run(ctx.arun("echo failed; exit 3", capture="stdout"))
+    assert failure.value.code == 3
+    assert asyncio.run(ctx.arun("exit 3", nofail=True)) == ""
+
+
+def test_arun_cancellation_terminates_commands() -> None:
+    """Terminate commands (and their subprocesses) when `arun` is cancelled."""
+    ctx = context.Context({})
+    start = time.monotonic()
+    with pytest.raises(asyncio.TimeoutError):
+        asyncio.run(asyncio.wait_for(ctx.arun("sleep 30 & wait"), 0.5))
+    assert time.monotonic() - start < 10
+
+
+def test_arun_coroutine_functions() -> None:
+    """Await coroutine functions passed to `arun`."""
+    ctx = context.Context({})
+
+    async def compute(value: int) -> int:
+        await asyncio.sleep(0)
+        return value
+
+    asyncio.run(ctx.arun(compute, args=[0]))
+    with pytest.raises(DutyFailure):
+        asyncio.run(ctx.arun(compute, args=[2]))
+
+
+def test_skip_up_to_date_commands(monkeypatch: pytest.MonkeyPatch, tmp_path: Path) -> None:
+    """Skip commands whose inputs did not change, replaying their output.
+
+    Parameters:
+        monkeypatch: A Pytest fixture to monkeypatch objects.
+        tmp_path: A Pytest fixture providing a temporary directory.
+    """
+    monkeypatch.chdir(tmp_path)
+    Path("src").mkdir()
+    Path("src/module.py").write_text("a = 1")
+    calls = []
+
+    def build() -> None:
+        calls.append(True)
+        print("built")  # noqa: T201
+
+    ctx = context.Context({})
+    assert ctx.run(build, inputs=["src/**/*.py"], outputs=["dist/*"]) == "built\n"
+    assert ctx.run(build, inputs=["src/**/*.py"], outputs=["dist/*"]) == "built\n"
+    assert len(calls) == 1
+
+    Path("src/module.py").write_text("a = 2")
+    ctx.run(build, inputs=["src/**/*.py"], outputs=["dist/*"])
+    assert len(calls) == 2
+
+    Path("dist").mkdir()
+    Path("dist/package.whl").touch()
+    ctx.run(build, inputs=["src/**/*.py"], outputs=["dist/*"])
+    assert len(calls) == 3
+
+    ctx.run(build, inputs=["src/**/*.py"], outputs=["dist/*"], title="Building")
+    assert len(calls) == 4
+
+
+@pytest.mark.skipif(not hasattr(os, "fork"), reason="the pool needs fork")
+def test_run_tools_in_pool() -> None:
+    """Run tools in processes forked from warm processes."""
+    assert "wave" not in sys.modules
+    ctx = context.Context({"pool": True})
+    output = ctx.run(_Probe(), capture="both")
+    assert output.startswith("pid ")
+    assert int(output.split()[1]) != os.getpid()
+    assert "some error" in output
+    assert "wave" not in sys.modules
+
+    with pytest.raises(DutyFailure) as failure:
+        ctx.run(_Probe(code=3))
+    assert failure.value.code == 3
+
+
+@pytest.mark.skipif(not hasattr(os, "fork"), reason="the pool needs fork")
+def test_arun_tools_in_pool_concurrently(tmp_path: Path) -> None:
+    """Run tools in the pool concurrently with `arun`.
+
+    Parameters:
+        tmp_path: A Pytest fixture providing a temporary directory.
+    """
+    ctx = context.Context({})
+    marker = str(tmp_path / "marker")
+
+    async def run_both() -> list[str]:
+        return list(
+            await asyncio.gather(
+                ctx.arun(_Probe(wait_for=marker), pool=True, capture="stdout"),
+                ctx.arun(_Probe(touch=marker), pool=True, capture="stdout"),
+            ),
+        )
+
+    assert all(output.startswith("pid ") for output in asyncio.run(run_both()))
+    assert "wave" not in sys.modules
+
+
+def test_run_in_background(tmp_path: Path) -> None:
+    """Start a command in the background, wait for it to be ready, and stop it when the duty finishes.
+
+    Parameters:
+        tmp_path: A Pytest fixture providing a temporary directory.
+    """
+    from duty._internal.collection import Duty  # noqa: PLC0415
+
+    script = tmp_path / "serve.py"
+    script.write_text(
+        "import socket, time\n"
+        "server = socket.create_server(('127.0.0.1', 0))\n"
+        "print('listening on', server.getsockname()[1], flush=True)\n"
+        "time.sleep(60)\n",
+    )
+    processes = []
+
+    def serve(ctx: context.Context) -> None:
+        process = ctx.run([sys.executable, str(script)], background=True, ready_output=r"listening on (\d+)")
+        port = int(process.wait_for_output(r"listening on (\d+)").group(1))  # type: ignore[union-attr]
+        assert process.wait_for_port(port, timeout=5)
+        assert process.running
+        processes.append(process)
+        raise DutyFailure(2)
+
+    with pytest.raises(DutyFailure):
+        Duty("serve", "", serve).run()
+    assert not processes[0].running
+    assert "listening on" in processes[0].output
+
+
+def test_background_command_not_ready() -> None:
+    """Fail when a background command exits or times out before being ready."""
+    ctx = context.Context({})
+    with pytest.raises(DutyFailure) as exc_info:
+        ctx.run(f"{sys.executable} -c 'print(\"oops\"); raise SystemExit(3)'", background=True, ready_output="ready")
+    assert exc_info.value.code == 3
+    with pytest.raises(DutyFailure) as exc_info:
+        ctx.run([sys.executable, "-c", "import time; time.sleep(60)"], background=True, ready_port=1, ready_timeout=0.5)
+    assert exc_info.value.code == 1
+    with pytest.raises(TypeError, match="Only commands"):
+        ctx.run(lambda: 0, background=True)
+
+
+def test_arun_up_to_date_and_background_commands(monkeypatch: pytest.MonkeyPatch, tmp_path: Path) -> None:
+    """Skip up-to-date commands and start commands in the background with `arun`.
+
+    Parameters:
+        monkeypatch: A Pytest fixture to monkeypatch objects.
+        tmp_path: A Pytest fixture providing a temporary directory.
+    """
+    monkeypatch.chdir(tmp_path)
+    Path("src").mkdir()
+    Path("src/module.py").write_text("a = 1")
+    build = "echo built; echo call >> calls.txt"
+
+    ctx = context.Context({})
+    assert asyncio.run(ctx.arun(build, inputs=["src/**/*.py"])) == "built\n"
+    assert asyncio.run(ctx.arun(build, inputs=["src/**/*.py"])) == "built\n"
+    assert Path("calls.txt").read_text().count("call") == 1
+    Path("src/module.py").write_text("a = 2")
+    asyncio.run(ctx.arun(build, inputs=["src/**/*.py"]))
+    assert Path("calls.txt").read_text().count("call") == 2
+
+    command = [sys.executable, "-c", "import time; print('ready', flush=True); time.sleep(60)"]
+    with ctx._stopping_background():
+        process = asyncio.run(ctx.arun(command, background=True, ready_output="ready"))
+        assert process.running
+    assert not process.running
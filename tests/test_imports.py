@@ -0,0 +1,91 @@
+"""Tests for the import time of duty."""
+
+from __future__ import annotations
+
+import json
+import subprocess
+import sys
+
+import pytest
+
+import duty
+
+# Cumulative import time of the `duty` package, in microseconds.
+# It is well under 20ms: the budget leaves room for slow machines.
+_IMPORT_BUDGET = 100_000
+
+_HEAVY_MODULES = {
+    "argparse",
+    "asyncio",
+    "failprint",
+    "duty._internal.cli",
+    "duty._internal.collection",
+    "duty._internal.tools._ruff",
+    "duty._internal.callables.ruff",
+}
+
+
+def _imported_modules(code: str) -> set[str]:
+    result = subprocess.run(  # noqa: S603
+        [sys.executable, "-c", f"{code}\nimport json, sys\nprint(json.dumps(sorted(sys.modules)))"],
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    return set(json.loads(result.stdout.splitlines()[-1]))
+
+
+def test_import_time_budget() -> None:
+    """Importing duty stays within the import time budget."""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import duty"],
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    cumulative = {
+        name.strip(): int(total)
+        for line in result.stderr.splitlines()
+        if line.startswith("import time:") and "|" in line
+        for _, total, name in [line.removeprefix("import time:").split("|")]
+        if total.strip().isdigit()
+    }
+    assert cumulative["duty"] < _IMPORT_BUDGET
+
+
+@pytest.mark.parametrize(
+    "code",
+    [
+        "import duty",
+        "import duty.tools",
+        "import warnings; warnings.simplefilter('ignore'); import duty.callables",
+    ],
+)
+def test_lazy_imports(code: str) -> None:
+    """Importing duty, its tools or callables does not import heavy modules.
+
+    Parameters:
+        code: The code importing duty.
+    """
+    assert not _imported_modules(code) & _HEAVY_MODULES
+
+
+@pytest.mark.parametrize("option", ["--version", "--debug-info"])
+def test_fast_paths(option: str) -> None:
+    """Printing the version or debug information does not import failprint nor build the parser.
+
+    Parameters:
+        option: The CLI option.
+    """
+    code = f"from duty import main\ntry:\n    main([{option!r}])\nexcept SystemExit:\n    pass"
+    modules = _imported_modules(code)
+    assert "failprint" not in modules
+    assert "duty._internal.collection" not in modules
+
+
+def test_lazy_attributes() -> None:
+    """Objects are still available as attributes of their modules."""
+    code = "import duty, duty.tools; print(duty.Duty.__module__, duty.tools.ruff.__module__)"
+    result = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True)  # noqa: S603
+    assert result.stdout.split() == ["duty._internal.collection", "duty._internal.tools._ruff"]
+    assert "Duty" in dir(duty)
@@ -0,0 +1,100 @@
+"""Tests for the GNU make jobserver integration."""
+
+from __future__ import annotations
+
+import os
+import select
+import shutil
+import subprocess
+import sys
+from typing import TYPE_CHECKING
+
+import pytest
+
+from duty._internal.jobserver import _inherited_jobs, _JobServer, _jobserver
+
+if TYPE_CHECKING:
+    from pathlib import Path
+
+pytestmark = pytest.mark.skipif(not hasattr(os, "mkfifo"), reason="jobservers need POSIX FIFOs")
+
+
+def test_serve_jobserver(monkeypatch: pytest.MonkeyPatch) -> None:
+    """Serve a jobserver with one token per additional job, advertised in `MAKEFLAGS`.
+
+    Parameters:
+        monkeypatch: A Pytest fixture to patch the environment.
+    """
+    monkeypatch.delenv("MAKEFLAGS", raising=False)
+    with _jobserver(3) as server:
+        assert server is not None
+        assert "--jobserver-auth=fifo:" in os.environ["MAKEFLAGS"]
+        client = _JobServer.from_environment()
+        assert client is not None
+        first, second = client.acquire(), client.acquire()
+        assert first is not None
+        assert second is not None
+        assert client.acquire() is None
+        client.release(second)
+        assert client.acquire() is not None
+        client.close()
+    assert "MAKEFLAGS" not in os.environ
+
+
+def test_no_jobserver_for_single_job(monkeypatch: pytest.MonkeyPatch) -> None:
+    """Don't serve a jobserver when jobs cannot run concurrently.
+
+    Parameters:
+        monkeypatch: A Pytest fixture to patch the environment.
+    """
+    monkeypatch.delenv("MAKEFLAGS", raising=False)
+    with _jobserver(1) as server:
+        assert server is None
+    assert _inherited_jobs() == 1
+
+
+def test_connect_to_make_jobserver_pipe(monkeypatch: pytest.MonkeyPatch) -> None:
+    """Connect to the jobserver of a parent make process, using inherited pipes.
+
+    Parameters:
+        monkeypatch: A Pytest fixture to patch the environment.
+    """
+    read_fd, write_fd = os.pipe()
+    try:
+        os.write(write_fd, b"+")
+        monkeypatch.setenv("MAKEFLAGS", f" -j2 --jobserver-auth={read_fd},{write_fd}")
+        assert _inherited_jobs() == 2
+        with _jobserver(8) as client:
+            assert client is not None
+            token = client.acquire()
+            assert token == b"+"
+            assert client.acquire() is None
+            client.release(token)
+        # Inherited pipes are left open, and the token was given back.
+        assert select.select([read_fd], [], [], 0)[0]
+    finally:
+        os.close(read_fd)
+        os.close(write_fd)
+
+
+@pytest.mark.skipif(shutil.which("make") is None, reason="GNU make is not installed")
+def test_run_duties_under_make(tmp_path: Path) -> None:
+    """Run duties concurrently with the job slots given by `make -j`.
+
+    Parameters:
+        tmp_path: A Pytest fixture providing a temporary directory.
+    """
+    duties_file = os.path.abspath("tests/fixtures/parallel.py")
+    makefile = tmp_path / "Makefile"
+    # `waiting` only succeeds if `marking` runs while it waits, so make must give a token to duty.
+    makefile.write_text(f"all:\n\t+{sys.executable} -m duty -d {duties_file} waiting marking\n")
+    env = {**os.environ, "DUTY_TEST_MARKER": str(tmp_path / "marker")}
+    env.pop("MAKEFLAGS", None)
+    process = subprocess.run(  # noqa: S603
+        ["make", "-s", "-j2", "-f", str(makefile)],  # noqa: S607
+        env=env,
+        capture_output=True,
+        text=True,
+        check=False,
+    )
+    assert process.returncode == 0, process.stdout + process.stderr
@@ -0,0 +1,156 @@
+"""Tests for the duties metadata."""
+
+from __future__ import annotations
+
+import os
+import sys
+from pathlib import Path
+
+import pytest
+
+from duty import main
+from duty._internal.collection import Collection
+from duty._internal.metadata import _cached_metadata, _duty_metadata, _scan_duties
+
+_DUTIES = '''
+from pathlib import Path
+
+from duty import duty
+
+Path(__file__).with_name("loaded").touch()
+
+
+@duty(aliases=["greet"])
+def say_hello(ctx, who, *rest, loud=False, **kwargs):
+    """Say hello.
+
+    Loudly, maybe.
+    """
+'''
+
+
+@pytest.mark.parametrize(
+    "fixture",
+    sorted(path.name for path in Path("tests/fixtures").glob("*.py") if path.name not in {"cycle.py", "validation.py"}),
+)
+def test_scan_finds_loaded_duties(fixture: str) -> None:
+    """Scanning a duties file finds the same duties as loading it.
+
+    Parameters:
+        fixture: The name of a duties file in the fixtures.
+    """
+    path = f"tests/fixtures/{fixture}"
+    collection = Collection(path)
+    collection.load()
+    assert _scan_duties(path) == [_duty_metadata(duty) for duty in collection.duties.values()]
+
+
+def test_list_and_complete_without_loading(capsys: pytest.CaptureFixture, tmp_path: Path) -> None:
+    """Listing duties and completing their parameters does not execute the duties file.
+
+    Parameters:
+        capsys: Pytest fixture to capture output.
+        tmp_path: A Pytest fixture providing a temporary directory.
+    """
+    duties_file = tmp_path / "duties.py"
+    duties_file.write_text(_DUTIES)
+
+    assert main(["-d", str(duties_file), "--list"]) == 0
+    assert "say-hello             Say hello." in capsys.readouterr().out
+    assert main(["-d", str(duties_file), "-h", "greet"]) == 0
+    assert "Loudly, maybe." in capsys.readouterr().out
+    assert main(["-d", str(duties_file), "--complete", "say-hello"]) == 0
+    candidates = capsys.readouterr().out.split()
+    assert {"who=", "loud=", "kwargs="} <= set(candidates)
+    assert "rest=" not in candidates
+    assert not tmp_path.joinpath("loaded").exists()
+
+
+@pytest.mark.parametrize(
+    "code",
+    [
+        "from duty import duty\n\ndef _lint(ctx):\n    pass\n\nlint = duty(_lint, name='lint')\n",
+        "import duty\n\ndef _lint(ctx):\n    pass\n\nlint = duty.duty(name='lint')(_lint)\n",
+        "from tasks import lint\n",
+    ],
+)
+def test_scan_fails_on_duties_created_without_decorator(code: str, tmp_path: Path) -> None:
+    """Scanning fails when duties could be created by calls or imported.
+
+    Parameters:
+        code: The contents of the duties file.
+        tmp_path: A Pytest fixture providing a temporary directory.
+    """
+    duties_file = tmp_path / "duties.py"
+    duties_file.write_text(f"{code}\n@duty\ndef test(ctx):\n    pass\n")
+    assert _scan_duties(str(duties_file)) is None
+
+
+def test_list_duties_created_by_calls(capsys: pytest.CaptureFixture, tmp_path: Path) -> None:
+    """Duties created by calling `duty` are listed, even without cached metadata.
+
+    Parameters:
+        capsys: Pytest fixture to capture output.
+        tmp_path: A Pytest fixture providing a temporary directory.
+    """
+    duties_file = tmp_path / "duties.py"
+    duties_file.write_text(
+        "from duty import duty\n\n@duty\ndef test(ctx):\n    pass\n\n"
+        "def _lint(ctx):\n    pass\n\nlint = duty(_lint, name='lint')\n",
+    )
+    assert main(["-d", str(duties_file), "--list"]) == 0
+    assert "lint" in capsys.readouterr().out
+
+
+def test_cache_metadata_of_loaded_duties(capsys: pytest.CaptureFixture, tmp_path: Path) -> None:
+    """Duties that cannot be found statically are listed from the metadata of the last load.
+
+    Parameters:
+        capsys: Pytest fixture to capture output.
+        tmp_path: A Pytest fixture providing a temporary directory.
+    """
+    duties_file = tmp_path / "duties.py"
+    marker = tmp_path / "loaded"
+    duties_file.write_text(
+        _DUTIES + "\nfrom duty._internal.decorator import create_duty\nhello = create_duty(say_hello)\n",
+    )
+
+    assert main(["-d", str(duties_file), "--list"]) == 0
+    assert "say-hello" in capsys.readouterr().out
+    assert marker.exists()
+
+    marker.unlink()
+    assert main(["-d", str(duties_file), "--list"]) == 0
+    assert "say-hello" in capsys.readouterr().out
+    assert not marker.exists()
+
+    duties_file.write_text(duties_file.read_text() + "# changed\n")
+    assert main(["-d", str(duties_file), "--list"]) == 0
+    assert marker.exists()
+
+
+def test_invalidate_metadata_when_imported_modules_change(monkeypatch: pytest.MonkeyPatch, tmp_path: Path) -> None:
+    """Metadata are invalidated when a module imported by the duties file changes.
+
+    Parameters:
+        monkeypatch: A Pytest fixture to patch objects.
+        tmp_path: A Pytest fixture providing a temporary directory.
+    """
+    monkeypatch.syspath_prepend(str(tmp_path))
+    monkeypatch.delitem(sys.modules, "helpers", raising=False)
+    helpers = tmp_path / "helpers.py"
+    helpers.write_text("NAME = 'hello'\n")
+    duties_file = tmp_path / "duties.py"
+    duties_file.write_text(
+        "from duty import duty\nimport helpers\n\n@duty(name=helpers.NAME)\ndef task(ctx):\n    pass\n",
+    )
+
+    assert _scan_duties(str(duties_file)) is None
+    Collection(str(duties_file)).load()
+    cached = _cached_metadata(str(duties_file))
+    assert cached is not None
+    assert cached[0]["name"] == "hello"
+
+    mtime = helpers.stat().st_mtime_ns
+    os.utime(helpers, ns=(mtime, mtime + 1_000_000_000))
+    assert _cached_metadata(str(duties_file)) is None
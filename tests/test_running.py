@@ -2,14 +2,22 @@
 
 from __future__ import annotations
 
-from typing import NoReturn
+import os
+import subprocess
+import sys
+from pathlib import Path
+from typing import TYPE_CHECKING, NoReturn
 from unittest.mock import NonCallableMock
 
 import pytest
 
 from duty._internal.collection import Collection, Duty
 from duty._internal.decorator import duty as decorate
-from duty._internal.exceptions import DutyFailure
+from duty._internal.exceptions import DutyCycleError, DutyFailure
+from duty._internal.scheduler import _admit, _build_jobs, _critical_paths, _estimate, _pick, _simulate
+
+if TYPE_CHECKING:
+    from duty._internal.context import Context
 
 INTERRUPT_CODE = 130
 
@@ -112,3 +120,229 @@ def test_cant_find_duty_without_collection() -> None:
     duty = decorate(lambda ctx: None, name="duty1", post=["duty2"])  # type: ignore[call-overload]
     with pytest.raises(RuntimeError):
         duty.run()
+
+
+def test_run_collection_concurrently() -> None:
+    """Run duties of a collection concurrently, raising the first failure."""
+    collection = Collection()
+    collection.add(decorate(lambda ctx: ctx.run(lambda: 0), name="ok"))  # type: ignore[call-overload]
+    collection.add(decorate(lambda ctx, code: ctx.run(lambda: code), name="ko"))  # type: ignore[call-overload]
+
+    collection.run(["ok", "ok"], jobs=2)
+    with pytest.raises(DutyFailure) as excinfo:
+        collection.run(["ok", (collection.get("ko"), (5,), {}), (collection.get("ko"), (6,), {})], jobs=2)
+    assert excinfo.value.code == 5
+
+
+def test_run_shared_pre_duties_once() -> None:
+    """Run pre-duties shared by multiple duties only once."""
+    calls = []
+
+    collection = Collection()
+    collection.add(decorate(lambda ctx: calls.append("setup"), name="setup"))  # type: ignore[call-overload]
+    collection.add(decorate(lambda ctx: calls.append("a"), name="a", pre=["setup"]))  # type: ignore[call-overload]
+    collection.add(decorate(lambda ctx: calls.append("b"), name="b", pre=["setup", "a"]))  # type: ignore[call-overload]
+
+    collection.run(["a", "b", "setup"])
+    assert calls == ["setup", "a", "b"]
+
+    calls.clear()
+    collection.get("b").run()
+    assert calls == ["setup", "a", "b"]
+
+
+def test_build_jobs_graph() -> None:
+    """Build a deduplicated graph of jobs from pre- and post-duties."""
+    collection = Collection()
+    collection.add(decorate(lambda ctx: None, name="setup"))  # type: ignore[call-overload]
+    collection.add(decorate(lambda ctx: None, name="lint", pre=["setup"]))  # type: ignore[call-overload]
+    collection.add(decorate(lambda ctx: None, name="test", pre=["setup"], post=["report"]))  # type: ignore[call-overload]
+    collection.add(decorate(lambda ctx: None, name="report"))  # type: ignore[call-overload]
+
+    jobs = _build_jobs([(collection.get(name), (), {}) for name in ("lint", "test", "setup")])
+    assert [job.name for job in jobs] == ["setup", "lint", "test", "report"]
+    setup, lint, test, report = jobs
+    assert lint.deps == [setup]
+    assert test.deps == [setup]
+    assert report.deps == [test]
+
+
+def test_detect_cycles() -> None:
+    """Detect cycles in pre- and post-duties."""
+    collection = Collection()
+    collection.add(decorate(lambda ctx: None, name="a", pre=["b"]))  # type: ignore[call-overload]
+    collection.add(decorate(lambda ctx: None, name="b", post=["c"]))  # type: ignore[call-overload]
+    collection.add(decorate(lambda ctx: None, name="c", pre=["a"]))  # type: ignore[call-overload]
+
+    with pytest.raises(DutyCycleError) as excinfo:
+        collection.check_cycles()
+    assert excinfo.value.cycle == ["a", "b", "c", "a"]
+
+
+def test_build_jobs_graph_with_parallel_pre_post_duties() -> None:
+    """Don't chain pre- and post-duties declared as parallel."""
+    collection = Collection()
+    for name in ("a", "b", "c", "d"):
+        collection.add(decorate(lambda ctx: None, name=name))  # type: ignore[call-overload]
+    collection.add(
+        decorate(lambda ctx: None, name="main", pre=["a", "b"], post=["c", "d"], pre_parallel=True, post_parallel=2),  # type: ignore[call-overload]
+    )
+
+    a, b, main, c, d = _build_jobs([(collection.get("main"), (), {})])
+    assert a.deps == b.deps == []
+    assert main.deps == [a, b]
+    assert c.deps == d.deps == [main]
+    # Only integer bounds are enforced, through an implicit resource.
+    assert a.limits == b.limits == main.limits == {}
+    assert c.limits == d.limits == {"main:post:3": 2}
+    assert c.resources == d.resources == {"main:post:3": 1}
+
+
+def test_prioritize_longest_critical_path() -> None:
+    """Start jobs on the longest remaining path first, falling back to declaration order."""
+    collection = Collection()
+    for name in ("lint", "docs", "setup"):
+        collection.add(decorate(lambda ctx: None, name=name))  # type: ignore[call-overload]
+    collection.add(decorate(lambda ctx: None, name="test", pre=["setup"]))  # type: ignore[call-overload]
+
+    lint, docs, setup, test = _build_jobs([(collection.get(name), (), {}) for name in ("lint", "docs", "test")])
+
+    estimates = _estimate([lint, docs, setup, test], {})
+    priorities = _critical_paths([lint, docs, setup, test], estimates)
+    assert _pick([lint, docs, setup], priorities) is lint
+
+    durations = {"lint": 1.0, "docs": 3.0, "setup": 1.0, "test": 8.0}
+    estimates = _estimate([lint, docs, setup, test], durations)
+    priorities = _critical_paths([lint, docs, setup, test], estimates)
+    assert priorities == [1.0, 3.0, 9.0, 8.0]
+    assert _pick([lint, docs, setup], priorities) is setup
+    assert _simulate([lint, docs, setup, test], estimates, priorities, max_jobs=2) == 9.0
+
+
+def test_admit_jobs_according_to_resources_and_locks() -> None:
+    """Only start jobs when the resources they need are available and their locks are free."""
+    collection = Collection()
+    collection.add(decorate(lambda ctx: None, name="test", resources={"cpu": "all"}))  # type: ignore[call-overload]
+    collection.add(decorate(lambda ctx: None, name="docs", locks=["htmlcov"]))  # type: ignore[call-overload]
+    collection.add(decorate(lambda ctx: None, name="coverage", locks=["htmlcov"]))  # type: ignore[call-overload]
+    collection.add(decorate(lambda ctx: None, name="gpu", resources={"gpu": 1}))  # type: ignore[call-overload]
+    collection.add(decorate(lambda ctx: None, name="lint"))  # type: ignore[call-overload]
+
+    names = ("test", "docs", "coverage", "gpu", "lint")
+    test, docs, coverage, gpu, lint = jobs = _build_jobs([(collection.get(name), (), {}) for name in names])
+    priorities = [0.0] * len(jobs)
+    capacities = {"cpu": 4}
+
+    # Jobs sharing a lock never run together.
+    assert _admit([docs, coverage, gpu, lint], priorities, [], capacities) == [docs, gpu, lint]
+    assert _admit([coverage, lint], priorities, [docs], capacities) == [lint]
+    # A job needing all CPUs runs alone, and is not starved by jobs with lower priority.
+    assert _admit(list(jobs), priorities, [], capacities) == [test]
+    assert _admit(list(jobs), priorities, [lint], capacities) == []
+    # Undeclared resources have a capacity of 1.
+    assert _admit([gpu], priorities, [gpu], capacities) == []
+    assert _admit([gpu], priorities, [gpu], {"cpu": 4, "gpu": 2}) == [gpu]
+
+    estimates = [1.0] * len(jobs)
+    assert _simulate([docs, coverage], estimates, priorities, max_jobs=4) == 2.0
+    assert _simulate([test, lint], estimates, priorities, max_jobs=4) == 2.0
+    assert _simulate([docs, lint], estimates, priorities, max_jobs=4) == 1.0
+
+
+def test_run_async_duties() -> None:
+    """Run coroutine functions in an event loop."""
+    calls = []
+
+    async def pre(ctx: Context) -> None:  # noqa: ARG001
+        calls.append("pre")
+
+    async def function(ctx: Context) -> None:
+        await ctx.arun(lambda: calls.append("body"))
+        # Running another duty from within an async duty.
+        Duty("nested", "", pre).run()
+
+    Duty("name", "description", function, pre=[pre]).run()
+    assert calls == ["pre", "body", "pre"]
+
+
+def test_skip_up_to_date_duties(
+    capfd: pytest.CaptureFixture,
+    monkeypatch: pytest.MonkeyPatch,
+    tmp_path: Path,
+) -> None:
+    """Skip duties whose inputs did not change, replaying their output.
+
+    Parameters:
+        capfd: Pytest fixture to capture output.
+        monkeypatch: Pytest fixture to change the working directory.
+        tmp_path: Pytest fixture for a temporary directory.
+    """
+    monkeypatch.chdir(tmp_path)
+    Path("docs").mkdir()
+    Path("docs/index.md").write_text("# Hello")
+    calls = []
+
+    def build(ctx: Context, strict: bool = False) -> None:  # noqa: ARG001,FBT002
+        calls.append(True)
+        print("built docs")  # noqa: T201
+
+    duty = decorate(build, inputs=["docs/*.md"])  # type: ignore[call-overload]
+    duty.run()
+    duty.run()
+    assert len(calls) == 1
+    assert capfd.readouterr().out == "built docs\nbuilt docs\n"
+
+    duty.run(strict=True)
+    assert len(calls) == 2
+
+    Path("docs/other.md").write_text("# Other")
+    duty.run()
+    assert len(calls) == 3
+
+
+def test_stream_output_of_duties_with_inputs(tmp_path: Path) -> None:
+    """Print the output of duties with inputs while they run, and record it to replay it.
+
+    Parameters:
+        tmp_path: Pytest fixture for a temporary directory.
+    """
+    tmp_path.joinpath("input.txt").write_text("input")
+    tmp_path.joinpath("duties.py").write_text(
+        "import sys, time\n"
+        "from pathlib import Path\n"
+        "from duty import duty\n\n"
+        "@duty(inputs=['input.txt'])\n"
+        "def build(ctx):\n"
+        "    # Only continue once the output was read.\n"
+        "    def wait(marker):\n"
+        "        for _ in range(500):\n"
+        "            if Path(marker).exists():\n"
+        "                return\n"
+        "            time.sleep(0.01)\n"
+        "        raise SystemExit(1)\n"
+        "    print('building', flush=True)\n"
+        "    wait('building')\n"
+        "    print('warning', file=sys.stderr, flush=True)\n"
+        "    wait('warning')\n",
+    )
+    python_path = os.pathsep.join(os.path.abspath(path) for path in sys.path if path)
+    env = {**os.environ, "PYTHONPATH": python_path}
+    command = [sys.executable, "-m", "duty", "--no-server", "build"]
+    with subprocess.Popen(  # noqa: S603
+        command,
+        cwd=tmp_path,
+        env=env,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE,
+        text=True,
+    ) as process:
+        assert process.stdout is not None
+        assert process.stderr is not None
+        assert process.stdout.readline() == "building\n"
+        tmp_path.joinpath("building").touch()
+        assert process.stderr.readline() == "warning\n"
+        tmp_path.joinpath("warning").touch()
+        assert process.wait() == 0
+
+    result = subprocess.run(command, cwd=tmp_path, env=env, capture_output=True, text=True, check=False)  # noqa: S603
+    assert result.stdout == "building\nwarning\n"
@@ -0,0 +1,155 @@
+"""Tests for the server mode."""
+
+from __future__ import annotations
+
+import json
+import os
+import socket
+import subprocess
+import sys
+from typing import TYPE_CHECKING
+
+import pytest
+
+from duty._internal import server as server_module
+
+if TYPE_CHECKING:
+    from collections.abc import Iterator
+    from pathlib import Path
+
+pytestmark = pytest.mark.skipif(
+    not hasattr(os, "fork") or not hasattr(socket, "send_fds"),
+    reason="the server needs fork and Unix sockets",
+)
+
+_DUTIES = """
+import json
+import os
+from pathlib import Path
+
+from duty import duty
+
+LOADED_VALUE = os.getenv("VALUE")
+
+
+@duty
+def info(ctx):
+    info = {"pid": os.getpid(), "ppid": os.getppid(), "value": os.getenv("VALUE"), "cwd": os.getcwd()}
+    info["loaded_value"] = LOADED_VALUE
+    Path("info.json").write_text(json.dumps(info))
+    print("info written")
+
+
+@duty
+def fail(ctx, code: int = 3):
+    ctx.run(lambda: code, title="failing")
+"""
+
+
+def _env(tmp_path: Path, **env: str) -> dict[str, str]:
+    # Commands run in the temporary directory, so paths in PYTHONPATH must be absolute.
+    python_path = os.pathsep.join(
+        os.path.abspath(path) for path in os.getenv("PYTHONPATH", "").split(os.pathsep) if path
+    )
+    return {**os.environ, "PYTHONPATH": python_path, "DUTY_SERVER": str(tmp_path / "server.sock"), **env}
+
+
+def _duty(tmp_path: Path, *args: str, **env: str) -> subprocess.CompletedProcess:
+    return subprocess.run(  # noqa: S603
+        [sys.executable, "-m", "duty", *args],
+        cwd=tmp_path,
+        env=_env(tmp_path, **env),
+        capture_output=True,
+        text=True,
+        check=False,
+    )
+
+
+@pytest.fixture(name="server")
+def fixture_server(tmp_path: Path) -> Iterator[subprocess.Popen]:
+    """Start a server in a temporary project.
+
+    Parameters:
+        tmp_path: A Pytest fixture providing a temporary directory.
+
+    Yields:
+        The server process.
+    """
+    tmp_path.joinpath("duties.py").write_text(_DUTIES)
+    process = subprocess.Popen(
+        [sys.executable, "-m", "duty", "--server"],
+        cwd=tmp_path,
+        env=_env(tmp_path),
+        stderr=subprocess.PIPE,
+        text=True,
+    )
+    assert process.stderr is not None
+    assert "listening" in process.stderr.readline()
+    yield process
+    process.terminate()
+    process.wait()
+
+
+def test_run_commands_on_server(server: subprocess.Popen, tmp_path: Path) -> None:
+    """Run commands in processes forked from the server, with the client's environment and output.
+
+    Parameters:
+        server: The server process.
+        tmp_path: A Pytest fixture providing a temporary directory.
+    """
+    result = _duty(tmp_path, "info", VALUE="42")
+    assert result.returncode == 0
+    assert "info written" in result.stdout
+    info = json.loads(tmp_path.joinpath("info.json").read_text())
+    assert info["ppid"] == server.pid
+    assert info["value"] == "42"
+    # The duties file was loaded again in the client environment.
+    assert info["loaded_value"] == "42"
+    assert os.path.samefile(info["cwd"], tmp_path)
+
+    result = _duty(tmp_path, "fail", "code=5")
+    assert result.returncode == 5
+    assert "failing" in result.stdout
+
+    assert _duty(tmp_path, "--no-server", "info").returncode == 0
+    assert json.loads(tmp_path.joinpath("info.json").read_text())["ppid"] != server.pid
+
+
+def test_reload_changed_duties(server: subprocess.Popen, tmp_path: Path) -> None:
+    """The server loads the duties file again when it changes.
+
+    Parameters:
+        server: The server process.
+        tmp_path: A Pytest fixture providing a temporary directory.
+    """
+    duties_file = tmp_path / "duties.py"
+    duties_file.write_text(duties_file.read_text() + "\n@duty\ndef added(ctx):\n    print('added duty')\n")
+    result = _duty(tmp_path, "added")
+    assert result.returncode == 0
+    assert "added duty" in result.stdout
+    assert server.poll() is None
+
+
+def test_only_owner_can_connect(server: subprocess.Popen, tmp_path: Path) -> None:  # noqa: ARG001
+    """Create the socket of the server with permissions for its user only.
+
+    Parameters:
+        server: The server process.
+        tmp_path: A Pytest fixture providing a temporary directory.
+    """
+    assert (tmp_path / "server.sock").stat().st_mode & 0o777 == 0o600
+
+
+def test_time_out_stalled_clients(monkeypatch: pytest.MonkeyPatch) -> None:
+    """Stop waiting for the request of a client that does not send it.
+
+    Parameters:
+        monkeypatch: A Pytest fixture to patch objects.
+    """
+    monkeypatch.setattr(server_module, "_RECEIVE_TIMEOUT", 0.1)
+    server_side, client_side = socket.socketpair()
+    with server_side, client_side:
+        # The beginning of a request, with file descriptors, but never its end.
+        socket.send_fds(client_side, [b'{"argv": '], [0, 1, 2])
+        with pytest.raises(TimeoutError):
+            server_module._receive(server_side)
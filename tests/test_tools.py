@@ -0,0 +1,355 @@
+"""Tests for our tools."""
+
+from __future__ import annotations
+
+import json
+import os
+import re
+import subprocess
+import sys
+import threading
+import zipfile
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import TYPE_CHECKING
+
+import pytest
+
+from duty import main, tools
+from duty._internal.tools._pytest import _affected_tests, _merge_impact, _partition
+from duty._internal.tools._safety import _normalize_requirements, _result_key, _VulnerabilityDatabase
+
+if TYPE_CHECKING:
+    from pathlib import Path
+
+
+def test_mypy_daemon(tmp_path: Path, monkeypatch: pytest.MonkeyPatch, capsys: pytest.CaptureFixture) -> None:
+    """Type-check through a mypy daemon, restarted when the configuration changes.
+
+    Parameters:
+        tmp_path: A Pytest fixture providing a temporary directory.
+        monkeypatch: A Pytest fixture to patch objects.
+        capsys: Pytest fixture to capture output.
+    """
+    pytest.importorskip("mypy.dmypy.client")
+    monkeypatch.delenv("DUTY_CACHE_DIR")
+    monkeypatch.chdir(tmp_path)
+    tmp_path.joinpath("module.py").write_text("def function(x):\n    return x\n")
+    try:
+        tools.mypy("module.py", daemon=True)()
+        assert len(list(tmp_path.joinpath(".duty", "daemons").glob("mypy-*.json"))) == 1
+
+        tmp_path.joinpath("mypy.ini").write_text("[mypy]\ndisallow_untyped_defs = True\n")
+        with pytest.raises(SystemExit) as exit_info:
+            tools.mypy("module.py", daemon=True)()
+        assert exit_info.value.code == 1
+        assert "missing a type annotation" in capsys.readouterr().out
+    finally:
+        # Daemons are found whatever the duties file.
+        assert main(["-d", "tasks/duties.py", "--shutdown-daemons"]) == 0
+    assert "Stopped mypy daemon" in capsys.readouterr().out
+    assert not list(tmp_path.joinpath(".duty", "daemons").glob("mypy-*.json"))
+
+
+def test_partition_tests_by_duration() -> None:
+    """Tests are partitioned into shards of about the same duration, deterministically."""
+    durations = {"a": 8.0, "b": 4.0, "c": 4.0, "d": 2.0, "e": 1.0, "f": 1.0}
+    node_ids = ["f", "e", "d", "c", "b", "a", "new"]
+    shards = _partition(node_ids, durations, 2)
+    assert sorted(node_id for shard in shards for node_id in shard) == sorted(node_ids)
+    # The new test is assumed to take the average duration (~3.3s): totals are 11.3s and 12s.
+    totals = [sum(durations.get(node_id, 20 / 6) for node_id in shard) for shard in shards]
+    assert max(totals) - min(totals) < 1
+    assert shards == _partition(node_ids, durations, 2)
+    assert all(shard == [node_id for node_id in node_ids if node_id in shard] for shard in shards)
+    # Without durations, shards have the same number of tests.
+    assert [len(shard) for shard in _partition(node_ids, {}, 3)] == [3, 2, 2]
+
+
+def test_pytest_shards(tmp_path: Path) -> None:
+    """Run a shard of the tests, and record their durations.
+
+    Parameters:
+        tmp_path: A Pytest fixture providing a temporary directory.
+    """
+    tmp_path.joinpath("test_things.py").write_text(
+        "".join(f"def test_{index}():\n    pass\n\n" for index in range(4)),
+    )
+    durations_file = tmp_path / "durations.json"
+    durations = {"test_things.py::test_0": 6.0, "test_things.py::test_1": 1.0, "test_things.py::test_2": 1.0}
+    durations_file.write_text(json.dumps(durations))
+    python_path = os.pathsep.join(os.path.abspath(path) for path in sys.path if path)
+    outputs = []
+    for index in (1, 2):
+        code = f"from duty import tools; raise SystemExit(tools.pytest(shard=({index}, 2), durations_file='durations.json')())"
+        result = subprocess.run(  # noqa: S603
+            [sys.executable, "-c", code],
+            cwd=tmp_path,
+            env={**os.environ, "PYTHONPATH": python_path},
+            capture_output=True,
+            text=True,
+            check=False,
+        )
+        assert result.returncode == 0
+        outputs.append(result.stdout)
+
+    # The longest test runs alone, while the others (test_3 is assumed to take the average) run in the other shard.
+    assert "1 passed, 3 deselected" in outputs[0]
+    assert "3 passed, 1 deselected" in outputs[1]
+    # Durations are recorded once all shards ran.
+    assert set(json.loads(durations_file.read_text())) == {f"test_things.py::test_{index}" for index in range(4)}
+    assert json.loads(durations_file.read_text())["test_things.py::test_0"] < 1
+
+    # A shard running again before the others merges what was recorded, instead of dropping it.
+    durations_file.write_text(json.dumps(durations))
+    for _ in range(2):
+        result = subprocess.run(  # noqa: S603
+            [sys.executable, "-c", code.replace("(2, 2)", "(1, 2)")],
+            cwd=tmp_path,
+            env={**os.environ, "PYTHONPATH": python_path},
+            capture_output=True,
+            text=True,
+            check=False,
+        )
+    assert "Durations of shards 2 of 2 are missing" in result.stdout
+    assert json.loads(durations_file.read_text())["test_things.py::test_0"] < 1
+    assert json.loads(durations_file.read_text())["test_things.py::test_1"] == 1.0
+
+    with pytest.raises(ValueError, match="Invalid shard"):
+        tools.pytest(shard=(0, 2))
+
+
+def test_select_affected_tests() -> None:
+    """Tests covering changed files are affected, and configuration changes affect all tests."""
+    files = {"a.py": ("", {"test_a", "test_ab"}), "b.py": ("", {"test_ab"}), "pkg/__init__.py": ("", None)}
+    assert _affected_tests(files, {"b.py", "new.py"}) == {"test_ab"}
+    assert _affected_tests(files, {"docs/index.md"}) == set()
+    assert _affected_tests(files, {"pkg/__init__.py"}) is None
+    assert _affected_tests(files, {"tests/conftest.py"}) is None
+    assert _affected_tests(files, {"pyproject.toml"}) is None
+
+
+def test_merge_covered_files() -> None:
+    """Files covered by the tests that ran replace what was recorded for these tests."""
+    index = {
+        "environment": "env",
+        "tests": {"test_a", "test_b"},
+        "files": {"a.py": ("", {"test_a", "test_b"}), "b.py": ("", {"test_b"}), "c.py": ("", {"test_a"})},
+        "pending": set(),
+    }
+    merged = _merge_impact(index, "env", {"a.py": {"test_b"}, "b.py": {"test_b"}, "d.py": None}, {"test_b"}, set())
+    assert merged["files"] == {
+        "a.py": ("", {"test_a", "test_b"}),
+        "b.py": ("", {"test_b"}),
+        "c.py": ("", {"test_a"}),
+        "d.py": ("", None),
+    }
+    # test_a stopped covering c.py, and nothing else covers it.
+    assert "c.py" not in _merge_impact(merged, "env", {"a.py": {"test_a"}}, {"test_a"}, set())["files"]
+    # Data recorded in another environment is discarded.
+    assert _merge_impact(index, "other", {}, set(), set())["files"] == {}
+
+
+def test_pytest_affected_tests(tmp_path: Path) -> None:
+    """Only run the tests covering files changed since the last run.
+
+    Parameters:
+        tmp_path: A Pytest fixture providing a temporary directory.
+    """
+    tmp_path.joinpath("mod_a.py").write_text("def a():\n    return 1\n")
+    tmp_path.joinpath("mod_b.py").write_text("def b():\n    return 2\n")
+    tmp_path.joinpath("test_things.py").write_text(
+        "from mod_a import a\nfrom mod_b import b\n\n"
+        "def test_a():\n    assert a() == 1\n\n"
+        "def test_b():\n    assert b() == 2\n",
+    )
+    python_path = os.pathsep.join([str(tmp_path), *(os.path.abspath(path) for path in sys.path if path)])
+
+    def run() -> str:
+        code = (
+            "from duty import tools; raise SystemExit(tools.pytest(affected_since=True, impact_file='impact.json')())"
+        )
+        result = subprocess.run(  # noqa: S603
+            [sys.executable, "-c", code],
+            cwd=tmp_path,
+            env={**os.environ, "PYTHONPATH": python_path},
+            capture_output=True,
+            text=True,
+            check=False,
+        )
+        assert result.returncode == 0
+        return result.stdout
+
+    assert "2 passed" in run()
+    assert "2 deselected" in run()
+    tmp_path.joinpath("mod_b.py").write_text("def b():\n    return 1 + 1\n")
+    assert "1 passed, 1 deselected" in run()
+    tmp_path.joinpath("pytest.ini").write_text("[pytest]\n")
+    output = run()
+    assert "all tests selected" in output
+    assert "2 passed" in output
+
+
+def test_combine_coverage_in_parallel(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    """Combine data files in parallel, with the same result as combining them serially.
+
+    Parameters:
+        tmp_path: A Pytest fixture providing a temporary directory.
+        monkeypatch: A Pytest fixture to patch objects.
+    """
+    from coverage import CoverageData  # noqa: PLC0415
+
+    monkeypatch.chdir(tmp_path)
+    for index in range(7):
+        data = CoverageData(f".coverage.{index}")
+        data.add_lines({str(tmp_path / f"module_{index % 3}.py"): {index + 1, 10}})
+        data.write()
+    for path in tmp_path.glob(".coverage.*"):
+        path.with_name(path.name.replace(".coverage", ".serial")).write_bytes(path.read_bytes())
+
+    assert tools.coverage.combine(jobs=3, quiet=True)() == 0
+    assert tools.coverage.combine(data_file=".serial", quiet=True)() == 0
+    assert not list(tmp_path.glob(".coverage.*"))
+    parallel, serial = CoverageData(".coverage"), CoverageData(".serial")
+    parallel.read()
+    serial.read()
+    assert parallel.measured_files() == serial.measured_files()
+    for filename in serial.measured_files():
+        assert sorted(parallel.lines(filename)) == sorted(serial.lines(filename))
+    assert sorted(parallel.lines(str(tmp_path / "module_0.py"))) == [1, 4, 7, 10]
+
+    with pytest.raises(ValueError, match="Invalid number of jobs"):
+        tools.coverage.combine(jobs=0)
+
+
+def test_normalize_requirements() -> None:
+    """Equivalent requirements are normalized the same way."""
+    assert _normalize_requirements("Django==4.2.1\n# comment\n\nzope.interface >= 6  # pinned\ndjango==4.2.1") == [
+        "django==4.2.1",
+        "zope-interface>=6",
+    ]
+
+
+def test_safety_local_database(tmp_path: Path, capsys: pytest.CaptureFixture) -> None:
+    """Store the vulnerability database locally, and memoize results.
+
+    Parameters:
+        tmp_path: A Pytest fixture providing a temporary directory.
+        capsys: A Pytest fixture to capture output.
+    """
+    db_file = tmp_path / "safety.db"
+    assert tools.safety.check("django==4.2.1", db=str(db_file), offline=True)() is False
+    assert "No local copy" in capsys.readouterr().out
+
+    local_db = _VulnerabilityDatabase(db_file)
+    meta = {"meta": {"schema_version": "2.0.0"}}
+    local_db.store(
+        {
+            "insecure.json": {**meta, "vulnerable_packages": {"django": ["<4.2.2"], "flask": ["<1"]}},
+            "insecure_full.json": {**meta, "vulnerable_packages": {"django": [{"specs": ["<4.2.2"]}]}},
+        },
+    )
+    version = local_db.version()
+    assert version
+
+    # Only requested packages are written to the mirror used by safety.
+    local_db.write_mirror(str(tmp_path / "mirror"), ["django", "requests"])
+    mirrored = json.loads(tmp_path.joinpath("mirror", "insecure.json").read_text())
+    assert mirrored == {**meta, "vulnerable_packages": {"django": ["<4.2.2"]}}
+    assert tmp_path.joinpath("mirror", "python", "insecure_full.json").exists()
+
+    # Results are memoized: equivalent requirements return them without running safety.
+    key = _result_key(["django==4.2.1"], ignore_vulns={}, formatter="text", full_report=True, db_version=version)
+    local_db.save_result(key, passed=False, report="report")
+    assert tools.safety.check(["Django == 4.2.1"], db=str(db_file), offline=True)() is False
+    assert capsys.readouterr().out == "report\n"
+
+    # Refreshing the local copy forgets memoized results.
+    local_db.store({"insecure.json": meta, "insecure_full.json": meta})
+    assert local_db.version() != version
+    assert local_db.result(key) is None
+
+
+def _wheel(directory: Path, name: str, version: str) -> str:
+    path = directory / f"{name}-{version}-py3-none-any.whl"
+    with zipfile.ZipFile(path, "w") as wheel:
+        wheel.writestr(
+            f"{name}-{version}.dist-info/METADATA",
+            f"Metadata-Version: 2.1\nName: {name}\nVersion: {version}\n"
+            "Description-Content-Type: text/markdown\n\nA package.\n",
+        )
+        wheel.writestr(
+            f"{name}-{version}.dist-info/WHEEL",
+            "Wheel-Version: 1.0\nRoot-Is-Purelib: true\nTag: py3-none-any\n",
+        )
+        wheel.writestr(f"{name}-{version}.dist-info/RECORD", "")
+    return str(path)
+
+
+def test_twine_concurrent_uploads(
+    tmp_path: Path,
+    monkeypatch: pytest.MonkeyPatch,
+    capsys: pytest.CaptureFixture,
+) -> None:
+    """Upload distributions concurrently to a local package index, and resume interrupted uploads.
+
+    Parameters:
+        tmp_path: A Pytest fixture providing a temporary directory.
+        monkeypatch: A Pytest fixture to patch objects.
+        capsys: A Pytest fixture to capture output.
+    """
+    uploaded: list[str] = []
+
+    class Index(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def do_POST(self) -> None:
+            body = self.rfile.read(int(self.headers["Content-Length"]))
+            filename = re.search(rb'filename="([^"]+)"', body).group(1).decode()  # type: ignore[union-attr]
+            # The second version always fails to upload.
+            status = 500 if "-2.0-" in filename else 200
+            if status == 200:
+                uploaded.append(filename)
+            self.send_response(status)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+
+        def log_message(self, *args: object) -> None:
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Index)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    monkeypatch.chdir(tmp_path)
+    dists = [_wheel(tmp_path, f"pkg{index}", "1.0") for index in range(6)]
+    failing = _wheel(tmp_path, "pkg", "2.0")
+    options = {
+        "repository_url": f"http://127.0.0.1:{server.server_port}/",
+        "username": "user",
+        "password": "pass",
+        "non_interactive": True,
+        "jobs": 3,
+        "check": True,
+    }
+    upload = tools.twine.upload(*dists, failing, **options)
+    try:
+        assert upload() == 1
+        assert sorted(uploaded) == sorted(os.path.basename(dist) for dist in dists)
+        assert "Failed to upload pkg-2.0-py3-none-any.whl" in capsys.readouterr().out
+
+        # Without `skip_existing`, the record of uploaded files is not trusted.
+        uploaded.clear()
+        assert upload() == 1
+        assert sorted(uploaded) == sorted(os.path.basename(dist) for dist in dists)
+        assert "because it was already uploaded" not in capsys.readouterr().out
+
+        # With `skip_existing`, files uploaded by previous runs are skipped.
+        # Twine 6.1 and later only allow `skip_existing` with PyPI and TestPyPI.
+        from twine.settings import Settings  # noqa: PLC0415
+
+        monkeypatch.setattr(Settings, "verify_feature_capability", lambda _: None, raising=False)
+        uploaded.clear()
+        assert tools.twine.upload(*dists, failing, skip_existing=True, **options)() == 1
+        assert not uploaded
+        assert capsys.readouterr().out.count("because it was already uploaded") == len(dists)
+    finally:
+        server.shutdown()
+        server.server_close()
@@ -0,0 +1,138 @@
+"""Tests for workers."""
+
+from __future__ import annotations
+
+import os
+import socket
+import subprocess
+import sys
+from typing import TYPE_CHECKING, Callable
+
+import pytest
+
+from duty import main
+from duty._internal import worker
+from duty._internal.collection import Collection
+from duty._internal.worker import _invocation, _run_remote
+
+if TYPE_CHECKING:
+    from collections.abc import Iterator
+    from pathlib import Path
+
+pytestmark = pytest.mark.skipif(not hasattr(os, "fork"), reason="workers need fork")
+
+
+@pytest.fixture(name="start_worker")
+def fixture_start_worker(tmp_path: Path) -> Iterator[Callable[..., str]]:
+    """Start worker processes serving the `parallel.py` fixture.
+
+    Parameters:
+        tmp_path: A Pytest fixture providing a temporary directory.
+
+    Yields:
+        A function starting a worker and returning its address.
+    """
+    processes: list[subprocess.Popen] = []
+
+    def start_worker(**env: str) -> str:
+        address = f"unix:{tmp_path}/worker{len(processes)}.sock"
+        process = subprocess.Popen(  # noqa: S603
+            [sys.executable, "-m", "duty", "-d", "tests/fixtures/parallel.py", "--worker", address],
+            env={**os.environ, **env},
+            stderr=subprocess.PIPE,
+            text=True,
+        )
+        processes.append(process)
+        assert process.stderr is not None
+        assert "listening" in process.stderr.readline()
+        return address
+
+    yield start_worker
+    for process in processes:
+        process.terminate()
+        process.wait()
+
+
+def test_run_duty_on_worker(start_worker: Callable[..., str]) -> None:
+    """Run a duty on a worker, and get its output and exit code back.
+
+    Parameters:
+        start_worker: Fixture starting workers.
+    """
+    address = start_worker()
+    code, output = _run_remote(address, _invocation("failing", (), {"code": "5"}, {}, {}))
+    assert code == 5
+    assert "failing" in output
+
+
+def test_dispatch_duties_to_workers(
+    monkeypatch: pytest.MonkeyPatch,
+    tmp_path: Path,
+    start_worker: Callable[..., str],
+) -> None:
+    """Dispatch duties to several workers, running concurrently.
+
+    Parameters:
+        monkeypatch: A Pytest fixture to patch the environment.
+        tmp_path: A Pytest fixture providing a temporary directory.
+        start_worker: Fixture starting workers.
+    """
+    marker = str(tmp_path / "marker")
+    monkeypatch.setenv("DUTY_TEST_MARKER", marker)
+    workers = ",".join((start_worker(DUTY_TEST_MARKER=marker), start_worker(DUTY_TEST_MARKER=marker)))
+    # `waiting` only succeeds if `marking` runs while it waits.
+    assert main(["-d", "tests/fixtures/parallel.py", "--workers", workers, "waiting", "marking"]) == 0
+
+
+def test_refuse_invocations_without_token(start_worker: Callable[..., str]) -> None:
+    """Refuse invocations without the worker token.
+
+    Parameters:
+        start_worker: Fixture starting workers.
+    """
+    address = start_worker(DUTY_WORKER_TOKEN="secret")  # noqa: S106
+    code, output = _run_remote(address, _invocation("marking", (), {}, {}, {}))
+    assert code == 1
+    assert "Invalid worker token" in output
+
+
+def test_refuse_to_serve_tcp_without_token(capsys: pytest.CaptureFixture) -> None:
+    """Refuse to listen on TCP addresses without a worker token.
+
+    Parameters:
+        capsys: Pytest fixture to capture output.
+    """
+    assert main(["-d", "tests/fixtures/parallel.py", "--worker", "127.0.0.1:0"]) == 1
+    assert "DUTY_WORKER_TOKEN" in capsys.readouterr().err
+
+
+def test_only_forward_listed_environment_variables(monkeypatch: pytest.MonkeyPatch) -> None:
+    """Only send the environment variables listed in `DUTY_WORKER_ENV` to workers.
+
+    Parameters:
+        monkeypatch: A Pytest fixture to patch the environment.
+    """
+    monkeypatch.setenv("DUTY_WORKER_TOKEN", "secret")
+    monkeypatch.setenv("API_KEY", "secret")
+    monkeypatch.setenv("DUTY_TEST_MARKER", "marker")
+    monkeypatch.setenv("DUTY_WORKER_ENV", "DUTY_TEST_MARKER, DUTY_WORKER_TOKEN")
+    invocation = _invocation("marking", (), {}, {}, {})
+    assert invocation["env"] == {"DUTY_TEST_MARKER": "marker"}
+    assert invocation["token"] == "secret"  # noqa: S105
+
+
+@pytest.mark.parametrize("sent", [b"", b'{"duties": '])
+def test_drop_clients_not_sending_invocations(monkeypatch: pytest.MonkeyPatch, sent: bytes) -> None:
+    """Drop clients that do not send a complete invocation in time, instead of waiting for them forever.
+
+    Parameters:
+        monkeypatch: A Pytest fixture to monkeypatch objects.
+        sent: What the client sends.
+    """
+    monkeypatch.setattr(worker, "_RECEIVE_TIMEOUT", 0.2)
+    server_sock, client_sock = socket.socketpair()
+    with server_sock, client_sock:
+        client_sock.sendall(sent)
+        worker._handle(Collection("tests/fixtures/parallel.py"), server_sock)
+        server_sock.close()
+        assert client_sock.recv(1024) == b""